@@ -1,6 +1,20 @@
-from fastapi import Depends
+from fastapi import HTTPException
+
 from app.services.recommender import HybridRecommender
+from app.services.registry import get_recommender, is_ready, start_warm_up
 
 
 def get_hybrid_recommender() -> HybridRecommender:
-    return HybridRecommender()
+    return get_recommender()
+
+
+async def require_ready():
+    """Reject requests with 503 until the catalog and model have been loaded."""
+    if not is_ready():
+        # Kicks off loading if nothing started it yet (e.g. no lifespan events)
+        start_warm_up()
+        raise HTTPException(
+            status_code=503,
+            detail="Recommender is warming up, please retry",
+            headers={"Retry-After": "1"},
+        )
@@ -0,0 +1,73 @@
+import logging
+import time
+
+from app.core import metrics
+from app.core.profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram(
+    "nunvibe_request_duration_seconds", "HTTP request latency", ("method", "route"))
+REQUESTS = metrics.counter(
+    "nunvibe_requests_total", "HTTP requests handled", ("method", "route", "status"))
+IN_FLIGHT = metrics.gauge(
+    "nunvibe_requests_in_flight", "HTTP requests currently being handled")
+SLOW_REQUESTS = metrics.counter(
+    "nunvibe_slow_requests_total", "HTTP requests slower than the slow-request threshold",
+    ("method", "route"))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status counts and in-flight
+    requests, and tracing each request's stage spans. Requests slower than
+    `slow_seconds` are logged with their stage breakdown and, if a
+    SamplingProfiler is given, their sampled stacks are dumped.
+    """
+
+    def __init__(self, app, slow_seconds: float, profiler: SamplingProfiler = None):
+        self.app = app
+        self.slow_seconds = slow_seconds
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        with metrics.track_request() as trace:
+            if self.profiler is not None:
+                self.profiler.start(trace)
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                duration = time.perf_counter() - start
+                IN_FLIGHT.dec()
+                stacks = self.profiler.stop(trace) if self.profiler is not None else None
+                # Label by route template, not raw path, to bound cardinality
+                route = getattr(scope.get("route"), "path", "unmatched")
+                method = scope["method"]
+                REQUEST_SECONDS.observe(duration, method=method, route=route)
+                REQUESTS.inc(method=method, route=route, status=status)
+                if duration >= self.slow_seconds:
+                    self._report_slow(method, route, duration, trace, stacks)
+
+    def _report_slow(self, method: str, route: str, duration: float, trace, stacks):
+        SLOW_REQUESTS.inc(method=method, route=route)
+        name = f"{method} {route}"
+        breakdown = ", ".join(f"{stage}={elapsed * 1e3:.1f}ms" for stage, elapsed in trace.stages)
+        profile = ""
+        if stacks:
+            profile = f"; profile written to {self.profiler.dump(name, duration, trace, stacks)}"
+        logger.warning("Slow request %s took %.1f ms (%s)%s",
+                       name, duration * 1e3, breakdown or "no spans", profile)
@@ -1,29 +1,117 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.core.config import DEFAULT_K, FEEDBACK_CSV_PATH
-from app.data.preprocess import ContentData
-from app.services.recommender import HybridRecommender
-from app.services.updater import FeedbackUpdater
+from app.api.deps import require_ready
+from app.core import metrics
+from app.core.config import DEFAULT_K
+from app.services import registry
+from app.services.executor import ExecutorBusy
+from app.services.registry import (
+    get_content_data,
+    get_cursor_store,
+    get_recommender,
+    get_request_coalescer,
+    get_scoring_executor,
+    get_session_store,
+    get_updater,
+)
 from app.schemas import (
     GenresResponse,
     GenreSamplesRequest,
     GenreSamplesResponse,
     ContentRequest,
     ContentResponse,
+    PageResponse,
     FeedbackRequest,
     FeedbackResponse,
+    BatchContentRequest,
+    BatchContentResponse,
+    CacheStatsResponse,
 )
 
-data = ContentData()
-recommender = HybridRecommender()
-updater = FeedbackUpdater(feedback_csv_path=FEEDBACK_CSV_PATH)
-router = APIRouter()
+# Shared state is looked up per request (it is loaded by the warm-up, not at
+# import), and the recommendation routes answer 503 until it is ready
+router = APIRouter(dependencies=[Depends(require_ready)])
+# Health, readiness and metrics answer from the moment the process is up
+status_router = APIRouter()
+
+
+def _caches() -> dict:
+    if not registry.is_ready():
+        return {}
+    recommender = get_recommender()
+    return {
+        "cold_start": recommender.cold_start_cache,
+        "genre_samples": recommender.samples_cache,
+        "sessions": get_session_store().cache,
+        "cursors": get_cursor_store().cache,
+    }
+
+
+for _stat, _kind in (("hits", "counter"), ("misses", "counter"),
+                     ("evictions", "counter"), ("entries", "gauge")):
+    metrics.callback(
+        f"nunvibe_cache_{_stat}" + ("_total" if _kind == "counter" else ""),
+        f"Response/session cache {_stat}",
+        lambda _stat=_stat: {(name,): c.stats()[_stat] for name, c in _caches().items()},
+        kind=_kind, labelnames=("cache",))
+metrics.callback("nunvibe_scoring_in_flight", "Scoring jobs running or queued",
+                 lambda: get_scoring_executor().in_flight)
+metrics.callback("nunvibe_scoring_queue_depth", "Scoring jobs waiting for a worker",
+                 lambda: get_scoring_executor().queue_depth)
+metrics.callback("nunvibe_feedback_rows", "Feedback rows known to this process",
+                 lambda: get_recommender().feedback.total if registry.is_ready() else 0)
+metrics.callback("nunvibe_ready", "Whether the catalog and model are loaded",
+                 lambda: int(registry.is_ready()))
+
+
+@status_router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@status_router.get("/ready")
+async def ready():
+    """Readiness: 200 once the catalog and model are loaded, else 503."""
+    error = registry.warm_up_error()
+    body = {
+        "ready": registry.is_ready(),
+        "components": registry.loaded(),
+        "error": repr(error) if error is not None else None,
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@status_router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Return request, stage, cache and executor metrics in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+async def _score(fn, **kwargs):
+    """Run a recommender method on the bounded scoring executor."""
+    return await _or_busy(get_scoring_executor().run(fn, **kwargs))
+
+
+async def _or_busy(job):
+    """Await a scoring job, answering 503 if the executor is saturated."""
+    try:
+        return await job
+    except ExecutorBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Recommender is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
 
 
 @router.get("/genres", response_model=GenresResponse)
 def list_genres():
     """Return available music genres."""
-    return GenresResponse(genres=data.list_genres())
+    return GenresResponse(genres=get_content_data().list_genres())
 
 
 @router.get("/genres/samples", response_model=GenreSamplesResponse)
@@ -33,40 +121,150 @@ def genre_samples(
         10, gt=0, description="How many sample tracks to return"),
 ):
     """Return example tracks for each genre."""
-    samples = data.sample_popular_by_genres(genres, limit)
+    samples = get_recommender().genre_samples(genres, limit)
     return GenreSamplesResponse(samples=samples)
 
 
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+def cache_stats():
+    """Return hit-rate statistics for the response caches."""
+    return CacheStatsResponse(caches={
+        name: cache.stats() for name, cache in _caches().items()})
+
+
+def _session_for(req):
+    """
+    Apply the request's ratings to its session. Only ratings that are new to
+    the session are stored as feedback (buffered, written in the background,
+    so disk writes never add to recommendation latency). Takes the session
+    store's and the session's locks, so async routes run it in the threadpool
+    (see `_session_in_thread`), never on the event loop.
+    """
+    sessions = get_session_store()
+    with metrics.span("route.session"):
+        session = sessions.get_or_create(req.session_id)
+        if req.user_id:
+            # user_id is an unauthenticated key; a session can't switch users
+            if session.user_id is not None and session.user_id != req.user_id:
+                raise HTTPException(
+                    status_code=409, detail="Session belongs to another user_id")
+            session.user_id = req.user_id
+        new_liked, new_disliked = session.rate(
+            get_content_data(), req.liked_uris, req.disliked_uris)
+    if new_liked or new_disliked:
+        with metrics.span("route.feedback_write"):
+            get_updater().update(liked_uris=new_liked, disliked_uris=new_disliked,
+                                 user_id=session.user_id)
+    sessions.save(session)
+    return session
+
+
+async def _session_in_thread(req):
+    """`_session_for` off the event loop, so lock waits don't stall other requests."""
+    return await run_in_threadpool(_session_for, req)
+
+
+async def _recommend_in_session(req, exclude_uris: list[str] = ()):
+    """Apply the request's ratings to its session and score it."""
+    session = await _session_in_thread(req)
+    # Includes the wait for the batch to fill and for a scoring thread; the
+    # batch's own scoring spans are traced under the request that opened it
+    with metrics.span("route.score"):
+        recs = await _or_busy(get_request_coalescer().submit(dict(
+            k=req.k or DEFAULT_K,
+            seed_genres=req.seed_genres,
+            session=session,
+            user_id=session.user_id,
+            exclude_uris=list(exclude_uris),
+        )))
+    return recs, session.session_id
+
+
 @router.post("/recommend", response_model=ContentResponse)
-def recommend(req: ContentRequest):
+async def recommend(req: ContentRequest):
     """Return initial or feedback-refined recommendations."""
-    # Save feedback from liked and disliked URIs
-    if req.liked_uris or req.disliked_uris:
-        updater.update(
-            liked_uris=req.liked_uris,
-            disliked_uris=req.disliked_uris,
-        )
-
-    recs = recommender.recommend(
-        k=req.k or DEFAULT_K,
-        seed_genres=req.seed_genres,
-        liked_uris=req.liked_uris,
-        disliked_uris=req.disliked_uris,
-    )
-    return ContentResponse(recommendations=recs)
+    recs, session_id = await _recommend_in_session(req, req.exclude_uris)
+    return ContentResponse(recommendations=recs, session_id=session_id)
 
 
 @router.post("/recommend/feedback", response_model=FeedbackResponse)
-def feedback(req: FeedbackRequest):
+async def feedback(req: FeedbackRequest):
     """Accept user feedback and return updated recommendations."""
-    updater.update(
-        liked_uris=req.liked_uris,
-        disliked_uris=req.disliked_uris,
-    )
-    recs = recommender.recommend(
-        k=req.k or DEFAULT_K,
-        seed_genres=req.seed_genres,
-        liked_uris=req.liked_uris,
-        disliked_uris=req.disliked_uris,
+    recs, session_id = await _recommend_in_session(req)
+    return FeedbackResponse(recommendations=recs, session_id=session_id)
+
+
+def _first_page(session, seed_genres: list[str], k: int,
+                exclude_uris: list[str]) -> PageResponse:
+    stream = get_recommender().recommend_streams([dict(
+        k=k, seed_genres=seed_genres, session=session, user_id=session.user_id,
+        exclude_uris=exclude_uris)])[0]
+    cursor = get_cursor_store().create(stream, session.session_id)
+    page = cursor.next_page(k)
+    get_cursor_store().save(cursor)
+    return PageResponse(
+        recommendations=page,
+        cursor=None if cursor.exhausted else cursor.cursor_id,
+        session_id=session.session_id)
+
+
+@router.post("/recommend/paged", response_model=PageResponse)
+async def recommend_paged(req: ContentRequest):
+    """
+    Return the first page of recommendations and a cursor for the next ones
+    (see GET /recommend/paged/{cursor}). After a cursor expired, clients
+    continue by requesting a new first page that excludes the tracks they
+    already show (`exclude_uris`).
+    """
+    session = await _session_in_thread(req)
+    with metrics.span("route.score"):
+        return await _score(
+            _first_page, session=session, seed_genres=req.seed_genres, k=req.k or DEFAULT_K,
+            exclude_uris=req.exclude_uris)
+
+
+@router.get("/recommend/paged/{cursor}", response_model=PageResponse)
+async def recommend_next_page(
+    cursor: str,
+    k: int = Query(DEFAULT_K, gt=0, le=1000, description="Page size"),
+):
+    """
+    Return the next page of a paginated recommendation. Only the work for the
+    new page is done; the cursor is null once the catalog is exhausted, and
+    cursors expire when unused for a while (404).
+    """
+    store = get_cursor_store()
+    page_cursor = store.get(cursor)
+    if page_cursor is None:
+        raise HTTPException(status_code=404, detail="Cursor not found or expired")
+    with metrics.span("route.score"):
+        page = await _score(page_cursor.next_page, k=k)
+    store.save(page_cursor)
+    return PageResponse(
+        recommendations=page,
+        cursor=None if page_cursor.exhausted else page_cursor.cursor_id,
+        session_id=page_cursor.session_id)
+
+
+@router.post("/recommend/batch", response_model=BatchContentResponse)
+async def recommend_batch(req: BatchContentRequest):
+    """
+    Return recommendations for many users, scored together in one pass.
+    Liked/disliked URIs are used for scoring only; they are not stored as
+    new feedback.
+    """
+    results = await _score(
+        get_recommender().recommend_many,
+        requests=[
+            dict(
+                k=r.k or DEFAULT_K,
+                seed_genres=r.seed_genres,
+                liked_uris=r.liked_uris,
+                disliked_uris=r.disliked_uris,
+                user_id=r.user_id,
+            )
+            for r in req.requests
+        ],
     )
-    return FeedbackResponse(recommendations=recs)
+    return BatchContentResponse(
+        results=[ContentResponse(recommendations=recs) for recs in results])
@@ -5,8 +5,89 @@ API_PREFIX = "/api"
 CSV_PATH = "app/top_10000_1950-now.csv"
 DEFAULT_K = 10
 MODEL_PATH = "models/knn_model.joblib"
+# Precomputed, memory-mapped feature artifact (rebuilt when the CSV changes)
+FEATURE_ARTIFACT_DIR = "models/features"
+# Rows parsed per chunk when building the artifact from the CSV
+INGEST_CHUNK_SIZE = 100_000
+# Nearest-neighbour index: "brute" (exact) or "ivf" (approximate, for large
+# catalogs; see scripts/index_report.py for recall vs latency)
+VECTOR_INDEX = "brute"
+IVF_NLIST = None  # number of cells, defaults to sqrt(catalog size)
+IVF_NPROBE = 8
+# Offline item-to-item neighbour table (scripts/build_neighbors.py): the
+# NEIGHBORS_M most similar tracks of every track. With SEED_EXPANSION on,
+# content-based recommendations for users with liked tracks merge those
+# tracks' lists instead of searching the whole catalog; it is off by
+# default because the merged lists only approximate the search results. The build scores
+# NEIGHBOR_BUILD_WORKERS row blocks at a time (None: one per core) within
+# NEIGHBOR_BUILD_MEMORY bytes.
+NEIGHBOR_TABLE_DIR = "models/neighbors"
+NEIGHBORS_M = 100
+SEED_EXPANSION = False
+NEIGHBOR_BUILD_MEMORY = 512 * 1024 * 1024
+NEIGHBOR_BUILD_WORKERS = None
 
 # Paths for feedback-driven logistic regression
 FEEDBACK_CSV_PATH = "app/data/feedback.csv"
 LR_MODEL_PATH = "models/logistic_regression.joblib"
+# Online (incremental) learner state: model plus how much feedback it has seen
+LR_CHECKPOINT_PATH = "models/lr_checkpoint.joblib"
 MIN_FEEDBACK = 10
+# Per-user models, stored as rows of one memory-mapped weight matrix. Users
+# with USER_MIN_FEEDBACK rated tracks (likes and dislikes) get a model shrunk
+# toward the global one by USER_MODEL_L2; training fits USER_TRAIN_BLOCK
+# users per optimizer run.
+USER_MODEL_DIR = "models/user_models"
+USER_MIN_FEEDBACK = 5
+USER_MODEL_L2 = 1.0
+USER_TRAIN_BLOCK = 2048
+# Seconds between checks for a new model file, and how many new feedback rows
+# trigger a background retraining run (None disables retraining). Background
+# runs use the incremental learner unless INCREMENTAL_TRAINING is off.
+MODEL_POLL_INTERVAL = 10
+RETRAIN_EVERY = 500
+INCREMENTAL_TRAINING = True
+# Seconds between picking up feedback appended by other processes
+FEEDBACK_POLL_INTERVAL = 5
+# Seconds between picking up catalog deltas (added, changed or retired
+# tracks) published by other processes
+CATALOG_POLL_INTERVAL = 10
+# Feedback is buffered and written by a background thread at this interval
+FEEDBACK_FLUSH_INTERVAL = 0.5
+# After a failed write the thread retries with exponential backoff, capped at
+# this many seconds
+FEEDBACK_FLUSH_MAX_BACKOFF = 30
+
+# Bounded executor for recommendation scoring (beyond this, requests get 503)
+SCORING_WORKERS = 4
+SCORING_QUEUE_DEPTH = 64
+# Concurrent /recommend requests arriving within BATCH_WINDOW seconds of each
+# other (up to BATCH_MAX_SIZE) while a batch is being scored are scored together
+# as the next batch; an idle server dispatches at once. 0 disables batching
+BATCH_WINDOW = 0.002
+BATCH_MAX_SIZE = 32
+
+# LRU caches for cold-start (genre-only) recommendations and genre samples,
+# bounded by the total number of cached tracks
+RESPONSE_CACHE_SIZE = 50_000
+RESPONSE_CACHE_TTL = 3600
+
+# Server-side listening sessions: total memory budget in bytes (least recently
+# used sessions are evicted beyond it) and idle seconds before a session expires
+SESSION_MEMORY_BUDGET = 256 * 1024 * 1024
+SESSION_TTL = 1800
+
+# Paginated recommendations: cursors keep their ranking server-side, within a
+# total memory budget in bytes, until unused for CURSOR_TTL seconds. Rankings
+# are evaluated RANKING_BLOCK_SIZE candidates at a time.
+CURSOR_MEMORY_BUDGET = 256 * 1024 * 1024
+CURSOR_TTL = 600
+RANKING_BLOCK_SIZE = 1024
+
+# Requests slower than this (seconds) are logged with their stage breakdown.
+# With PROFILE_SLOW_REQUESTS on, requests are also sampled every
+# PROFILE_SAMPLE_INTERVAL seconds and slow ones dump a profile to PROFILE_DIR.
+SLOW_REQUEST_SECONDS = 1.0
+PROFILE_SLOW_REQUESTS = False
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_DIR = "profiles"
@@ -0,0 +1,252 @@
+"""
+In-process metrics, rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are registered once at import time and are
+updated from any thread. Callback metrics read their values (e.g. cache
+statistics or executor queue depth) only when `/metrics` is scraped.
+
+`span(stage)` times a stage of request handling into the stage histogram
+and, while a request is being tracked (see `track_request`), into that
+request's own stage breakdown, which the slow-request log and the sampling
+profiler use.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for labelled metrics; values are keyed by the label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra label, value) for rendering."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, "", value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts..., sum, count]
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield "_bucket", key, f'le="{_format_value(float(bound))}"', cumulative
+            yield "_bucket", key, 'le="+Inf"', entry[-1]
+            yield "_sum", key, "", entry[-2]
+            yield "_count", key, "", entry[-1]
+
+
+class CallbackMetric(Metric):
+    """
+    A gauge or counter whose values come from `fn()` at scrape time: a number
+    when there are no labels, else a dict of {label values tuple: number}.
+    """
+
+    def __init__(self, name: str, help: str, fn, kind: str = "gauge", labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        values = self.fn()
+        if not self.labelnames:
+            values = {(): values}
+        for key, value in values.items():
+            yield "", tuple(map(str, key)), "", value
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # Re-registering a name replaces it, e.g. when routes are reloaded
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, help: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def callback(name: str, help: str, fn, kind: str = "gauge", labelnames=()) -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, help, fn, kind, labelnames))
+
+
+STAGE_SECONDS = histogram(
+    "nunvibe_stage_duration_seconds", "Time spent in each stage of request handling",
+    ("stage",))
+
+
+class RequestTrace:
+    """Per-request record of stage timings and the threads doing its work."""
+
+    def __init__(self):
+        self.stages = []
+        self.threads = {}  # thread id -> open span depth
+        self._lock = threading.Lock()
+
+    def enter(self, thread_id: int):
+        with self._lock:
+            self.threads[thread_id] = self.threads.get(thread_id, 0) + 1
+
+    def exit(self, thread_id: int, stage: str, elapsed: float):
+        with self._lock:
+            self.stages.append((stage, elapsed))
+            depth = self.threads.get(thread_id, 0) - 1
+            if depth > 0:
+                self.threads[thread_id] = depth
+            else:
+                self.threads.pop(thread_id, None)
+
+    def active_threads(self) -> list:
+        with self._lock:
+            return list(self.threads)
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace():
+    """The RequestTrace of the request being handled, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def track_request():
+    """Collect the spans of the enclosed request handling into a RequestTrace."""
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into the stage histogram and the current request's trace."""
+    trace = _current_trace.get()
+    thread_id = threading.get_ident()
+    if trace is not None:
+        trace.enter(thread_id)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if trace is not None:
+            trace.exit(thread_id, stage, elapsed)
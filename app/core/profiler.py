@@ -0,0 +1,82 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+While profiled requests are in flight, a background thread periodically
+samples the Python stacks of the threads currently inside one of their spans
+(see `app.core.metrics.span`). When a request finishes above the threshold,
+its samples are written out as collapsed stacks ("frame;frame;frame count"
+per line), which flamegraph.pl, speedscope and similar tools read directly.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    """Samples the stacks of traced requests every `interval` seconds."""
+
+    def __init__(self, out_dir: str, interval: float = 0.005):
+        self.out_dir = out_dir
+        self.interval = interval
+        self._active = {}  # RequestTrace -> Counter of collapsed stacks
+        self._cond = threading.Condition()
+        self._sampler = None
+
+    def start(self, trace):
+        with self._cond:
+            self._active[trace] = Counter()
+            # Started lazily, so forked workers get their own sampler thread
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, name="request-profiler", daemon=True)
+                self._sampler.start()
+            self._cond.notify()
+
+    def stop(self, trace) -> Counter:
+        """Stop sampling a request and return its sampled stacks."""
+        with self._cond:
+            return self._active.pop(trace, Counter())
+
+    def _sample_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._active)
+                traces = list(self._active)
+            frames = sys._current_frames()
+            samples = [(trace, _collapse(frames[thread_id]))
+                       for trace in traces for thread_id in trace.active_threads()
+                       if thread_id in frames]
+            del frames
+            with self._cond:
+                for trace, stack in samples:
+                    # Skip requests that finished while we were sampling
+                    stacks = self._active.get(trace)
+                    if stacks is not None:
+                        stacks[stack] += 1
+            time.sleep(self.interval)
+
+    def dump(self, name: str, duration: float, trace, stacks: Counter) -> str:
+        """Write a request's stage breakdown and sampled stacks; return the path."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        safe_name = "".join(c if c.isalnum() else "_" for c in name).strip("_")
+        path = os.path.join(self.out_dir, f"{stamp}-{os.getpid()}-{safe_name}-{id(trace):x}.txt")
+        with open(path, "w") as f:
+            f.write(f"# {name} took {duration * 1e3:.1f} ms, "
+                    f"{sum(stacks.values())} samples every {self.interval * 1e3:g} ms\n")
+            for stage, elapsed in trace.stages:
+                f.write(f"# stage {stage}: {elapsed * 1e3:.3f} ms\n")
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
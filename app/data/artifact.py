@@ -0,0 +1,140 @@
+"""
+On-disk feature artifact for the catalog.
+
+The artifact is a directory of plain `.npy` files (one per array, so each can
+be memory-mapped and shared through the page cache across workers) plus a
+`meta.json` holding the format version, the source CSV digest, the genre
+vocabulary and the scaler parameters. Besides the features it holds the
+lookup tables (URIs in sorted order, song and artist ids with the rows
+sorted by their keys), so workers binary-search mapped arrays instead of
+each building dicts of every string on their own heap.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+ARTIFACT_VERSION = 3
+
+# Arrays stored as one .npy file each; everything else lives in meta.json
+ARRAY_FIELDS = ('genre_indices', 'genre_indptr', 'numeric', 'track_uris',
+                'track_names', 'artist_names', 'popularity', 'uri_sorted', 'uri_rows',
+                'song_ids', 'song_order', 'artist_ids', 'artist_order')
+
+
+def csv_digest(csv_path: str) -> str:
+    """Return the sha256 hex digest of the source CSV."""
+    h = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _csv_stamp(csv_path: str) -> list:
+    st = os.stat(csv_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def read_meta(artifact_dir: str):
+    """Return the artifact metadata, or None if there is no readable artifact."""
+    try:
+        with open(os.path.join(artifact_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(artifact_dir: str, csv_path: str) -> bool:
+    """Whether the artifact exists, has the current version and matches the CSV."""
+    meta = read_meta(artifact_dir)
+    if meta is None or meta.get('version') != ARTIFACT_VERSION:
+        return False
+    # Cheap size/mtime check first; only hash the CSV when that changed
+    if meta.get('csv_stamp') == _csv_stamp(csv_path):
+        return True
+    return meta.get('csv_sha256') == csv_digest(csv_path)
+
+
+def write_artifact(arrays: dict, meta: dict, artifact_dir: str, csv_path: str):
+    """Write arrays and metadata, replacing any existing artifact in one rename."""
+    parent = os.path.dirname(os.path.abspath(artifact_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.features-')
+    os.chmod(tmp_dir, 0o755)
+    for name in ARRAY_FIELDS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), arrays[name])
+
+    meta = dict(meta, version=ARTIFACT_VERSION,
+                csv_sha256=csv_digest(csv_path), csv_stamp=_csv_stamp(csv_path))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    replace_dir(tmp_dir, artifact_dir)
+
+
+def replace_dir(tmp_dir: str, target_dir: str):
+    """
+    Move a fully written `tmp_dir` (a sibling of `target_dir`) into place,
+    replacing any existing directory with renames only. Readers that already
+    mapped the old files keep them until they exit. If other processes
+    replace the same target at the same time, the last one to rename wins.
+    """
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    old_dir = tempfile.mkdtemp(dir=parent, prefix=f'.{os.path.basename(target_dir)}-old-')
+    try:
+        for attempt in range(100):
+            try:
+                os.rename(target_dir, os.path.join(old_dir, str(attempt)))
+            except FileNotFoundError:
+                pass  # nothing there yet, or another writer just moved it
+            try:
+                os.rename(tmp_dir, target_dir)
+                return
+            except OSError as exc:
+                # Another writer renamed its directory into place in between
+                if exc.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+        raise OSError(f"Could not replace {target_dir}: it keeps being replaced")
+    finally:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+@contextmanager
+def build_lock(target_dir: str):
+    """
+    Hold an exclusive lock (across processes, where supported) for building
+    `target_dir`, so that processes finding it stale at the same time build
+    it once: the others wait, then find it fresh.
+    """
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    os.makedirs(parent, exist_ok=True)
+    fd = os.open(os.path.join(parent, f'.{os.path.basename(target_dir)}.lock'),
+                 os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # also releases the lock
+
+
+def load_artifact(artifact_dir: str, mmap: bool = True):
+    """Return (arrays, meta) with the arrays memory-mapped read-only."""
+    meta = read_meta(artifact_dir)
+    mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(artifact_dir, f'{name}.npy'), mmap_mode=mode)
+        for name in ARRAY_FIELDS
+    }
+    return arrays, meta
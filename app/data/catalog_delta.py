@@ -0,0 +1,89 @@
+"""
+Catalog deltas: tracks appended, updated or retired on top of the feature
+artifact, without rebuilding it.
+
+Deltas live in the artifact's `deltas/` directory as one numbered directory
+each, written under a temporary name and renamed into place, so readers only
+ever see whole deltas. A delta holds the features of its upserted tracks in
+artifact layout, as new rows past the end of the catalog (`rows.npy` gives
+their row ids); `replaces.npy` gives the row each one takes over from (-1
+for a new track), which is retired along with the rows the delta retires
+outright. Row ids are never reused, so existing rows never change. In
+`meta.json` are the genres the delta adds to the vocabulary, which get new
+columns after the existing ones so column ids never move. Deltas apply in order, and
+only to the artifact they were written against (`base`, its CSV digest);
+rebuilding the artifact from a changed CSV drops them.
+"""
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock
+    fcntl = None
+
+# Arrays stored as one .npy file each; everything else lives in meta.json
+DELTA_ARRAYS = ('rows', 'replaces', 'retired', 'genre_indices', 'genre_indptr', 'numeric',
+                'track_uris', 'track_names', 'artist_names', 'popularity')
+
+
+class CatalogDelta(NamedTuple):
+    """One delta: its sequence number, meta.json contents and arrays."""
+    seq: int
+    meta: dict
+    arrays: dict
+
+
+def delta_root(artifact_dir: str) -> str:
+    return os.path.join(artifact_dir, 'deltas')
+
+
+def list_deltas(artifact_dir: str, after: int = 0) -> list[int]:
+    """Sequence numbers of the complete deltas newer than `after`, in order."""
+    try:
+        names = os.listdir(delta_root(artifact_dir))
+    except OSError:
+        return []
+    return sorted(seq for seq in (int(name) for name in names if name.isdigit()) if seq > after)
+
+
+def read_delta(artifact_dir: str, seq: int) -> CatalogDelta:
+    path = os.path.join(delta_root(artifact_dir), f'{seq:06d}')
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy')) for name in DELTA_ARRAYS}
+    return CatalogDelta(seq, meta, arrays)
+
+
+def write_delta(artifact_dir: str, seq: int, arrays: dict, meta: dict) -> CatalogDelta:
+    """Write delta number `seq`; fails if another writer already wrote it."""
+    root = delta_root(artifact_dir)
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix='.delta-')
+    os.chmod(tmp_dir, 0o755)
+    for name in DELTA_ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), arrays[name])
+    meta = dict(meta, seq=seq, created_at=time.time())
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    os.rename(tmp_dir, os.path.join(root, f'{seq:06d}'))
+    return CatalogDelta(seq, meta, arrays)
+
+
+@contextmanager
+def locked(artifact_dir: str):
+    """Hold the artifact's delta writer lock (across processes, where supported)."""
+    os.makedirs(delta_root(artifact_dir), exist_ok=True)
+    fd = os.open(os.path.join(delta_root(artifact_dir), '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # also releases the lock
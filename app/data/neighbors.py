@@ -0,0 +1,131 @@
+"""
+Precomputed item-to-item neighbour table.
+
+For every catalog row, the `m` most cosine-similar other rows, stored as an
+(N, m) int32 matrix of rows (`neighbors.npy`, most similar first) and the
+matching float16 similarities (`similarities.npy`), plus `meta.json` naming
+the catalog they were computed for. Both matrices are memory-mapped, so the
+table costs 6 * N * m bytes of page cache shared by all workers. A table
+stays valid as catalog deltas add rows (see app.data.catalog_delta): rows
+added after it was built have no list, and their seeds fall back to search.
+
+The table is built offline (scripts/build_neighbors.py): the catalog is
+scored against itself in row blocks sized to a memory budget, several blocks
+at a time on a thread pool (the sparse and dense products and the partial
+sorts release the GIL).
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from app.data import artifact
+from app.data.vector_index import BruteForceIndex
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Peak bytes per (query row, catalog row) pair while a block is scored:
+# similarities, their norms and distances, and the partition indices
+_BYTES_PER_PAIR = 48
+
+
+class NeighborTable(NamedTuple):
+    """Each row's neighbours, most similar first, and their cosine similarities."""
+    indices: np.ndarray
+    similarities: np.ndarray
+
+
+def block_size_for(n_rows: int, memory_budget: int, workers: int) -> int:
+    """Rows per block so that `workers` blocks in flight fit in `memory_budget` bytes."""
+    return max(1, memory_budget // (_BYTES_PER_PAIR * n_rows * workers))
+
+
+def build_neighbor_table(data, out_dir: str, m: int = 100, memory_budget: int = 512 << 20,
+                         workers: int = None) -> int:
+    """
+    Compute the top-`m` neighbours of every row of `data` (a ContentData)
+    exactly and write the table to `out_dir`, replacing any previous one in
+    one rename. Returns the number of neighbours per row, which is less than
+    `m` for catalogs with m rows or fewer.
+    """
+    n_rows = data.n_rows
+    m = min(m, n_rows - 1)
+    workers = workers or os.cpu_count() or 1
+    block_size = block_size_for(n_rows, memory_budget, workers)
+    index = BruteForceIndex(data.genre_matrix, data.numeric_matrix, data.row_norms,
+                            chunk_size=block_size)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.neighbors-')
+    os.chmod(tmp_dir, 0o755)
+    indices = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, 'neighbors.npy'), mode='w+', dtype=np.int32, shape=(n_rows, m))
+    similarities = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, 'similarities.npy'), mode='w+', dtype=np.float16,
+        shape=(n_rows, m))
+
+    def score_block(start: int):
+        stop = min(start + block_size, n_rows)
+        rows = np.arange(start, stop)
+        dists, nbrs = index.query(data.rows(rows), m + 1)
+        # Drop each row itself, wherever ties put it; rows found without
+        # themselves drop their (m + 1)-th neighbour instead
+        keep = np.argsort(nbrs == rows[:, None], axis=1, kind='stable')[:, :m]
+        indices[start:stop] = np.take_along_axis(nbrs, keep, axis=1)
+        similarities[start:stop] = 1 - np.take_along_axis(dists, keep, axis=1)
+
+    if m > 0:
+        with ThreadPoolExecutor(workers) as pool:
+            # list() re-raises the first failed block
+            list(pool.map(score_block, range(0, n_rows, block_size)))
+    indices.flush()
+    similarities.flush()
+    del indices, similarities
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'version': FORMAT_VERSION,
+            'n_rows': n_rows,
+            'm': m,
+            'catalog_version': data.version,
+            'catalog_base': data.base_version,
+            'built_at': time.time(),
+        }, f)
+
+    artifact.replace_dir(tmp_dir, out_dir)
+    return m
+
+
+def load_neighbor_table(table_dir: str, catalog_base, n_rows: int):
+    """
+    Memory-map the table in `table_dir`, or return None if there is none or
+    it was built for another catalog: one with another feature artifact
+    (`catalog_base`) or more rows than the `n_rows` the catalog has now.
+    """
+    meta = artifact.read_meta(table_dir)
+    if meta is None:
+        return None
+    table_rows = meta.get('n_rows')
+    if (meta.get('version') != FORMAT_VERSION or not isinstance(table_rows, int)
+            or table_rows > n_rows
+            or meta.get('catalog_base', meta.get('catalog_version')) != catalog_base):
+        logger.warning("Ignoring neighbour table in %s: built for another catalog", table_dir)
+        return None
+    try:
+        table = NeighborTable(
+            np.load(os.path.join(table_dir, 'neighbors.npy'), mmap_mode='r'),
+            np.load(os.path.join(table_dir, 'similarities.npy'), mmap_mode='r'))
+    except (OSError, ValueError):
+        return None
+    if (table.indices.shape != (table_rows, meta.get('m'))
+            or table.similarities.shape != table.indices.shape):
+        return None
+    logger.info("Loaded %d-neighbour table from %s", meta['m'], table_dir)
+    return table
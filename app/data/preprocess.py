@@ -1,125 +1,643 @@
-import pandas as pd
+import copy
+import heapq
+import logging
+import re
+
 import numpy as np
-from sklearn.preprocessing import MultiLabelBinarizer, MinMaxScaler
-from sklearn.neighbors import NearestNeighbors
-from app.core.config import CSV_PATH
+import scipy.sparse as sp
+from app.core.config import (
+    CSV_PATH,
+    FEATURE_ARTIFACT_DIR,
+    INGEST_CHUNK_SIZE,
+    IVF_NLIST,
+    IVF_NPROBE,
+    NEIGHBOR_TABLE_DIR,
+    RANKING_BLOCK_SIZE,
+    SEED_EXPANSION,
+    VECTOR_INDEX,
+)
+from app.core.metrics import span
+from app.data import artifact, catalog_delta
+from app.data.neighbors import load_neighbor_table
+from app.data.row_buffer import RowBuffer
+from app.data.vector_index import build_index
+from app.services.ranking import DiverseSelector, Ranking, SizedBlocks, row_mask
+
+logger = logging.getLogger(__name__)
+
+# Row separator and separator-adjacent whitespace for genre tokenizing
+_ROW_SEP = '\x01'  # not whitespace, and never part of a genre name
+_SEPARATOR_SPACE = re.compile(r'\s+(?=[,\x01])|(?<=[,\x01])\s+')
+
+NUMERIC_COLS = [
+    'Popularity', 'Danceability', 'Energy', 'Key', 'Loudness', 'Mode',
+    'Speechiness', 'Acousticness', 'Instrumentalness', 'Liveness', 'Valence', 'Tempo'
+]
 
 
 class ContentData:
-    def __init__(self, csv_path: str = CSV_PATH):
-        df = pd.read_csv(csv_path)
-        self.df = df
-
-        df['genres'] = (
-            df['Artist Genres']
-            .fillna('')
-            .apply(lambda s: [g.strip() for g in s.replace(';', ',').split(',') if g.strip()])
-        )
-        mlb = MultiLabelBinarizer()
-        genre_mat = mlb.fit_transform(df['genres'])
-
-        numeric_cols = [
-            'Popularity', 'Danceability', 'Energy', 'Key', 'Loudness', 'Mode',
-            'Speechiness', 'Acousticness', 'Instrumentalness', 'Liveness', 'Valence', 'Tempo'
-        ]
-        num_df = df[numeric_cols].fillna(df[numeric_cols].median())
-
-        scaler = MinMaxScaler()
-        numeric_mat = scaler.fit_transform(num_df)
-
-        self.numeric_cols = numeric_cols
-        self.features = np.hstack([genre_mat, numeric_mat])
-        self.track_uris = df['Track URI'].tolist()
-        self.track_names = df['Track Name'].tolist()
-        self.artist_names = df['Artist Name(s)'].tolist()
-        self.genre_encoder = mlb
-
-        self.knn = NearestNeighbors(n_neighbors=50, metric='cosine')
-        self.knn.fit(self.features)
+    def __init__(self, csv_path: str = CSV_PATH, artifact_dir: str = FEATURE_ARTIFACT_DIR,
+                 index: str = VECTOR_INDEX, index_params: dict = None,
+                 neighbor_dir: str = NEIGHBOR_TABLE_DIR):
+        # Load the precomputed artifact when there is one, rebuilding it first
+        # if the CSV changed; without an artifact dir, derive in memory.
+        if artifact_dir:
+            if not artifact.is_fresh(artifact_dir, csv_path):
+                with artifact.build_lock(artifact_dir):
+                    # Another worker may have rebuilt it while we waited
+                    if not artifact.is_fresh(artifact_dir, csv_path):
+                        build_feature_artifact(csv_path, artifact_dir)
+            arrays, meta = artifact.load_artifact(artifact_dir)
+        else:
+            arrays, meta = derive_features(csv_path)
+
+        # `version` names this snapshot: the artifact's CSV digest, plus the
+        # number of catalog deltas applied on top of it (see `apply_delta`)
+        self.version = self.base_version = meta.get('csv_sha256')
+        self.delta_seq = 0
+        self.artifact_dir = artifact_dir
+        self.numeric_cols = meta['numeric_cols']
+        self.scaler_params = meta['scaler']
+        # Sparse one-hot genre block next to a small dense numeric block for
+        # the artifact's rows; the combined matrix is only materialized on
+        # demand (see `features`). Rows that catalog deltas add come after
+        # them, in append-only buffers (see `_apply_delta`).
+        genre_indices = arrays['genre_indices']
+        self.n_base = self.n_rows = len(arrays['track_uris'])
+        self._genre = sp.csr_matrix(
+            (np.ones(len(genre_indices), dtype=np.float32),
+             genre_indices, arrays['genre_indptr']),
+            shape=(self.n_base, len(meta['genres'])))
+        self._numeric = arrays['numeric']
+        self.n_genres = self._genre.shape[1]
+        self.n_features = self.n_genres + self._numeric.shape[1]
+        # One-hot genres, so a row's genre sum is its squared genre norm
+        row_norms = np.sqrt(
+            np.asarray(self._genre.sum(axis=1)).ravel()
+            + np.einsum('ij,ij->i', self._numeric, self._numeric))
+        # Strings stay in the artifact's mapped arrays, shared by all workers
+        self._strings = (arrays['track_uris'], arrays['track_names'], arrays['artist_names'])
+        # Rows taken out of the catalog by deltas, sorted; row ids are never reused
+        self.retired_rows = np.empty(0, dtype=np.int64)
+
+        # sklearn is imported here rather than at module level, so importing
+        # the API doesn't pay for it before the catalog loads
+        from sklearn.preprocessing import MultiLabelBinarizer
+
+        # Vocabulary is fixed by the artifact, so the encoder needs no real fit
+        self.genre_encoder = MultiLabelBinarizer(classes=meta['genres'])
+        self.genre_encoder.fit([])
+        self.genre_to_col = {g: i for i, g in enumerate(meta['genres'])}
+
+        # URI lookups binary-search the artifact's sorted URIs; URIs that
+        # deltas add or retire go in a small overlay (see `lookup`)
+        self._uri_sorted, self._uri_rows = arrays['uri_sorted'], arrays['uri_rows']
+        self._uri_overlay = {}
+        # Integer ids for dedup/diversity checks. Song (name|artist) and
+        # primary-artist keys that deltas add get the next free ids (see `_key_ids`)
+        self._base_keys = (arrays['track_names'], arrays['artist_names'],
+                           (arrays['song_order'], arrays['song_ids']),
+                           (arrays['artist_order'], arrays['artist_ids']))
+        self._new_keys = ({}, {})
+        self._n_keys = (int(arrays['song_ids'].max(initial=-1)) + 1,
+                        int(arrays['artist_ids'].max(initial=-1)) + 1)
+
+        # Per-row arrays over every row, and the features and strings of the
+        # rows deltas added, each in a buffer later snapshots append to
+        self._per_row = {
+            'row_norms': RowBuffer(row_norms),
+            'popularity': RowBuffer(arrays['popularity']),
+            'song_ids': RowBuffer(arrays['song_ids']),
+            'artist_ids': RowBuffer(arrays['artist_ids']),
+        }
+        self._tail = {
+            'genre_indices': RowBuffer(np.empty(0, dtype=np.int32)),
+            'genre_indptr': RowBuffer(np.zeros(1, dtype=np.int64)),
+            'numeric': RowBuffer(np.empty((0, self._numeric.shape[1]), dtype=np.float32)),
+            'track_uris': RowBuffer(np.empty(0, dtype=object)),
+            'track_names': RowBuffer(np.empty(0, dtype=object)),
+            'artist_names': RowBuffer(np.empty(0, dtype=object)),
+        }
+        self._set_views()
+
+        # Fixed popularity ranking; deltas insert their rows into it
+        self.popularity_order = Ranking(np.argsort(-self.popularity, kind='stable'))
+
+        # Genre -> rows inverted index, each posting list most popular first.
+        # Postings for genre column c are genre_postings[genre_offsets[c]:genre_offsets[c + 1]],
+        # plus, for rows that deltas added, _tail_postings[c].
+        coo = self._genre.tocoo()
+        order = np.lexsort((coo.row, -self.popularity[coo.row], coo.col))
+        self.genre_postings = coo.row[order].astype(np.int64)
+        self.genre_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(coo.col, minlength=self.n_genres))])
+        self._tail_postings = {}
+
+        # Nearest-neighbour backend over the artifact's rows: exact brute
+        # force or approximate IVF (rows added by deltas are scanned exactly)
+        if index_params is None:
+            index_params = {'nlist': IVF_NLIST, 'nprobe': IVF_NPROBE} if index == 'ivf' else {}
+        self.index = build_index(index, self._genre, self._numeric, self.row_norms, **index_params)
+
+        # Catalog deltas written since the artifact was built
+        if artifact_dir:
+            for seq in catalog_delta.list_deltas(artifact_dir):
+                self._apply_delta(catalog_delta.read_delta(artifact_dir, seq))
+
+        # Precomputed neighbour lists for seed expansion, if built for this catalog
+        self.neighbors = None
+        if SEED_EXPANSION and neighbor_dir:
+            self.neighbors = load_neighbor_table(neighbor_dir, self.base_version, self.n_rows)
+            if self.neighbors is not None and len(self.neighbors.indices) < self.n_rows:
+                logger.info("Neighbour table covers %d of %d rows; seeds added since use search",
+                            len(self.neighbors.indices), self.n_rows)
+
+    def _set_views(self):
+        """Point the per-row attributes at this snapshot's rows of the buffers."""
+        n_tail = self.n_rows - self.n_base
+        for name, buffer in self._per_row.items():
+            setattr(self, name, buffer.view(self.n_rows))
+        indptr = self._tail['genre_indptr'].view(n_tail + 1)
+        indices = self._tail['genre_indices'].view(indptr[-1])
+        self._tail_genre = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(n_tail, self.n_genres))
+        self._tail_numeric = self._tail['numeric'].view(n_tail)
+        self._tail_strings = tuple(self._tail[name].view(n_tail)
+                                   for name in ('track_uris', 'track_names', 'artist_names'))
+
+    @property
+    def genre_matrix(self) -> sp.csr_matrix:
+        """Genre block of every row, built on each access once deltas added rows or genres."""
+        base = _widened(self._genre, self.n_genres)
+        if self.n_rows == self.n_base:
+            return base
+        return sp.vstack([base, self._tail_genre], format='csr')
+
+    @property
+    def numeric_matrix(self) -> np.ndarray:
+        """Numeric block of every row, built on each access once deltas added rows."""
+        if self.n_rows == self.n_base:
+            return self._numeric
+        return np.vstack([self._numeric, self._tail_numeric])
+
+    @property
+    def features(self) -> sp.csr_matrix:
+        """Full (genre + numeric) feature matrix as CSR, built on each access."""
+        return sp.hstack([self.genre_matrix, sp.csr_matrix(self.numeric_matrix)], format='csr')
+
+    @property
+    def track_uris(self) -> np.ndarray:
+        """Every row's URI, concatenated on each access once deltas added rows."""
+        if self.n_rows == self.n_base:
+            return self._strings[0]
+        return np.concatenate([self._strings[0].astype(object), self._tail_strings[0]])
+
+    def _in_tail(self, idxs: np.ndarray) -> np.ndarray:
+        return idxs >= self.n_base if self.n_rows > self.n_base else np.zeros(len(idxs), dtype=bool)
+
+    def _genre_rows(self, idxs) -> sp.csr_matrix:
+        """Genre block of the given rows, with a column for every genre."""
+        idxs = np.asarray(idxs, dtype=np.int64)
+        in_tail = self._in_tail(idxs)
+        if not in_tail.any():
+            return _widened(self._genre[idxs], self.n_genres)
+        stacked = sp.vstack([_widened(self._genre[idxs[~in_tail]], self.n_genres),
+                             self._tail_genre[idxs[in_tail] - self.n_base]], format='csr')
+        # Back from (artifact rows, added rows) to the order of `idxs`
+        position = np.empty(len(idxs), dtype=np.int64)
+        position[np.concatenate([np.flatnonzero(~in_tail), np.flatnonzero(in_tail)])] = \
+            np.arange(len(idxs))
+        return stacked[position]
+
+    def _numeric_rows(self, idxs) -> np.ndarray:
+        """Numeric block of the given rows."""
+        idxs = np.asarray(idxs, dtype=np.int64)
+        in_tail = self._in_tail(idxs)
+        if not in_tail.any():
+            return self._numeric[idxs]
+        out = np.empty((len(idxs), self._numeric.shape[1]), dtype=self._numeric.dtype)
+        out[~in_tail] = self._numeric[idxs[~in_tail]]
+        out[in_tail] = self._tail_numeric[idxs[in_tail] - self.n_base]
+        return out
+
+    def rows(self, idxs) -> np.ndarray:
+        """Return dense feature vectors for the given catalog rows."""
+        return np.hstack([self._genre_rows(idxs).toarray(), self._numeric_rows(idxs)])
+
+    def sparse_rows(self, idxs) -> sp.csr_matrix:
+        """Return the feature vectors of the given catalog rows as CSR."""
+        return sp.hstack([self._genre_rows(idxs), sp.csr_matrix(self._numeric_rows(idxs))],
+                         format='csr')
+
+    def dot(self, vecs: np.ndarray, rows=None) -> np.ndarray:
+        """Multiply the feature matrix (or its `rows`) by a (D,) vector or (D, m) matrix."""
+        vecs = np.asarray(vecs, dtype=np.float32)
+        if rows is not None:
+            return (self._genre_rows(rows) @ vecs[:self.n_genres]
+                    + self._numeric_rows(rows) @ vecs[self.n_genres:])
+        out = self._genre @ vecs[:self._genre.shape[1]] + self._numeric @ vecs[self.n_genres:]
+        if self.n_rows > self.n_base:
+            out = np.concatenate([out, self._tail_genre @ vecs[:self.n_genres]
+                                  + self._tail_numeric @ vecs[self.n_genres:]])
+        return out
+
+    def widen(self, coefs: np.ndarray) -> np.ndarray:
+        """
+        Pad per-feature coefficients fitted before a delta added genres (a
+        narrower last axis) with zeros for the new genre columns, which sit
+        between the old genres and the numeric block.
+        """
+        missing = self.n_features - coefs.shape[-1]
+        if missing <= 0:
+            return coefs
+        split = coefs.shape[-1] - self._numeric.shape[1]
+        return np.insert(coefs, [split] * missing, 0, axis=-1)
+
+    def kneighbors(self, query: np.ndarray, n_neighbors: int):
+        """
+        Cosine neighbours of each query row, as (distances, indices): the
+        index's neighbours among the artifact's rows, merged with an exact
+        scan of the rows deltas added.
+        """
+        query = np.atleast_2d(query)
+        base_genres = self._genre.shape[1]
+        if base_genres == self.n_genres:
+            dists, idxs = self.index.query(query, n_neighbors)
+        else:
+            # The index predates the newest genres, which its rows don't have:
+            # search without them, then rescale to the full query's norm
+            narrow = np.hstack([query[:, :base_genres], query[:, self.n_genres:]])
+            dists, idxs = self.index.query(narrow, n_neighbors)
+            norms = np.linalg.norm(query, axis=1)
+            scale = np.divide(np.linalg.norm(narrow, axis=1), norms,
+                              out=np.zeros_like(norms), where=norms > 0)
+            dists = 1 - (1 - dists) * scale[:, None].astype(dists.dtype)
+        if self.n_rows == self.n_base:
+            return dists, idxs
+
+        q = np.asarray(query, dtype=np.float32).T
+        sims = (self._tail_genre @ q[:self.n_genres] + self._tail_numeric @ q[self.n_genres:]).T
+        denom = np.outer(np.linalg.norm(query, axis=1), self.row_norms[self.n_base:])
+        # Zero vectors are treated as orthogonal to everything, like the index
+        np.divide(sims, denom, out=sims, where=denom > 0)
+        sims[denom == 0] = 0
+        dists = np.hstack([dists, 1 - sims])
+        idxs = np.hstack([idxs, np.broadcast_to(np.arange(self.n_base, self.n_rows), sims.shape)])
+        best = np.argsort(dists, axis=1, kind='stable')[:, :n_neighbors]
+        return np.take_along_axis(dists, best, axis=1), np.take_along_axis(idxs, best, axis=1)
+
+    def predict_proba(self, model, rows=None) -> np.ndarray:
+        """Positive-class probability of a binary model for every catalog row (or `rows`)."""
+        coef = getattr(model, 'coef_', None)
+        if coef is not None:
+            coef = self.widen(coef)
+        if coef is None or coef.shape != (1, self.n_features):
+            features = self.features if rows is None else self.sparse_rows(rows)
+            return model.predict_proba(features)[:, 1]
+        # Linear models are scored block by block, without densifying
+        logits = self.dot(coef[0], rows) + model.intercept_[0]
+        return 1 / (1 + np.exp(-logits))
+
+    def neighbor_blocks(self, query: np.ndarray, n_first: int) -> SizedBlocks:
+        """
+        Yield a query vector's neighbours nearest first: the first `n_first`,
+        then the new rows of searches twice as deep as the last, until the
+        whole catalog is covered. Deeper searches only run if they are used.
+        """
+        yielded = np.zeros(self.n_rows, dtype=bool)
+        return SizedBlocks(self._neighbor_blocks(query, n_first, yielded), yielded.nbytes)
+
+    def _neighbor_blocks(self, query: np.ndarray, n_first: int, yielded: np.ndarray):
+        n_rows = len(yielded)
+        n = min(max(n_first, 1), n_rows)
+        while True:
+            _, nbrs = self.kneighbors(query[None, :], n_neighbors=n)
+            # Only rows not yielded yet, in case an approximate index reorders
+            block = nbrs[0][~yielded[nbrs[0]]]
+            yielded[block] = True
+            if len(block):
+                yield block
+            if n >= n_rows:
+                return
+            n = min(n * 2, n_rows)
+
+    def expand_seeds(self, seed_genres, seed_idxs: np.ndarray,
+                     seed_sum: np.ndarray = None) -> np.ndarray:
+        """
+        The union of the seed tracks' precomputed neighbour lists, ranked by
+        cosine similarity to the taste vector (see `user_vectors`). Only the
+        len(seed_idxs) * m listed rows are scored, not the whole catalog.
+        Returns None if a seed was added after the table was built.
+        """
+        seed_idxs = np.asarray(seed_idxs)
+        if (seed_idxs >= len(self.neighbors.indices)).any():
+            return None
+        rows = np.unique(self.neighbors.indices[seed_idxs])
+        vec = self.user_vectors([seed_genres], [seed_idxs], [seed_sum])[0].astype(np.float32)
+        sims = self.dot(vec, rows)
+        norms = self.row_norms[rows]
+        np.divide(sims, norms, out=sims, where=norms > 0)
+        return rows[np.argsort(-sims, kind='stable')]
+
+    def lookup(self, uris: list[str]) -> np.ndarray:
+        """Return the catalog row for each URI, or -1 where the URI is unknown."""
+        if not len(uris):
+            return np.empty(0, dtype=np.int64)
+        queries = np.asarray(uris, dtype=str)
+        sorted_uris = self._uri_sorted
+        pos = np.minimum(np.searchsorted(sorted_uris, queries), len(sorted_uris) - 1)
+        idxs = np.where(sorted_uris[pos] == queries, self._uri_rows[pos], -1)
+        if self._uri_overlay:
+            overlay = self._uri_overlay
+            for i, uri in enumerate(queries.tolist()):
+                if uri in overlay:
+                    idxs[i] = overlay[uri]
+        return idxs
+
+    def indices_for(self, uris: list[str]) -> np.ndarray:
+        """Return catalog rows for the known URIs, in input order."""
+        idxs = self.lookup(uris)
+        return idxs[idxs >= 0]
 
     def list_genres(self):
         return sorted(self.genre_encoder.classes_.tolist())
 
     def sample_popular_by_genres(self, genres, limit):
-        mask = self.df['genres'].apply(lambda gl: any(g in gl for g in genres))
-        filtered = self.df.loc[mask]
-        top = filtered.sort_values('Popularity', ascending=False).head(limit)
-        return [{"uri": row['Track URI'], "name": row['Track Name'], "artist": row['Artist Name(s)']} for _, row in top.iterrows()]
+        # k-way merge of the genres' popularity-sorted posting lists
+        cols = {self.genre_to_col[g] for g in genres if g in self.genre_to_col}
+        postings = [self.genre_postings[self.genre_offsets[c]:self.genre_offsets[c + 1]]
+                    for c in cols if c < len(self.genre_offsets) - 1]
+        postings += [self._tail_postings[c] for c in cols if c in self._tail_postings]
+        retired = set(self.retired_rows.tolist())
+        heap = [(-self.popularity[p[0]], p[0], i, 0) for i, p in enumerate(postings) if len(p)]
+        heapq.heapify(heap)
+        top, seen = [], set()
+        while heap and len(top) < limit:
+            _, row, i, pos = heapq.heappop(heap)
+            if row not in seen and row not in retired:  # tracks can be in several of the genres
+                seen.add(row)
+                top.append(row)
+            if pos + 1 < len(postings[i]):
+                nxt = postings[i][pos + 1]
+                heapq.heappush(heap, (-self.popularity[nxt], nxt, i, pos + 1))
+        return self.tracks(top)
+
+    def user_vectors(self, seed_genres_list: list, seed_idxs_list: list,
+                     seed_sums: list = None) -> np.ndarray:
+        """
+        One taste vector per user: the mean of the user's one-hot genre vector
+        (zero-padded over the numeric columns) and their seed-track vectors.
+        `seed_sums` may supply an already-computed sum of a user's seed-track
+        vectors (None entries are computed here).
+        """
+        vecs = np.zeros((len(seed_genres_list), self.n_features))
+        vecs[:, :self.n_genres] = self.genre_encoder.transform(seed_genres_list)
+        for i, t_idxs in enumerate(seed_idxs_list):
+            if len(t_idxs):
+                t_sum = seed_sums[i] if seed_sums is not None else None
+                if t_sum is None:
+                    t_sum = self.rows(t_idxs).sum(axis=0)
+                vecs[i] = (vecs[i] + t_sum) / (len(t_idxs) + 1)
+        return vecs
 
     def recommend(self, seed_genres, seed_uris, k):
-        # 1) One‐hot genre component
-        g_vec = self.genre_encoder.transform([seed_genres])[0]
-        t_idxs = [self.track_uris.index(
-            uri) for uri in seed_uris if uri in self.track_uris]
-        t_vecs = self.features[t_idxs] if t_idxs else np.empty(
-            (0, self.features.shape[1]))
-        if t_vecs.shape[0] > 0:
-            all_vecs = np.vstack(
-                [np.hstack([g_vec, np.zeros(len(self.numeric_cols))]), t_vecs])
-            user_vec = all_vecs.mean(axis=0)[None, :]
+        return self.recommend_many([(seed_genres, seed_uris, k)])[0]
+
+    def recommend_many(self, queries: list) -> list[list[dict]]:
+        """Content-based recommendations for many (seed_genres, seed_uris, k) queries at once."""
+        return self.recommend_rows(
+            [seed_genres for seed_genres, _, _ in queries],
+            [self.indices_for(seed_uris) for _, seed_uris, _ in queries],
+            [k for _, _, k in queries])
+
+    def recommend_rows(self, seed_genres_list: list, seed_idxs_list: list, ks: list,
+                       seed_sums: list = None) -> list[list[dict]]:
+        """
+        `recommend_many` with seed tracks given as catalog rows (see
+        `user_vectors`). With a neighbour table, users with seed tracks get
+        their candidates from `expand_seeds`; the rest share one KNN search.
+        """
+        if not ks:
+            return []
+        candidates = [None] * len(ks)
+        if self.neighbors is not None:
+            with span("content.expand_seeds"):
+                for i, (seed_genres, t_idxs) in enumerate(zip(seed_genres_list, seed_idxs_list)):
+                    if len(t_idxs):
+                        candidates[i] = self.expand_seeds(
+                            seed_genres, t_idxs, seed_sums[i] if seed_sums is not None else None)
+
+        search = [i for i, c in enumerate(candidates) if c is None]
+        if search:
+            with span("content.user_vectors"):
+                user_vecs = self.user_vectors(
+                    [seed_genres_list[i] for i in search], [seed_idxs_list[i] for i in search],
+                    [seed_sums[i] for i in search] if seed_sums is not None else None)
+
+            # Start with a larger search to ensure we get enough unique results
+            # Search 3x more to account for duplicates and exclusions
+            search_ks = [min(ks[i] * 3, self.n_rows) for i in search]
+            with span("content.kneighbors"):
+                dists, nbrs = self.kneighbors(user_vecs, n_neighbors=max(search_ks))
+            for i, user_nbrs, search_k in zip(search, nbrs, search_ks):
+                candidates[i] = user_nbrs[:search_k]
+
+        results = []
+        with span("content.select"):
+            for k, t_idxs, user_candidates in zip(ks, seed_idxs_list, candidates):
+                exclude = row_mask(self.n_rows, t_idxs)
+                exclude[self.retired_rows] = True
+                selector = DiverseSelector(self.song_ids, self.artist_ids, exclude, k)
+                # If we still don't have enough recommendations, fall back to popularity
+                if not selector.extend(user_candidates):
+                    for block in self.popularity_order.blocks(RANKING_BLOCK_SIZE):
+                        if selector.extend(block):
+                            break
+                results.append(self.tracks(selector.selected))
+        return results
+
+    def derive_delta(self, tracks, retire_uris=()) -> tuple:
+        """
+        Turn upserted tracks (a DataFrame with the catalog CSV's columns) and
+        URIs to retire into the (arrays, meta) of the next catalog delta (see
+        app.data.catalog_delta). Every upserted track gets a new row after
+        the existing ones; a track already in the catalog retires the row it
+        had (`replaces`). Unseen genres get new columns, and the numeric
+        columns go through the catalog's fitted scaler, not a refit.
+        """
+        required = ['Track URI', 'Track Name', 'Artist Name(s)', 'Artist Genres'] + self.numeric_cols
+        missing = [col for col in required if col not in tracks.columns]
+        if missing:
+            raise ValueError(f"Tracks are missing columns: {missing}")
+        tracks = tracks.drop_duplicates('Track URI', keep='last').reset_index(drop=True)
+        uris = tracks['Track URI'].astype(str).tolist()
+        if set(uris) & set(retire_uris):
+            raise ValueError("A track can't be both upserted and retired")
+
+        n_old = self.n_rows
+        replaces = self.lookup(uris)
+        retired = np.unique(self.indices_for(list(retire_uris)))
+
+        # Known genres keep their column; new ones are appended in order of appearance
+        token_rows, codes, uniques = _genre_tokens(tracks['Artist Genres'])
+        new_genres = [g for g in uniques if g not in self.genre_to_col]
+        cols = {g: self.n_genres + i for i, g in enumerate(new_genres)}
+        token_cols = np.array([self.genre_to_col.get(g, cols.get(g)) for g in uniques],
+                              dtype=np.int64)[codes]
+        genre_mat = sp.csr_matrix(
+            (np.ones(len(token_rows), dtype=np.float32), (token_rows, token_cols)),
+            shape=(len(tracks), self.n_genres + len(new_genres)))
+        genre_mat.sum_duplicates()
+
+        # Same median fill and min-max scaling as `derive_features`, with its parameters
+        scaler = self.scaler_params
+        numeric = tracks[self.numeric_cols].astype(np.float32).to_numpy(copy=True)
+        np.copyto(numeric, np.asarray(scaler['medians'], dtype=np.float32)[None, :].repeat(
+            len(numeric), axis=0), where=np.isnan(numeric))
+        popularity = numeric[:, self.numeric_cols.index('Popularity')].astype(np.float64)
+        numeric *= np.asarray(scaler['scale']).astype(np.float32)
+        numeric += np.asarray(scaler['min']).astype(np.float32)
+
+        arrays = {
+            'rows': n_old + np.arange(len(uris), dtype=np.int64),
+            'replaces': replaces,
+            'retired': retired,
+            'genre_indices': genre_mat.indices.astype(np.int32),
+            'genre_indptr': genre_mat.indptr.astype(np.int64),
+            'numeric': numeric,
+            'track_uris': np.array(uris, dtype=str),
+            'track_names': tracks['Track Name'].fillna('').astype(str).to_numpy(dtype=str),
+            'artist_names': tracks['Artist Name(s)'].fillna('').astype(str).to_numpy(dtype=str),
+            'popularity': popularity,
+        }
+        meta = {'base': self.base_version, 'n_rows': n_old + len(uris),
+                'added': int((replaces < 0).sum()), 'genres': new_genres}
+        return arrays, meta
+
+    def apply_delta(self, delta) -> 'ContentData':
+        """
+        Return a new snapshot of the catalog with `delta` (the next
+        CatalogDelta in sequence) applied. This snapshot is left as it is, so
+        requests already using it are unaffected.
+
+        The work is proportional to the delta, not the catalog: its rows are
+        appended to buffers this snapshot shares (past the rows it sees),
+        inserted into the rankings by binary search and scanned exactly next
+        to the vector index; the vocabulary, scaler and index are kept.
+        """
+        data = copy.copy(self)
+        data._apply_delta(delta)
+        return data
+
+    def _apply_delta(self, delta):
+        # Attributes are only ever rebound, and buffers only written past the
+        # rows existing snapshots see, so the snapshot this one was copied
+        # from keeps its own
+        meta, arrays = delta.meta, delta.arrays
+        n_old, n_rows = self.n_rows, meta['n_rows']
+        rows = arrays['rows'].astype(np.int64)
+        if (meta['base'] != self.base_version or delta.seq != self.delta_seq + 1
+                or not np.array_equal(rows, np.arange(n_old, n_rows))):
+            raise ValueError(f"Catalog delta {delta.seq} does not apply to version {self.version}")
+
+        if meta['genres']:
+            from sklearn.preprocessing import MultiLabelBinarizer
+
+            genres = list(self.genre_encoder.classes_) + meta['genres']
+            self.genre_encoder = MultiLabelBinarizer(classes=genres)
+            self.genre_encoder.fit([])
+            self.genre_to_col = {g: i for i, g in enumerate(genres)}
+            self.n_genres = len(genres)
+            self.n_features = self.n_genres + self._numeric.shape[1]
+
+        # Append the rows' features and strings to the tail buffers
+        n_tail, nnz = n_old - self.n_base, self._tail_genre.nnz
+        tail = self._tail = dict(self._tail)
+        tail['genre_indices'] = tail['genre_indices'].extended(nnz, arrays['genre_indices'])
+        tail['genre_indptr'] = tail['genre_indptr'].extended(
+            n_tail + 1, arrays['genre_indptr'][1:] + nnz)
+        tail['numeric'] = tail['numeric'].extended(n_tail, arrays['numeric'])
+        for name in ('track_uris', 'track_names', 'artist_names'):
+            tail[name] = tail[name].extended(n_tail, np.array(arrays[name].tolist(), dtype=object))
+
+        # ... and their derived values to the per-row buffers
+        names, artists = arrays['track_names'].tolist(), arrays['artist_names'].tolist()
+        self._new_keys = (dict(self._new_keys[0]), dict(self._new_keys[1]))
+        row_norms = np.sqrt(np.diff(arrays['genre_indptr'])
+                            + np.einsum('ij,ij->i', arrays['numeric'], arrays['numeric']))
+        per_row = self._per_row = dict(self._per_row)
+        for name, values in (
+                ('row_norms', row_norms.astype(self.row_norms.dtype)),
+                ('popularity', arrays['popularity']),
+                ('song_ids', self._key_ids(0, [f"{n}|{a}" for n, a in zip(names, artists)])),
+                ('artist_ids', self._key_ids(1, [primary_artist(a) for a in artists]))):
+            per_row[name] = per_row[name].extended(n_old, values)
+        self.n_rows = n_rows
+        self._set_views()
+
+        # Retired: the rows the delta retires, and the old rows of the tracks it updated
+        replaced = arrays['replaces'][arrays['replaces'] >= 0]
+        self.retired_rows = np.union1d(
+            self.retired_rows, np.concatenate([arrays['retired'], replaced]).astype(np.int64))
+        overlay = self._uri_overlay = dict(self._uri_overlay)
+        for row in arrays['retired'].tolist():
+            overlay[self._track_strings(row)[0]] = -1
+        overlay.update(zip(arrays['track_uris'].tolist(), rows.tolist()))
+
+        self.popularity_order = self.popularity_order.inserted(self.popularity, rows)
+        self._update_postings(rows, arrays['genre_indices'], arrays['genre_indptr'])
+        self.delta_seq = delta.seq
+        self.version = f"{self.base_version}+{delta.seq}"
+
+    def _key_ids(self, kind: int, keys: list) -> list:
+        """
+        Ids for song (kind 0) or primary-artist (kind 1) keys: the artifact's
+        id for a key it has, found by binary search over its rows in key
+        order, else the id given to the key by the delta that first added it.
+        """
+        names, artists = self._base_keys[:2]
+        if kind == 0:
+            def key_of(row):
+                return f"{names[row]}|{artists[row]}"
         else:
-            zero_pad = np.zeros(len(self.numeric_cols))
-            user_vec = np.hstack([g_vec, zero_pad])[None, :]
-
-        # Start with a larger search to ensure we get enough unique results
-        # Search 3x more to account for duplicates and exclusions
-        search_k = min(k * 3, len(self.track_uris))
-        dists, nbrs = self.knn.kneighbors(
-            user_vec, n_neighbors=search_k)
-
-        recs = []
-        seen_uris = set()
-        seen_songs = set()  # Track unique song+artist combinations
-
-        for idx in nbrs[0]:
-            uri = self.track_uris[idx]
-            if uri not in seed_uris and uri not in seen_uris:
-                song_name = self.track_names[idx]
-                artist_name = self.artist_names[idx]
-
-                # Create a unique key for song+artist combination
-                song_key = f"{song_name}|{artist_name}"
-
-                if song_key in seen_songs:
-                    continue
-                seen_songs.add(song_key)
-
-                recs.append(
-                    {"uri": uri, "name": song_name, "artist": artist_name})
-                seen_uris.add(uri)
-                if len(recs) >= k:
-                    break
-
-        # If we still don't have enough recommendations, expand search to all tracks
-        if len(recs) < k:
-            # Get all track indices and sort by popularity or other criteria
-            all_indices = list(range(len(self.track_uris)))
-
-            # Sort by popularity (assuming popularity is in the first numeric column)
-            popularity_scores = self.features[:, len(
-                self.genre_encoder.classes_)]  # Popularity column
-            sorted_indices = sorted(
-                all_indices, key=lambda i: popularity_scores[i], reverse=True)
-
-            for idx in sorted_indices:
-                uri = self.track_uris[idx]
-                if uri not in seed_uris and uri not in seen_uris:
-                    song_name = self.track_names[idx]
-                    artist_name = self.artist_names[idx]
-
-                    song_key = f"{song_name}|{artist_name}"
-
-                    if song_key in seen_songs:
-                        continue
-                    seen_songs.add(song_key)
-
-                    recs.append(
-                        {"uri": uri, "name": song_name, "artist": artist_name})
-                    seen_uris.add(uri)
-                    if len(recs) >= k:
-                        break
-
-        return recs
+            def key_of(row):
+                return primary_artist(artists[row])
+        order, ids = self._base_keys[2 + kind]
+        new_keys = self._new_keys[kind]
+        out = []
+        for key in keys:
+            row = _find_key(order, key_of, key)
+            if row >= 0:
+                out.append(int(ids[row]))
+            else:
+                out.append(new_keys.setdefault(key, self._n_keys[kind] + len(new_keys)))
+        return out
+
+    def _update_postings(self, rows: np.ndarray, genre_indices: np.ndarray,
+                         genre_indptr: np.ndarray):
+        """File appended rows in the posting lists of their genres' added rows."""
+        postings = self._tail_postings = dict(self._tail_postings)
+        cols = genre_indices.astype(np.int64)
+        genre_rows = np.repeat(rows, np.diff(genre_indptr))
+        for c in np.unique(cols).tolist():
+            merged = np.concatenate([postings.get(c, genre_rows[:0]), genre_rows[cols == c]])
+            postings[c] = merged[np.lexsort((merged, -self.popularity[merged]))]
+
+    def _track_strings(self, row: int) -> tuple:
+        """(uri, name, artist) of a catalog row."""
+        if row < self.n_base:
+            return tuple(str(values[row]) for values in self._strings)
+        row -= self.n_base
+        return tuple(values[row] for values in self._tail_strings)
+
+    def tracks(self, idxs) -> list[dict]:
+        """Return track dicts for the given catalog rows."""
+        out = []
+        for i in idxs:
+            uri, name, artist = self._track_strings(i)
+            out.append({"uri": uri, "name": name, "artist": artist})
+        return out
 
     def get_track_info(self, uris: list[str]) -> list[dict]:
         """Return track information for the given URIs, removing duplicates by song name and artist."""
@@ -127,15 +645,13 @@ class ContentData:
         seen_songs = set()  # Track unique song+artist combinations
         result = []
 
-        for uri in uris:
+        for uri, idx in zip(uris, self.lookup(uris).tolist()):
             if uri in seen_uris:
                 continue
             seen_uris.add(uri)
 
-            if uri in self.track_uris:
-                idx = self.track_uris.index(uri)
-                song_name = self.track_names[idx]
-                artist_name = self.artist_names[idx]
+            if idx >= 0:
+                _, song_name, artist_name = self._track_strings(idx)
 
                 # Create a unique key for song+artist combination
                 song_key = f"{song_name}|{artist_name}"
@@ -153,8 +669,167 @@ class ContentData:
         return result
 
 
+def _widened(genre: sp.csr_matrix, n_genres: int) -> sp.csr_matrix:
+    """A genre block with columns added (empty) up to `n_genres`."""
+    if genre.shape[1] == n_genres:
+        return genre
+    return sp.csr_matrix((genre.data, genre.indices, genre.indptr),
+                         shape=(genre.shape[0], n_genres))
+
+
+def _find_key(order: np.ndarray, key_of, key: str) -> int:
+    """Binary-search `order` (rows sorted by `key_of(row)`) for a row with `key`, else -1."""
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key_of(order[mid]) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return int(order[lo]) if lo < len(order) and key_of(order[lo]) == key else -1
+
+
 def load_feature_matrix(uris: list[str]) -> np.ndarray:
     """Return feature matrix rows corresponding to the provided track URIs."""
-    data = ContentData()
-    idxs = [data.track_uris.index(u) for u in uris if u in data.track_uris]
-    return data.features[idxs]
+    from app.services.registry import get_content_data
+
+    data = get_content_data()
+    return data.rows(data.indices_for(uris))
+
+
+def _genre_tokens(genres) -> tuple:
+    """
+    Tokenize a Series of 'Artist Genres' strings (comma- or semicolon-separated)
+    into (row positions, token codes, distinct tokens), with whitespace
+    stripped and empty tokens dropped.
+
+    The column is joined into one string with a row separator, normalized with
+    one regex pass and split once, so the work is a few C-level passes over
+    the text instead of a Python call per row.
+    """
+    import pandas as pd
+
+    text = _ROW_SEP.join(genres.fillna('').astype(str).tolist()).replace(';', ',')
+    text = _SEPARATOR_SPACE.sub('', text).strip()
+    tokens = np.array(text.replace(_ROW_SEP, ',' + _ROW_SEP + ',').split(','), dtype=object)
+    codes, uniques = pd.factorize(tokens)
+    is_sep = np.array([tok == _ROW_SEP for tok in uniques], dtype=bool)
+    is_token = np.array([tok not in ('', _ROW_SEP) for tok in uniques], dtype=bool)
+    rows = np.cumsum(is_sep[codes])
+    keep = is_token[codes]
+    # Renumber the kept tokens 0..n-1
+    token_codes = np.cumsum(is_token) - 1
+    return rows[keep], token_codes[codes[keep]], uniques[is_token]
+
+
+def derive_features(csv_path: str = CSV_PATH, chunk_size: int = INGEST_CHUNK_SIZE):
+    """
+    Parse the catalog CSV and return (arrays, meta) in artifact layout.
+
+    Only the needed columns are read (numeric ones as float32), `chunk_size`
+    rows at a time. Each chunk is reduced to its string arrays, float32 numeric
+    rows and (row, genre) pairs straight away, so the raw frame for the whole
+    catalog is never held in memory.
+    """
+    import pandas as pd
+
+    # Strings stay plain Python objects until they are packed into numpy
+    # arrays: parsing them as pandas string or categorical columns is slower,
+    # and chunking already bounds the memory they take
+    dtypes = {'Track URI': object, 'Track Name': object, 'Artist Name(s)': object,
+              'Artist Genres': object, **{col: np.float32 for col in NUMERIC_COLS}}
+    reader = pd.read_csv(csv_path, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_size)
+
+    uris, names, artists, numeric = [], [], [], []
+    genre_rows, genre_ids = [], []
+    vocab = {}  # genre -> id in order of first appearance
+    n_rows = 0
+    for chunk in reader:
+        uris.append(chunk['Track URI'].astype(str).to_numpy(dtype=str))
+        names.append(chunk['Track Name'].fillna('').astype(str).to_numpy(dtype=str))
+        artists.append(chunk['Artist Name(s)'].fillna('').astype(str).to_numpy(dtype=str))
+        numeric.append(chunk[NUMERIC_COLS].to_numpy(dtype=np.float32))
+
+        rows, codes, uniques = _genre_tokens(chunk['Artist Genres'])
+        ids = np.fromiter((vocab.setdefault(g, len(vocab)) for g in uniques),
+                          dtype=np.int64, count=len(uniques))
+        genre_rows.append(rows + n_rows)
+        genre_ids.append(ids[codes])
+        n_rows += len(chunk)
+
+    if not n_rows:
+        raise ValueError(f"No tracks found in {csv_path}")
+
+    # Genre columns in sorted order; duplicate genres within a row collapse
+    genres = sorted(vocab)
+    rank = np.empty(len(vocab), dtype=np.int64)
+    rank[[vocab[g] for g in genres]] = np.arange(len(genres))
+    rows = np.concatenate(genre_rows)
+    genre_mat = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, rank[np.concatenate(genre_ids)])),
+        shape=(n_rows, len(genres)))
+    genre_mat.sum_duplicates()
+
+    # Median-fill missing values, then min-max scale to [0, 1] in place
+    numeric = np.concatenate(numeric)
+    medians = np.nanmedian(numeric, axis=0)
+    np.copyto(numeric, medians, where=np.isnan(numeric))
+    popularity = numeric[:, NUMERIC_COLS.index('Popularity')].astype(np.float64)
+    data_min = numeric.min(axis=0).astype(np.float64)
+    data_max = numeric.max(axis=0).astype(np.float64)
+    data_range = data_max - data_min
+    scale = 1.0 / np.where(data_range == 0, 1.0, data_range)
+    offset = -data_min * scale
+    numeric *= scale.astype(np.float32)
+    numeric += offset.astype(np.float32)
+
+    uris, names, artists = np.concatenate(uris), np.concatenate(names), np.concatenate(artists)
+    # Lookup tables: URIs sorted (ties by row, so a duplicated URI finds its
+    # first row), and dense song/artist ids numbered in key order, with the
+    # rows sorted by key for binary search (see `_find_key`)
+    uri_rows = np.argsort(uris, kind='stable')
+    song_keys = pd.Series(names, dtype=object) + '|' + pd.Series(artists, dtype=object)
+    song_ids = np.unique(song_keys.to_numpy(), return_inverse=True)[1].astype(np.int64)
+    # Same normalization as `primary_artist`, vectorized
+    artist_keys = (pd.Series(artists, dtype=object)
+                   .str.lower().str.split(',').str[0].str.strip())
+    artist_ids = np.unique(artist_keys.to_numpy(), return_inverse=True)[1].astype(np.int64)
+
+    arrays = {
+        'genre_indices': genre_mat.indices.astype(np.int32),
+        'genre_indptr': genre_mat.indptr.astype(np.int64),
+        'numeric': numeric,
+        'track_uris': uris,
+        'track_names': names,
+        'artist_names': artists,
+        'popularity': popularity,
+        'uri_sorted': uris[uri_rows],
+        'uri_rows': uri_rows,
+        'song_ids': song_ids,
+        'song_order': np.argsort(song_ids, kind='stable'),
+        'artist_ids': artist_ids,
+        'artist_order': np.argsort(artist_ids, kind='stable'),
+    }
+    meta = {
+        'numeric_cols': NUMERIC_COLS,
+        'genres': genres,
+        'scaler': {
+            'medians': medians.astype(np.float64).tolist(),
+            'data_min': data_min.tolist(),
+            'data_max': data_max.tolist(),
+            'scale': scale.tolist(),
+            'min': offset.tolist(),
+        },
+    }
+    return arrays, meta
+
+
+def build_feature_artifact(csv_path: str = CSV_PATH, artifact_dir: str = FEATURE_ARTIFACT_DIR):
+    """Derive features from the CSV and write them as a memory-mappable artifact."""
+    arrays, meta = derive_features(csv_path)
+    artifact.write_artifact(arrays, meta, artifact_dir, csv_path)
+
+
+def primary_artist(artist_name: str) -> str:
+    """Normalize an 'Artist Name(s)' value to its lower-cased primary artist."""
+    return str(artist_name).lower().split(',')[0].strip()
@@ -0,0 +1,51 @@
+"""
+Append-only storage for per-row arrays that catalog snapshots share.
+
+Catalog deltas only ever add rows (see app.data.catalog_delta), so a newer
+snapshot's per-row array is an older one's plus a few rows at the end. A
+RowBuffer holds such an array with spare room after it: each snapshot keeps
+a view of its own length, and appending writes past the end of every
+existing view instead of copying the rows before it.
+"""
+import threading
+
+import numpy as np
+
+
+class RowBuffer:
+    """
+    An array that grows by appending rows; `view(n)` is its first n rows.
+
+    `extended(n, values)` returns a buffer whose first n + len(values) rows
+    are the first n rows of this one followed by `values`. If nothing was
+    appended after row n yet and there is room, the values go in place and
+    this buffer is returned; otherwise the rows are copied into a new buffer
+    with room for n / 8 more. Appending k rows therefore costs O(k)
+    amortized. The first append to an array the buffer was created with
+    (e.g. a read-only memory map) copies it.
+    """
+
+    def __init__(self, values: np.ndarray, n: int = None):
+        self._values = values
+        self._n = len(values) if n is None else n
+        self._lock = threading.Lock()
+
+    def view(self, n: int) -> np.ndarray:
+        return self._values[:n]
+
+    def extended(self, n: int, values) -> 'RowBuffer':
+        values = np.asarray(values)
+        if not len(values) and n <= self._n:
+            return self
+        stop = n + len(values)
+        dtype = np.result_type(self._values, values) if len(values) else self._values.dtype
+        with self._lock:
+            if (n == self._n and stop <= len(self._values) and dtype == self._values.dtype
+                    and self._values.flags.writeable):
+                self._values[n:stop] = values
+                self._n = stop
+                return self
+        grown = np.empty((stop + max(stop // 8, 64),) + self._values.shape[1:], dtype=dtype)
+        grown[:n] = self._values[:n]
+        grown[n:stop] = values
+        return RowBuffer(grown, stop)
@@ -0,0 +1,147 @@
+"""
+Cosine nearest-neighbour indexes over the catalog's feature blocks.
+
+Both backends work directly on the sparse genre block and the dense numeric
+block and answer `query(vectors, n_neighbors) -> (distances, indices)` with
+cosine distances, best first, like sklearn's `kneighbors`.
+"""
+import numpy as np
+import scipy.sparse as sp
+
+
+def _top_n(dists: np.ndarray, n: int) -> tuple:
+    """Row-wise n smallest distances and their columns, best first."""
+    part = np.argpartition(dists, n - 1, axis=1)[:, :n]
+    order = np.take_along_axis(dists, part, axis=1).argsort(axis=1, kind='stable')
+    cols = np.take_along_axis(part, order, axis=1)
+    return np.take_along_axis(dists, cols, axis=1), cols
+
+
+class BruteForceIndex:
+    """Exact search: every query is scored against every catalog row."""
+
+    def __init__(self, genre_matrix: sp.csr_matrix, numeric_matrix: np.ndarray,
+                 row_norms: np.ndarray, chunk_size: int = 256):
+        self.genre_matrix = genre_matrix
+        self.numeric_matrix = numeric_matrix
+        self.row_norms = row_norms
+        self.n_genres = genre_matrix.shape[1]
+        self.chunk_size = chunk_size
+
+    def query(self, queries: np.ndarray, n_neighbors: int):
+        queries = np.atleast_2d(queries)
+        n_neighbors = min(n_neighbors, len(self.row_norms))
+        # Bound the (queries x catalog) similarity block held at once
+        parts = [self._query_chunk(queries[i:i + self.chunk_size], n_neighbors)
+                 for i in range(0, len(queries), self.chunk_size)]
+        return np.vstack([d for d, _ in parts]), np.vstack([n for _, n in parts])
+
+    def _query_chunk(self, queries: np.ndarray, n_neighbors: int):
+        q = np.asarray(queries, dtype=np.float32).T
+        sims = (self.genre_matrix @ q[:self.n_genres]
+                + self.numeric_matrix @ q[self.n_genres:]).T
+        denom = np.outer(np.linalg.norm(queries, axis=1), self.row_norms)
+        # Zero vectors are treated as orthogonal to everything, like sklearn
+        np.divide(sims, denom, out=sims, where=denom > 0)
+        sims[denom == 0] = 0
+        return _top_n(1 - sims, n_neighbors)
+
+
+class IVFIndex:
+    """
+    Approximate search with an inverted-file (IVF) index.
+
+    Rows are L2-normalized and clustered with spherical k-means into `nlist`
+    cells (trained on a sample of at most `train_size` rows). A query is
+    compared with the cell centroids, then scored exactly against the rows of
+    its `nprobe` closest cells only, probing further cells if those hold
+    fewer than `n_neighbors` rows. With nlist ~ sqrt(N), a query touches
+    O(sqrt(N)) rows instead of N.
+    """
+
+    def __init__(self, genre_matrix: sp.csr_matrix, numeric_matrix: np.ndarray,
+                 row_norms: np.ndarray, nlist: int = None, nprobe: int = 8,
+                 n_iter: int = 10, train_size: int = 50_000, seed: int = 0):
+        n_rows = len(row_norms)
+        inv_norms = np.divide(1, row_norms, out=np.zeros_like(row_norms),
+                              where=row_norms > 0).astype(np.float32)
+        self.genre_matrix = sp.csr_matrix(sp.diags(inv_norms) @ genre_matrix)
+        self.numeric_matrix = numeric_matrix * inv_norms[:, None]
+        self.n_genres = genre_matrix.shape[1]
+        self.nlist = min(nlist or max(1, int(round(np.sqrt(n_rows)))), n_rows)
+        self.nprobe = nprobe
+
+        rng = np.random.default_rng(seed)
+        train = np.sort(rng.choice(n_rows, min(train_size, n_rows), replace=False))
+        self.centroids = self._train(train, n_iter, rng)
+
+        # Cell lists as one row array sorted by cell, plus per-cell offsets
+        assign = self._assign(np.arange(n_rows))
+        self.cell_rows = np.argsort(assign, kind='stable')
+        self.cell_sizes = np.bincount(assign, minlength=self.nlist)
+        self.cell_offsets = np.concatenate([[0], np.cumsum(self.cell_sizes)])
+
+    def _dot(self, rows: np.ndarray, vecs: np.ndarray) -> np.ndarray:
+        """(len(rows), m) cosine similarities between catalog rows and unit vecs."""
+        return (self.genre_matrix[rows] @ vecs[:self.n_genres]
+                + self.numeric_matrix[rows] @ vecs[self.n_genres:])
+
+    def _assign(self, rows: np.ndarray, chunk_size: int = 65_536) -> np.ndarray:
+        return np.concatenate([
+            self._dot(rows[i:i + chunk_size], self.centroids.T).argmax(axis=1)
+            for i in range(0, len(rows), chunk_size)])
+
+    def _train(self, train: np.ndarray, n_iter: int, rng) -> np.ndarray:
+        genre, numeric = self.genre_matrix[train], self.numeric_matrix[train]
+        init = rng.choice(len(train), self.nlist, replace=False)
+        centroids = np.hstack([genre[init].toarray(), numeric[init]])
+        for _ in range(n_iter):
+            assign = (genre @ centroids[:, :self.n_genres].T
+                      + numeric @ centroids[:, self.n_genres:].T).argmax(axis=1)
+            members = sp.csr_matrix(
+                (np.ones(len(train), dtype=np.float32), (assign, np.arange(len(train)))),
+                shape=(self.nlist, len(train)))
+            centroids = np.hstack([(members @ genre).toarray(), members @ numeric])
+            # Re-seed empty cells from random training rows
+            empty = np.flatnonzero(members.getnnz(axis=1) == 0)
+            if empty.size:
+                reseed = rng.choice(len(train), empty.size, replace=False)
+                centroids[empty] = np.hstack([genre[reseed].toarray(), numeric[reseed]])
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids = centroids / np.where(norms > 0, norms, 1)
+        return centroids.astype(np.float32)
+
+    def query(self, queries: np.ndarray, n_neighbors: int):
+        queries = np.atleast_2d(queries)
+        n_neighbors = min(n_neighbors, len(self.cell_rows))
+        all_dists, all_idxs = [], []
+        for q in queries:
+            norm = np.linalg.norm(q)
+            q = (q / norm if norm > 0 else q).astype(np.float32)
+            cells = np.argsort(-(self.centroids @ q), kind='stable')
+            # Probe further cells if the closest ones can't fill n_neighbors
+            filled = np.cumsum(self.cell_sizes[cells])
+            n_probe = max(self.nprobe, np.searchsorted(filled, n_neighbors) + 1)
+            cands = np.concatenate([
+                self.cell_rows[self.cell_offsets[c]:self.cell_offsets[c + 1]]
+                for c in cells[:n_probe]])
+            dists, cols = _top_n(1 - self._dot(cands, q)[None, :], n_neighbors)
+            all_dists.append(dists[0])
+            all_idxs.append(cands[cols[0]])
+        return np.vstack(all_dists), np.vstack(all_idxs)
+
+
+INDEX_TYPES = {
+    'brute': BruteForceIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_index(kind: str, genre_matrix, numeric_matrix, row_norms, **params):
+    """Build the index backend named `kind` ('brute' or 'ivf')."""
+    try:
+        index_cls = INDEX_TYPES[kind]
+    except KeyError:
+        raise ValueError(
+            f"Unknown vector index '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return index_cls(genre_matrix, numeric_matrix, row_norms, **params)
@@ -1,10 +1,42 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import API_PREFIX
-from app.api.routes import router
+from app.core.config import (
+    API_PREFIX,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_SLOW_REQUESTS,
+    SLOW_REQUEST_SECONDS,
+)
+from app.core.profiler import SamplingProfiler
+from app.api.middleware import RequestMetricsMiddleware
+from app.api.routes import router, status_router
+from app.services import registry
 import uvicorn
 
+# uvicorn only sets up its own loggers; also show ours (e.g. warm-up timings)
+app_logger = logging.getLogger("app")
+if not app_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(levelname)s:     %(name)s - %(message)s"))
+    app_logger.addHandler(_handler)
+    app_logger.setLevel(logging.INFO)
+    app_logger.propagate = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the catalog and model in the background, so the server binds and
+    # answers health checks right away; see /api/ready. Also starts this
+    # worker's pollers (a worker forked by scripts/serve.py only does that)
+    registry.start_warm_up()
+    yield
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="NunVibe Recommender API",
     description="Serve personalized top-K music recommendations for NunVibe",
     version="0.1.0"
@@ -18,4 +50,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    RequestMetricsMiddleware,
+    slow_seconds=SLOW_REQUEST_SECONDS,
+    profiler=SamplingProfiler(PROFILE_DIR, PROFILE_SAMPLE_INTERVAL) if PROFILE_SLOW_REQUESTS else None,
+)
+
+app.include_router(status_router, prefix=API_PREFIX)
 app.include_router(router, prefix=API_PREFIX)
@@ -3,8 +3,13 @@ from .genre_samples_request import GenreSamplesRequest
 from .genre_samples_response import GenreSamplesResponse
 from .request import ContentRequest
 from .response import ContentResponse
+from .page_response import PageResponse
 from .feedback_request import FeedbackRequest
 from .feedback_response import FeedbackResponse
+from .batch_request import BatchContentRequest
+from .batch_response import BatchContentResponse
+from .cache_stats import CacheStats
+from .cache_stats_response import CacheStatsResponse
 
 __all__ = [
     'GenresResponse',
@@ -12,6 +17,11 @@ __all__ = [
     'GenreSamplesResponse',
     'ContentRequest',
     'ContentResponse',
+    'PageResponse',
     'FeedbackRequest',
-    'FeedbackResponse'
+    'FeedbackResponse',
+    'BatchContentRequest',
+    'BatchContentResponse',
+    'CacheStats',
+    'CacheStatsResponse'
 ]
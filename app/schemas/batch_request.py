@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+from .request import ContentRequest
+
+
+class BatchContentRequest(BaseModel):
+    requests: List[ContentRequest] = Field(
+        ..., min_length=1, max_length=1000,
+        description="One recommendation request per user")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "requests": [
+                    {"seed_genres": ["pop", "dance pop"], "k": 10},
+                    {
+                        "seed_genres": ["indie rock"],
+                        "liked_uris": ["spotify:track:1MtUq6Wp1eQ8PC6BbPCj8P"],
+                        "k": 5
+                    }
+                ]
+            }
+        }
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import List
+
+from .response import ContentResponse
+
+
+class BatchContentResponse(BaseModel):
+    results: List[ContentResponse]
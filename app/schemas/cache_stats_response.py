@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Dict
+
+from .cache_stats import CacheStats
+
+
+class CacheStatsResponse(BaseModel):
+    caches: Dict[str, CacheStats]
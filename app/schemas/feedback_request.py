@@ -15,6 +15,16 @@ class FeedbackRequest(BaseModel):
     k: Optional[int] = Field(
         None, ge=1, description="Number of recommendations to return"
     )
+    session_id: Optional[str] = Field(
+        None, description="Session id from a previous response; with it, "
+        "only ratings new since the last request need to be sent. An unknown "
+        "or expired id starts a new session, under the id in the response")
+    user_id: Optional[str] = Field(
+        None, description="Opaque, unguessable key the client generates once "
+        "and keeps (it is not authenticated: whoever sends it acts as that user). "
+        "Feedback is stored under it and, once the user has a model of their own, "
+        "it personalizes scoring. Bound to the session by the first request that "
+        "gives it; a different user_id in that session is rejected (409)")
 
     class Config:
         json_schema_extra = {
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
 class FeedbackResponse(BaseModel):
     recommendations: List[Dict[str, str]]
+    session_id: Optional[str] = None
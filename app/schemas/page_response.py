@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import List, Dict, Optional
+
+
+class PageResponse(BaseModel):
+    recommendations: List[Dict[str, str]]
+    cursor: Optional[str] = None
+    session_id: Optional[str] = None
@@ -8,8 +8,21 @@ class ContentRequest(BaseModel):
         [], description="Optional list of Track URIs you liked")
     disliked_uris: List[str] = Field(
         [], description="Optional list of Track URIs you disliked")
+    exclude_uris: List[str] = Field(
+        [], description="Optional list of Track URIs not to recommend (e.g. ones "
+        "already shown); unlike disliked_uris, they are not stored as feedback")
     k:           Optional[int] = Field(
-        None, ge=1, description="Number of recs (defaults server-side)")
+        None, ge=1, le=1000, description="Number of recs (defaults server-side)")
+    session_id: Optional[str] = Field(
+        None, description="Session id from a previous response; with it, "
+        "only ratings new since the last request need to be sent. An unknown "
+        "or expired id starts a new session, under the id in the response")
+    user_id: Optional[str] = Field(
+        None, description="Opaque, unguessable key the client generates once "
+        "and keeps (it is not authenticated: whoever sends it acts as that user). "
+        "Feedback is stored under it and, once the user has a model of their own, "
+        "it personalizes scoring. Bound to the session by the first request that "
+        "gives it; a different user_id in that session is rejected (409)")
 
     class Config:
         json_schema_extra = {
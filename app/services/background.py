@@ -0,0 +1,22 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def run_periodically(fn, interval: float, name: str):
+    """
+    Call `fn()` every `interval` seconds from a daemon thread. Errors are
+    logged and the loop keeps going. Threads don't survive a fork, so start
+    these in the process that should run them (see registry.start_background).
+    """
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                fn()
+            except Exception:
+                logger.exception("Background task %s failed", name)
+
+    threading.Thread(target=loop, name=name, daemon=True).start()
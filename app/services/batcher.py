@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from app.core import metrics
+
+BATCH_SIZE = metrics.histogram(
+    "nunvibe_batch_size", "Requests scored together per coalesced batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_WAIT_SECONDS = metrics.histogram(
+    "nunvibe_batch_wait_seconds", "Time a request waits for its batch to be dispatched",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+
+class RequestCoalescer:
+    """
+    Gathers requests that arrive within `max_wait` seconds of each other (at
+    most `max_batch_size` of them) and scores them with one `run_batch` call,
+    then hands each caller its own result. When no batch is being scored, a
+    request is dispatched at once, so batches only form under load.
+
+    `run_batch` is an async callable taking a list of requests and returning
+    their results in the same order. If it raises, every request in the batch
+    gets the exception. With `max_wait` <= 0 every request is its own batch.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int, max_wait: float):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []  # (request, future, submitted_at)
+        self._timer = None
+        self._running = set()  # keeps dispatched batch tasks referenced
+
+    async def submit(self, request):
+        """Queue a request for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future, time.perf_counter()))
+        # An idle coalescer dispatches at once, so batching only adds latency
+        # while earlier batches are still being scored
+        if (not self._running or self.max_wait <= 0
+                or len(self._pending) >= self.max_batch_size):
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list):
+        dispatched = time.perf_counter()
+        BATCH_SIZE.observe(len(batch))
+        for _, _, submitted in batch:
+            BATCH_WAIT_SECONDS.observe(dispatched - submitted)
+        try:
+            results = await self.run_batch([request for request, _, _ in batch])
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future, _), result in zip(batch, results):
+            # Callers that gave up (e.g. disconnected) have cancelled futures
+            if not future.done():
+                future.set_result(result)
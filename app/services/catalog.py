@@ -0,0 +1,66 @@
+import logging
+import threading
+
+from app.data import catalog_delta
+from app.data.preprocess import ContentData
+from app.services.background import run_periodically
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogUpdates:
+    """
+    Keeps the catalog current as tracks are added, changed or retired.
+
+    `publish()` turns an update into the next catalog delta (see
+    app.data.catalog_delta), writes it next to the feature artifact and swaps
+    the updated snapshot in; `check()` (run periodically by `start()`) picks
+    up deltas written by other processes. Each swap hands the new ContentData
+    and the delta to `install(data, delta)`, which switches the services
+    over; requests in flight keep the snapshot they started with.
+    """
+
+    def __init__(self, data: ContentData, install):
+        self.data = data
+        self.install = install
+        self._lock = threading.Lock()
+
+    def start(self, interval: float):
+        run_periodically(self.check, interval, "catalog-updates")
+
+    def check(self) -> bool:
+        """Apply deltas written since the current snapshot, if any."""
+        with self._lock:
+            return self._catch_up()
+
+    def publish(self, tracks, retire_uris=()) -> catalog_delta.CatalogDelta:
+        """
+        Upsert `tracks` (a DataFrame with the catalog CSV's columns) and
+        retire `retire_uris`, as one new delta. Raises ValueError for an
+        invalid update or a catalog without a feature artifact.
+        """
+        if not self.data.artifact_dir:
+            raise ValueError("Catalog updates need a feature artifact to write deltas to")
+        with self._lock, catalog_delta.locked(self.data.artifact_dir):
+            self._catch_up()
+            arrays, meta = self.data.derive_delta(tracks, retire_uris)
+            delta = catalog_delta.write_delta(
+                self.data.artifact_dir, self.data.delta_seq + 1, arrays, meta)
+            self._swap(self.data.apply_delta(delta), delta)
+        return delta
+
+    def _catch_up(self) -> bool:
+        if not self.data.artifact_dir:
+            return False
+        seqs = catalog_delta.list_deltas(self.data.artifact_dir, after=self.data.delta_seq)
+        for seq in seqs:
+            delta = catalog_delta.read_delta(self.data.artifact_dir, seq)
+            self._swap(self.data.apply_delta(delta), delta)
+        return bool(seqs)
+
+    def _swap(self, data: ContentData, delta: catalog_delta.CatalogDelta):
+        # Retired rows keep their scores; they are excluded via `data.retired_rows`
+        self.install(data, delta)
+        self.data = data
+        logger.info("Catalog at version %s: %d tracks upserted, %d retired",
+                    data.version, len(delta.arrays['rows']), len(delta.arrays['retired']))
@@ -0,0 +1,58 @@
+import threading
+import uuid
+
+from app.services.cache import MISSING, LRUCache
+from app.services.ranking import RankedStream
+
+
+class Cursor:
+    """A paginated recommendation: its ranking stream and where it stands."""
+
+    def __init__(self, cursor_id: str, stream: RankedStream, data, session_id: str = None):
+        self.cursor_id = cursor_id
+        self.stream = stream
+        self.data = data
+        self.session_id = session_id
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.stream.nbytes + 256
+
+    @property
+    def exhausted(self) -> bool:
+        return self.stream.exhausted
+
+    def next_page(self, k: int) -> list[dict]:
+        """Return the next `k` recommendations (pages of one cursor never overlap)."""
+        with self._lock:
+            return self.data.tracks(self.stream.next_page(k))
+
+
+class CursorStore:
+    """
+    Open pagination cursors, bounded by their total memory and expired after
+    `ttl` seconds without a page request (least recently used first).
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = None):
+        self.cache = LRUCache(max_bytes, ttl=ttl, sizeof=lambda c: c.nbytes)
+
+    def create(self, stream: RankedStream, session_id: str = None) -> Cursor:
+        # The stream's own snapshot, which its rows belong to
+        cursor = Cursor(uuid.uuid4().hex, stream, stream.data, session_id)
+        self.save(cursor)
+        return cursor
+
+    def get(self, cursor_id: str):
+        """Return the cursor with this id, or None if it expired or never existed."""
+        cursor = self.cache.get(cursor_id)
+        return None if cursor is MISSING else cursor
+
+    def save(self, cursor: Cursor):
+        """Store the cursor, refreshing its TTL and re-weighing it (pages change its size)."""
+        if cursor.exhausted:
+            # Nothing left to page through
+            self.cache.pop(cursor.cursor_id)
+        else:
+            self.cache.put(cursor.cursor_id, cursor)
@@ -0,0 +1,73 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.core import metrics
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "nunvibe_scoring_queue_wait_seconds",
+    "Time scoring jobs wait for a worker thread")
+REJECTED = metrics.counter(
+    "nunvibe_scoring_rejected_total", "Scoring jobs rejected because the queue was full")
+
+
+class ExecutorBusy(Exception):
+    """Raised when the scoring queue is full and a request should back off."""
+
+
+class ScoringExecutor:
+    """
+    Dedicated, bounded thread pool for CPU-bound scoring.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more wait
+    behind them; anything beyond that is rejected immediately with
+    ExecutorBusy instead of piling up and inflating everyone's latency.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scoring")
+        self._slots = threading.Semaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs accepted but still waiting for a worker thread."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        if not self._slots.acquire(blocking=False):
+            REJECTED.inc()
+            raise ExecutorBusy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            # Run in a copy of the caller's context, so spans reach its trace
+            ctx = contextvars.copy_context()
+            future = self._pool.submit(
+                ctx.run, self._timed, time.perf_counter(), partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is held until the job itself finishes (or is cancelled
+        # before it starts), not just until the caller stops waiting for it,
+        # so jobs of disconnected clients still count against the bound
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _timed(submitted: float, job):
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        return job()
@@ -0,0 +1,120 @@
+import logging
+import threading
+from typing import List
+
+import numpy as np
+
+from app.data.preprocess import ContentData
+from app.data.row_buffer import RowBuffer
+from app.services.background import run_periodically
+from app.services.feedback_store import FeedbackStore
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackAggregate:
+    """
+    In-memory summary of all stored feedback: which catalog rows have been
+    rated, plus like/dislike counts.
+
+    The recommender reads it directly instead of parsing feedback.csv. It is
+    kept current by tailing only the bytes appended since the last refresh
+    (from a background thread, see `start_polling`), and this process's own
+    feedback is applied in place as soon as it is recorded, before it even
+    reaches the file.
+    """
+
+    def __init__(self, data: ContentData, store: FeedbackStore):
+        self.data = data
+        self.store = store
+        self._rated = RowBuffer(np.zeros(data.n_rows, dtype=bool))
+        self.rated_mask = self._rated.view(data.n_rows)
+        self.likes = 0
+        self.dislikes = 0
+        # Recorded in place but not yet written (and so not yet tailed)
+        self._unflushed_likes = 0
+        self._unflushed_dislikes = 0
+        self._offset = 0
+        self._lock = threading.Lock()  # guards the counts and mask
+        self._io_lock = threading.Lock()  # serializes tailing the store
+        self.refresh()
+
+    @property
+    def total(self) -> int:
+        return (self.likes + self.dislikes
+                + self._unflushed_likes + self._unflushed_dislikes)
+
+    @property
+    def n_stored(self) -> int:
+        """Rows read from the store so far; the same in every process once tailed."""
+        return self.likes + self.dislikes
+
+    def record(self, liked_uris: List[str], disliked_uris: List[str]):
+        """Apply feedback from this process before it is written to the store."""
+        with self._lock:
+            self.rated_mask[self.data.indices_for(list(liked_uris) + list(disliked_uris))] = True
+            self._unflushed_likes += len(liked_uris)
+            self._unflushed_dislikes += len(disliked_uris)
+
+    def set_data(self, data: ContentData, old_rows=(), new_rows=()):
+        """
+        Switch to a newer snapshot of the catalog, whose rows extend this
+        one's. Tracks that moved from `old_rows` to `new_rows` stay rated.
+        """
+        with self._lock:
+            n = len(self.rated_mask)
+            self._rated = self._rated.extended(n, np.zeros(data.n_rows - n, dtype=bool))
+            rated_mask = self._rated.view(data.n_rows)
+            rated_mask[new_rows] = rated_mask[old_rows]
+            self.rated_mask, self.data = rated_mask, data
+
+    def append(self, entries):
+        """
+        Write recorded (track_uri, label, user_id) rows to the store and count
+        them from there on. No refresh runs between the write and the
+        handoff, so the rows are never counted both as read and as unflushed.
+        """
+        n_likes = sum(label for _, label, _ in entries)
+        n_dislikes = len(entries) - n_likes
+        with self._io_lock:
+            self.store.append(entries)
+            try:
+                self._refresh(n_likes, n_dislikes)
+            except Exception:
+                # The rows are stored: stop counting them here, and let the
+                # next refresh read them
+                with self._lock:
+                    self._unflushed_likes -= n_likes
+                    self._unflushed_dislikes -= n_dislikes
+                logger.warning("Could not read back appended feedback", exc_info=True)
+
+    def refresh(self):
+        """Fold in rows appended to the store (by any process) since last time."""
+        with self._io_lock:
+            self._refresh()
+
+    def _refresh(self, n_flushed_likes: int = 0, n_flushed_dislikes: int = 0):
+        # File reads happen outside `_lock`, so record() never waits on disk
+        rows, offset, reset = self.store.read_since(self._offset)
+        rated = self.data.indices_for([uri for uri, _, _ in rows])
+        n_likes = sum(label for _, label, _ in rows)
+        with self._lock:
+            if reset:
+                self.rated_mask[:] = False
+                self.likes = self.dislikes = 0
+            self.rated_mask[rated] = True
+            self.likes += n_likes
+            self.dislikes += len(rows) - n_likes
+            self._unflushed_likes -= n_flushed_likes
+            self._unflushed_dislikes -= n_flushed_dislikes
+            self._offset = offset
+
+    def start_polling(self, interval: float):
+        """Refresh every `interval` seconds in the background."""
+        run_periodically(self._poll, interval, "feedback-poller")
+
+    def _poll(self):
+        try:
+            self.refresh()
+        except OSError:
+            pass  # e.g. the file is being replaced; retry on the next poll
@@ -0,0 +1,109 @@
+import csv
+import io
+import os
+from contextlib import contextmanager
+from typing import List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class FeedbackStore:
+    """
+    Append-only feedback log stored as CSV (track_uri,label,user_id).
+
+    `user_id` is empty for anonymous feedback. Logs written before it existed
+    keep their (track_uri,label) header and rows, which read as anonymous;
+    rows appended to them carry the user_id column. The file is never
+    rewritten, so byte offsets readers keep (see `read_since`) stay valid.
+    Appends take an exclusive file lock and write all of their rows with a
+    single O_APPEND write, so concurrent requests and worker processes never
+    interleave or lose rows, and the cost of an append doesn't depend on how
+    much feedback is already stored.
+    """
+
+    COLUMNS = ["track_uri", "label", "user_id"]
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._locked(os.O_RDWR | os.O_CREAT) as fd:
+            self._ensure_header(fd)
+
+    @contextmanager
+    def _locked(self, flags: int, exclusive: bool = True):
+        fd = os.open(self.path, flags, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield fd
+        finally:
+            os.close(fd)  # also releases the lock
+
+    def _ensure_header(self, fd: int):
+        if os.fstat(fd).st_size == 0:
+            os.write(fd, self._encode([self.COLUMNS]))
+
+    @staticmethod
+    def _encode(rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    def append(self, rows: List[Tuple[str, int, str]]):
+        """Append (track_uri, label, user_id) rows in one locked write."""
+        if not rows:
+            return
+        payload = self._encode(rows)
+        with self._locked(os.O_WRONLY | os.O_CREAT | os.O_APPEND) as fd:
+            self._ensure_header(fd)
+            os.write(fd, payload)
+
+    def read_since(self, offset: int):
+        """
+        Return (rows, new_offset, reset) for the complete rows appended after
+        byte `offset`, as (track_uri, label, user_id) with user_id None for
+        anonymous rows. If the file shrank since (truncated or replaced), it is
+        read from the start and `reset` is True.
+        """
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            reset = size < offset
+            if reset:
+                offset = 0
+            f.seek(offset)
+            chunk = f.read(size - offset)
+
+        # Only consume whole lines; a partial last line is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        rows = []
+        for row in csv.reader(io.StringIO(chunk[:end].decode("utf-8"))):
+            if len(row) < 2 or row[0] == self.COLUMNS[0]:
+                continue
+            try:
+                rows.append((row[0], int(float(row[1])), row[2] if len(row) > 2 and row[2] else None))
+            except ValueError:
+                continue
+        return rows, offset + end, reset
+
+    def end_offset(self) -> int:
+        """Byte offset of the end of the log, to `read_since` from later."""
+        # Appends write whole rows under the exclusive lock, so this is a row boundary
+        with self._locked(os.O_RDONLY, exclusive=False) as fd:
+            return os.fstat(fd).st_size
+
+    def read_all(self):
+        """Bulk-read every stored row as a DataFrame, e.g. for training."""
+        import pandas as pd
+        with self._locked(os.O_RDONLY, exclusive=False):
+            try:
+                # Explicit names in place of the header, so rows from before
+                # user_id read as anonymous, whichever header the log has
+                return pd.read_csv(self.path, names=self.COLUMNS, header=None, skiprows=1,
+                                   dtype={"track_uri": str, "user_id": str})
+            except pd.errors.EmptyDataError:
+                return pd.DataFrame(columns=self.COLUMNS)
@@ -0,0 +1,144 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from app.services.background import run_periodically
+from app.services.recommender import HybridRecommender, model_file_version
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process retrain lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TRAIN_SCRIPT = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'scripts', 'train_model.py')
+
+
+class ModelRegistry:
+    """
+    Keeps the recommender's LR model current without restarts.
+
+    `check()` (run periodically by `start()`) notices when the model file
+    changed, loads it and precomputes its scores in the background, then swaps
+    it into the recommender in one step, and maps in newly trained per-user
+    models the same way. When `retrain_every` new feedback rows
+    have arrived since the last training run, it also starts
+    scripts/train_model.py in a separate process (with --incremental, so only
+    the new feedback is learned from, when `incremental` is set); the new file
+    is picked up by a later check. A lock file keeps several workers from
+    retraining at once, and the number of stored feedback rows each run
+    started at is kept next to the model (`<path>.trained`), so once a run
+    finishes the other workers don't start another on the same feedback.
+    """
+
+    def __init__(self, recommender: HybridRecommender, path: str,
+                 retrain_every: int = None, incremental: bool = False):
+        self.recommender = recommender
+        self.path = path
+        self.retrain_every = retrain_every
+        self.incremental = incremental
+        self.trained_path = path + '.trained'
+        # Until a run is recorded, count new feedback from this process's start
+        self._started_at = recommender.feedback.n_stored
+        self._trainer = None
+        self._lock_fd = None
+        self._check_lock = threading.Lock()
+
+    def start(self, interval: float):
+        run_periodically(self.check, interval, "model-registry")
+
+    def check(self):
+        with self._check_lock:
+            self._reap_trainer()
+            self.reload_if_changed()
+            self.recommender.user_models.reload_if_changed()
+            self.maybe_retrain()
+
+    def reload_if_changed(self) -> bool:
+        """Load, score and swap in the model file if it changed since last time."""
+        try:
+            version = model_file_version(self.path)
+        except OSError:
+            return False
+        if version == self.recommender.model_state.version:
+            return False
+        import joblib
+        try:
+            model = joblib.load(self.path)
+        except Exception:
+            # Most likely caught mid-write; try again on the next check
+            logger.warning("Could not load model from %s", self.path, exc_info=True)
+            return False
+        self.recommender.install(self.recommender.score_model(model, version))
+        logger.info("Loaded new model from %s", self.path)
+        return True
+
+    def maybe_retrain(self) -> bool:
+        """Start a background training run once enough new feedback arrived."""
+        if not self.retrain_every or self._trainer is not None:
+            return False
+        stored = self.recommender.feedback.n_stored
+        if stored - self.trained_at(stored) < self.retrain_every:
+            return False
+        if not self._acquire_train_lock():
+            return False  # another worker is already training
+        if stored - self.trained_at(stored) < self.retrain_every:
+            # Another worker's run started (and finished) since the check above
+            self._release_train_lock()
+            return False
+        self._save_trained_at(stored)
+        env = dict(os.environ)
+        root = os.path.abspath(os.path.join(os.path.dirname(TRAIN_SCRIPT), '..'))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+        # Per-user models are refitted offline (scripts/train_model.py), not
+        # on every RETRAIN_EVERY ratings
+        args = [sys.executable, TRAIN_SCRIPT, '--skip-users'] + (
+            ['--incremental'] if self.incremental else [])
+        self._trainer = subprocess.Popen(args, env=env)
+        logger.info("Started background retraining (pid %s)", self._trainer.pid)
+        return True
+
+    def trained_at(self, stored: int) -> int:
+        """Stored feedback rows the last training run (by any worker) started at."""
+        try:
+            with open(self.trained_path) as f:
+                trained_at = int(f.read())
+        except (OSError, ValueError):
+            trained_at = self._started_at
+        # Past the rows stored now: the log was replaced since
+        return trained_at if trained_at <= stored else 0
+
+    def _save_trained_at(self, stored: int):
+        tmp_path = f"{self.trained_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(stored))
+        os.replace(tmp_path, self.trained_path)
+
+    def _reap_trainer(self):
+        if self._trainer is None or self._trainer.poll() is None:
+            return
+        if self._trainer.returncode != 0:
+            logger.warning("Background retraining exited with %s", self._trainer.returncode)
+        self._trainer = None
+        self._release_train_lock()
+
+    def _acquire_train_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_train_lock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
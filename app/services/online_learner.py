@@ -0,0 +1,91 @@
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+from app.data.preprocess import ContentData
+from app.services.feedback_store import FeedbackStore
+
+
+def save_atomic(obj, path: str):
+    """joblib.dump to a temp file and rename it over `path`."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def labeled_rows(data: ContentData, uris: list, labels) -> tuple:
+    """
+    Feature rows and labels for the feedback URIs found in the catalog.
+    Unknown URIs are dropped together with their labels, so both stay aligned.
+    """
+    rows = data.lookup(uris)
+    known = rows >= 0
+    return data.sparse_rows(rows[known]), np.asarray(labels)[known]
+
+
+class OnlineLearner:
+    """
+    Incrementally trained logistic model (SGD with log loss).
+
+    A checkpoint holds the model together with the feedback-log byte offset it
+    has consumed, so each `update()` only reads and learns from feedback
+    appended since the previous one. If the catalog's feature width changed,
+    the checkpoint is discarded and training restarts from the beginning of
+    the log, unless catalog deltas only added genres to the catalog it was
+    trained on: their weights then start at zero.
+    """
+
+    def __init__(self, data: ContentData, checkpoint_path: str):
+        self.data = data
+        self.checkpoint_path = checkpoint_path
+        self.model = None
+        self.offset = 0
+        self.n_seen = 0
+        self._load()
+
+    def _load(self):
+        try:
+            checkpoint = joblib.load(self.checkpoint_path)
+        except (OSError, EOFError):
+            return
+        n_features = checkpoint.get('n_features')
+        if n_features != self.data.n_features:
+            if (n_features is None or n_features > self.data.n_features
+                    or checkpoint.get('catalog_base') != self.data.base_version):
+                return
+            model = checkpoint['model']
+            model.coef_ = self.data.widen(model.coef_)
+            model.n_features_in_ = self.data.n_features
+        self.model = checkpoint['model']
+        self.offset = checkpoint['offset']
+        self.n_seen = checkpoint['n_seen']
+
+    def save(self):
+        save_atomic({
+            'model': self.model,
+            'offset': self.offset,
+            'n_seen': self.n_seen,
+            'n_features': self.data.n_features,
+            'catalog_base': self.data.base_version,
+        }, self.checkpoint_path)
+
+    def update(self, store: FeedbackStore) -> int:
+        """Learn from feedback appended since the checkpoint; return rows used."""
+        rows, offset, reset = store.read_since(self.offset)
+        if reset:
+            # The log was rewritten; what we learned no longer matches it
+            self.model, self.n_seen = None, 0
+        self.offset = offset
+        if not rows:
+            return 0
+
+        X, y = labeled_rows(self.data, [uri for uri, _, _ in rows], [label for _, label, _ in rows])
+        if not len(y):
+            return 0
+        if self.model is None:
+            self.model = SGDClassifier(loss='log_loss', random_state=0)
+        self.model.partial_fit(X, y, classes=np.array([0, 1]))
+        self.n_seen += len(y)
+        return len(y)
@@ -0,0 +1,240 @@
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the rows of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind='stable')]
+
+
+def blocks(rows: np.ndarray, block_size: int):
+    """Yield an already ranked array of rows `block_size` at a time."""
+    for start in range(0, len(rows), block_size):
+        yield rows[start:start + block_size]
+
+
+class SizedBlocks:
+    """
+    Candidate blocks from a generator, with the bytes of the arrays the
+    generator holds while it is consumed (`nbytes`), so RankedStream can
+    account for them.
+    """
+
+    def __init__(self, blocks, nbytes: int):
+        self._blocks = blocks
+        self.nbytes = nbytes
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+
+def ranked_blocks(scores: np.ndarray, block_size: int, skip: np.ndarray = None) -> SizedBlocks:
+    """
+    Yield rows by descending score, `block_size` at a time, never yielding
+    rows in the `skip` mask. Each block is argpartitioned out of the rows not
+    yielded yet, so only as much of the ranking as is consumed gets sorted.
+    """
+    remaining = np.where(skip, -np.inf, scores) if skip is not None else scores.copy()
+    n_left = len(scores) - (int(skip.sum()) if skip is not None else 0)
+    return SizedBlocks(_ranked_blocks(remaining, block_size, n_left), remaining.nbytes)
+
+
+def _ranked_blocks(remaining: np.ndarray, block_size: int, n_left: int):
+    while n_left > 0:
+        block = top_k(remaining, min(block_size, n_left))
+        remaining[block] = -np.inf
+        n_left -= len(block)
+        yield block
+
+
+def insert_positions(ranked: np.ndarray, scores: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Where each of `rows` goes in `ranked` (both by descending score, ties by
+    row) for np.insert. A binary search for all of them at once, which only
+    reads the scores of the O(log N) rows it probes.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    keys = scores[rows]
+    lo = np.zeros(len(rows), dtype=np.int64)
+    hi = np.full(len(rows), len(ranked), dtype=np.int64)
+    searching = lo < hi
+    while searching.any():
+        mid = (lo + hi) // 2
+        probe = ranked[np.minimum(mid, len(ranked) - 1)]
+        probe_scores = scores[probe]
+        after = (probe_scores > keys) | ((probe_scores == keys) & (probe < rows))
+        lo = np.where(searching & after, mid + 1, lo)
+        hi = np.where(searching & ~after, mid, hi)
+        searching = lo < hi
+    return lo
+
+
+class Ranking:
+    """
+    Catalog rows by descending score, ties by row, for a catalog that grows
+    by appending rows: `head`, sorted once, plus the rows appended since
+    (`tail`, in the same order), each with the position in `head` it goes
+    before. Appending costs a binary search per new row, and `blocks()`
+    merges the tail in as it goes, so readers only pay for what they walk.
+    """
+
+    def __init__(self, head: np.ndarray, tail: np.ndarray = None, positions: np.ndarray = None):
+        self.head = head
+        self.tail = tail if tail is not None else np.empty(0, dtype=np.int64)
+        self.positions = positions if positions is not None else np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.head) + len(self.tail)
+
+    def inserted(self, scores: np.ndarray, rows: np.ndarray) -> 'Ranking':
+        """A ranking that also holds `rows` (rows past any in it), ranked by `scores`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        tail = np.concatenate([self.tail, rows])
+        positions = np.concatenate([self.positions, insert_positions(self.head, scores, rows)])
+        order = np.lexsort((tail, -scores[tail], positions))
+        return Ranking(self.head, tail[order], positions[order])
+
+    def blocks(self, block_size: int):
+        """Yield the ranked rows about `block_size` at a time."""
+        if not len(self.tail):
+            yield from blocks(self.head, block_size)
+            return
+        taken = 0
+        for start in range(0, len(self.head), block_size):
+            stop = min(start + block_size, len(self.head))
+            end = np.searchsorted(self.positions, stop, side='left')
+            yield np.insert(self.head[start:stop], self.positions[taken:end] - start,
+                            self.tail[taken:end])
+            taken = end
+        if taken < len(self.tail):
+            yield self.tail[taken:]
+
+
+def row_mask(n_rows: int, idxs) -> np.ndarray:
+    """Boolean mask over catalog rows with `idxs` set."""
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[idxs] = True
+    return mask
+
+
+class DiverseSelector:
+    """
+    Greedy top-k selection over catalog rows.
+
+    Candidates are offered in tiers (best first). Each pick skips excluded or
+    already-picked rows, repeats of an already-picked song+artist, and, when a
+    tier sets `max_per_artist`, primary artists that already hit that cap.
+    Exclusion is applied to a whole tier with one mask lookup; only the rows
+    that survive it are walked in Python, and only until the selection is full.
+    """
+
+    def __init__(self, song_ids: np.ndarray, artist_ids: np.ndarray,
+                 exclude_mask: np.ndarray, limit: int):
+        self.song_ids = song_ids
+        self.artist_ids = artist_ids
+        self.limit = limit
+        self.taken = exclude_mask.copy()
+        self.seen_songs = np.zeros(song_ids.max(initial=-1) + 1, dtype=bool)
+        self.artist_counts = np.zeros(artist_ids.max(initial=-1) + 1, dtype=np.int64)
+        self.selected = []
+
+    @property
+    def full(self) -> bool:
+        return len(self.selected) >= self.limit
+
+    def extend(self, candidates: np.ndarray, max_per_artist: int = None) -> bool:
+        """Offer candidates in order; return True once the selection is full."""
+        if self.full:
+            return True
+        candidates = np.asarray(candidates)
+        candidates = candidates[~self.taken[candidates]
+                                & ~self.seen_songs[self.song_ids[candidates]]]
+        for idx in candidates.tolist():
+            song = self.song_ids[idx]
+            if self.seen_songs[song]:
+                continue
+            # A song dropped for its artist stays seen, so later tiers skip it too
+            self.seen_songs[song] = True
+
+            artist = self.artist_ids[idx]
+            if max_per_artist is not None and self.artist_counts[artist] >= max_per_artist:
+                continue
+
+            self.selected.append(idx)
+            self.taken[idx] = True
+            self.artist_counts[artist] += 1
+            if self.full:
+                return True
+        return False
+
+
+class RankedStream:
+    """
+    Resumable diverse selection, for paging through a ranking.
+
+    `tiers` is a sequence of (candidate blocks, max_per_artist) pairs, where
+    the blocks are any iterable of row arrays (e.g. from `blocks` or
+    `ranked_blocks`), consumed lazily. Each `next_page(n)` continues the
+    DiverseSelector walk where the previous page stopped, so the pages
+    concatenate to exactly what one selection of their total size would
+    return, and a page only costs the candidates it walks.
+
+    `data` is the catalog snapshot the rows belong to, and `held_bytes` the
+    size of arrays the tiers keep for the stream's lifetime (e.g. its
+    scores); blocks that hold arrays of their own say so with SizedBlocks.
+    """
+
+    def __init__(self, selector: DiverseSelector, tiers, data=None, held_bytes: int = 0):
+        self.selector = selector
+        self.data = data
+        self._held_bytes = held_bytes
+        self._tiers = iter(tiers)
+        self._blocks = None
+        self._tier_bytes = 0
+        self._max_per_artist = None
+        self._block = self._next_block()
+
+    @property
+    def exhausted(self) -> bool:
+        return self._block is None
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held: the selector's state, the arrays held for
+        the stream and by the current tier, and the block it stopped in.
+        """
+        selector = self.selector
+        block_bytes = self._block.nbytes if self._block is not None else 0
+        return (selector.taken.nbytes + selector.seen_songs.nbytes
+                + selector.artist_counts.nbytes + 8 * len(selector.selected)
+                + self._held_bytes + self._tier_bytes + block_bytes)
+
+    def _next_block(self):
+        while True:
+            if self._blocks is not None:
+                block = next(self._blocks, None)
+                if block is not None:
+                    return block
+            tier = next(self._tiers, None)
+            if tier is None:
+                self._blocks, self._tier_bytes = None, 0
+                return None
+            candidates, self._max_per_artist = tier
+            self._tier_bytes = getattr(candidates, 'nbytes', 0)
+            self._blocks = iter(candidates)
+
+    def next_page(self, n: int) -> list:
+        """Select up to `n` more rows; fewer only once the candidates run out."""
+        start = len(self.selector.selected)
+        self.selector.limit = start + n
+        while self._block is not None:
+            # Rows of the block walked on an earlier page are taken or seen by
+            # now, so offering the block again resumes right after them
+            if self.selector.extend(self._block, self._max_per_artist):
+                break
+            self._block = self._next_block()
+        return self.selector.selected[start:]
@@ -1,261 +1,402 @@
-import pandas as pd
+import os
+import threading
+from typing import NamedTuple
+
 import numpy as np
-import joblib
-from sklearn.metrics.pairwise import cosine_similarity
-from app.core.config import CSV_PATH, DEFAULT_K, LR_MODEL_PATH, MIN_FEEDBACK, FEEDBACK_CSV_PATH
+from app.core.config import (
+    CSV_PATH,
+    DEFAULT_K,
+    FEEDBACK_CSV_PATH,
+    LR_MODEL_PATH,
+    MIN_FEEDBACK,
+    RANKING_BLOCK_SIZE,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    USER_MODEL_DIR,
+)
+from app.core.metrics import span
 from app.data.preprocess import ContentData
+from app.data.row_buffer import RowBuffer
+from app.services.cache import MISSING, LRUCache
+from app.services.feedback_aggregate import FeedbackAggregate
+from app.services.feedback_store import FeedbackStore
+from app.services.ranking import (
+    DiverseSelector,
+    RankedStream,
+    blocks,
+    Ranking,
+    ranked_blocks,
+    row_mask,
+    top_k,
+)
+from app.services.sessions import Session
+from app.services.user_models import UserModels
+
+
+def model_file_version(path: str) -> tuple:
+    """Identify a model file's contents by its (mtime, size)."""
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelState(NamedTuple):
+    """
+    A model with its precomputed per-track scores and the catalog snapshot
+    they were computed for, swapped in as one unit. `buffer` holds the scores
+    with room for rows later catalog snapshots add (see `set_catalog`).
+    """
+    model: object
+    probs: np.ndarray
+    order: Ranking
+    version: object = None
+    data: ContentData = None
+    buffer: RowBuffer = None
+
+
+class UserQuery(NamedTuple):
+    """One user's request, normalized to catalog rows."""
+    k: int
+    seed_genres: list
+    liked_idxs: np.ndarray
+    liked_sum: np.ndarray  # sum of the liked rows' features, if precomputed
+    exclude_mask: np.ndarray
+    user_id: str = None
 
 
 class HybridRecommender:
     """
     Hybrid music recommender that falls back to content-based KNN for cold-start,
     and once sufficient feedback is collected, blends KNN similarity with a
-    logistic-regression model trained on user likes/dislikes.
+    logistic-regression model trained on user likes/dislikes. Users with a
+    model of their own (see `UserModels`) are scored with it instead of the
+    global one.
     """
 
-    def __init__(self):
-        self.data = ContentData(CSV_PATH)
+    def __init__(self, data: ContentData = None, feedback: FeedbackAggregate = None):
+        # Reuse a shared catalog when given one instead of loading a second copy
+        data = data if data is not None else ContentData(CSV_PATH)
+        self.model_state = ModelState(None, None, None, data=data)
+        self._install_lock = threading.RLock()
+        # Stored feedback is read from the in-memory aggregate, never the CSV
+        self.feedback = feedback if feedback is not None else FeedbackAggregate(
+            self.data, FeedbackStore(FEEDBACK_CSV_PATH))
         self.k = DEFAULT_K
+        self.batch_chunk_size = 256
+        # Cold-start results and genre samples depend only on the genre set
+        # and k/limit; both caches are cleared whenever the model changes
+        self.cold_start_cache = LRUCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+        self.samples_cache = LRUCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+        self.load_model()
+        self.user_models = UserModels(self.data, USER_MODEL_DIR)
+
+    def load_model(self, path: str = LR_MODEL_PATH):
+        """(Re)load the logistic-regression model from disk, if there is one."""
+        import joblib
         try:
-            self.lr_model = joblib.load(LR_MODEL_PATH)
-        except:
-            self.lr_model = None
-        self._feedback_cache = None
-        self._feedback_cache_time = 0
+            version = model_file_version(path)
+            model = joblib.load(path)
+        except Exception:
+            model, version = None, None
+        self.set_model(model, version)
+
+    def set_model(self, model, version=None):
+        """
+        Install a model and precompute its like-probability for every track,
+        plus the tracks ranked by it. Neither changes between reloads, so
+        requests only look them up.
+
+        Scores are computed before the swap, and the swap is a single
+        attribute assignment, so in-flight requests keep using the state they
+        started with and no request ever waits for a reload.
+        """
+        self.install(self.score_model(model, version))
+
+    def score_model(self, model, version=None, data: ContentData = None) -> ModelState:
+        """Precompute the per-track scores for a model without installing it."""
+        data = data if data is not None else self.data
+        if model is None:
+            return ModelState(None, None, None, version, data)
+        with span("model.predict_proba"):
+            lr_probs = data.predict_proba(model)
+        return ModelState(model, lr_probs, Ranking(np.argsort(-lr_probs, kind='stable')),
+                          version, data, RowBuffer(lr_probs))
+
+    def install(self, state: ModelState):
+        """Atomically swap in a state built by `score_model`."""
+        with self._install_lock:
+            if state.data is not self.data:
+                # The catalog changed while the model was being scored
+                state = self.score_model(state.model, state.version)
+            self._swap(state)
+
+    def _swap(self, state: ModelState):
+        self.model_state = state
+        self.cold_start_cache.clear()
+        self.samples_cache.clear()
+
+    def set_catalog(self, data: ContentData):
+        """
+        Switch to a newer catalog snapshot (see `ContentData.apply_delta`),
+        whose rows extend this one's: just the added rows are scored and
+        inserted into the model's ranking.
+        """
+        with self._install_lock:
+            state = self.model_state
+            if state.model is not None:
+                rows = np.arange(len(state.probs), data.n_rows)
+                buffer = state.buffer.extended(len(state.probs), data.predict_proba(state.model, rows))
+                probs = buffer.view(data.n_rows)
+                state = state._replace(probs=probs, order=state.order.inserted(probs, rows),
+                                       buffer=buffer)
+            self.user_models.data = data
+            self._swap(state._replace(data=data))
+
+    @property
+    def data(self) -> ContentData:
+        return self.model_state.data
+
+    @property
+    def lr_model(self):
+        return self.model_state.model
+
+    def genre_samples(self, genres: list[str], limit: int) -> list[dict]:
+        """Popular tracks for the given genres, cached per genre set and limit."""
+        data = self.data
+        key = (data.version, frozenset(genres), limit)
+        samples = self.samples_cache.get(key)
+        if samples is MISSING:
+            samples = data.sample_popular_by_genres(genres, limit)
+            self.samples_cache.put(key, samples)
+        return samples
+
+    def _content_recommend_many(self, users: list, data: ContentData) -> list[list[dict]]:
+        """
+        Content-based recommendations for the given UserQuery list, with
+        cold-start queries (no known seed tracks) served from the cache.
+        Exclusions are applied by the caller, after the cache.
+        """
+        results = [None] * len(users)
+        misses = {}
+        for i, user in enumerate(users):
+            key = None
+            if not user.liked_idxs.size:
+                key = (data.version, frozenset(user.seed_genres), user.k)
+                cached = self.cold_start_cache.get(key)
+                if cached is not MISSING:
+                    results[i] = cached
+                    continue
+            misses[i] = key
+
+        missed = [users[i] for i in misses]
+        computed = data.recommend_rows(
+            [u.seed_genres for u in missed], [u.liked_idxs for u in missed],
+            [u.k for u in missed], [u.liked_sum for u in missed])
+        for (i, key), recs in zip(misses.items(), computed):
+            if key is not None:
+                self.cold_start_cache.put(key, recs)
+            results[i] = recs
+        return results
 
     def build_taste_vector(self, seed_genres: list[str], seed_uris: list[str]) -> np.ndarray:
-        # 1) One-hot encode seed genres
-        g_vec = self.data.genre_encoder.transform([seed_genres])[0]
-        # 2) Gather seed-track feature vectors
-        idxs = [self.data.track_uris.index(
-            u) for u in seed_uris if u in self.data.track_uris]
-        t_vecs = self.data.features[idxs] if idxs else np.empty(
-            (0, self.data.features.shape[1]))
-        # 3) Combine genre and track vectors
-        if t_vecs.size:
-            pad = np.zeros(self.data.features.shape[1] - len(g_vec))
-            g_full = np.hstack([g_vec, pad]) if pad.size else g_vec
-            all_vecs = np.vstack([g_full, t_vecs])
-            taste = all_vecs.mean(axis=0)[None, :]
-        else:
-            pad = np.zeros(self.data.features.shape[1] - len(g_vec))
-            taste = np.hstack([g_vec, pad])[None, :]
-        return taste
-
-    def _get_feedback_uris(self):
-        """Get all URIs from feedback.csv with caching."""
-        import time
-        current_time = time.time()
-
-        # Cache for 5 seconds to avoid reading file too frequently
-        if (self._feedback_cache is not None and
-                current_time - self._feedback_cache_time < 5):
-            return self._feedback_cache
-
-        try:
-            feedback_df = pd.read_csv(FEEDBACK_CSV_PATH)
-            if not feedback_df.empty:
-                self._feedback_cache = set(feedback_df['track_uri'].tolist())
-                self._feedback_cache_time = current_time
-                return self._feedback_cache
-        except:
-            pass
-
-        self._feedback_cache = set()
-        self._feedback_cache_time = current_time
-        return self._feedback_cache
+        # Mean of the one-hot seed genres and the seed-track feature vectors
+        return self.data.user_vectors([seed_genres], [self.data.indices_for(seed_uris)])
 
     def recommend(
         self,
         k: int = None,
         seed_genres: list[str] = None,
         liked_uris: list[str] = None,
-        disliked_uris: list[str] = None
+        disliked_uris: list[str] = None,
+        session: Session = None,
+        user_id: str = None,
+        exclude_uris: list[str] = None
     ) -> list[dict]:
-        seed_genres = seed_genres or []
-        liked_uris = liked_uris or []
-        disliked_uris = disliked_uris or []
-
-        # Combine all URIs to exclude (liked, disliked, and all previously rated)
-        exclude_uris = set(liked_uris) | set(disliked_uris)
-
-        # Add all tracks from feedback.csv to exclusion set
-        feedback_uris = self._get_feedback_uris()
-        exclude_uris.update(feedback_uris)
-
-        # 1) Pure content-based KNN recommendation (cold start)
-        knn_dicts = self.data.recommend(
-            seed_genres, liked_uris, k or self.k)
-        knn_dicts = [rec for rec in knn_dicts if rec['uri']
-                     not in exclude_uris]
-
-        # 2) If no logistic model or not enough feedback yet, return KNN
-        if self.lr_model is None:
-            return knn_dicts[:k or self.k]
-
-        try:
-            feedback_df = pd.read_csv(FEEDBACK_CSV_PATH)
-            total_feedback = len(feedback_df)
-        except:
-            total_feedback = 0
-
-        if total_feedback < MIN_FEEDBACK:
-            return knn_dicts[:k or self.k]
-
-        # 3) Enhanced hybrid recommendation: blend logistic regression with musical similarity
-        all_vectors = self.data.features
-        lr_probs = self.lr_model.predict_proba(all_vectors)[:, 1]
-
-        # Build user taste profile from liked tracks
-        if liked_uris:
-            liked_indices = [self.data.track_uris.index(
-                uri) for uri in liked_uris if uri in self.data.track_uris]
-            if liked_indices:
-                # Get musical features of liked tracks
-                liked_features = all_vectors[liked_indices]
-                user_musical_profile = np.mean(liked_features, axis=0)
-
-                # Calculate musical similarity scores
-                musical_similarities = np.dot(all_vectors, user_musical_profile) / (
-                    np.linalg.norm(all_vectors, axis=1) * np.linalg.norm(user_musical_profile))
-
-                # Blend logistic regression with musical similarity
-                # Weight: 70% LR probability, 30% musical similarity
-                blended_scores = 0.7 * lr_probs + 0.3 * musical_similarities
-            else:
-                blended_scores = lr_probs
+        return self.recommend_many([dict(
+            k=k, seed_genres=seed_genres, liked_uris=liked_uris,
+            disliked_uris=disliked_uris, session=session, user_id=user_id,
+            exclude_uris=exclude_uris)])[0]
+
+    def recommend_many(self, requests: list[dict]) -> list[list[dict]]:
+        """
+        Recommend for many users at once. Each request takes the same keyword
+        arguments as `recommend`. The KNN search and the taste-similarity
+        product run once for the whole batch (in chunks of `batch_chunk_size`
+        users) and the cached LR scores are shared; dedup and diversity are
+        still applied per user.
+
+        With a `session`, the user's likes and rated tracks come from the
+        session (its running taste sum and rated-row mask) instead of being
+        rebuilt from `liked_uris`/`disliked_uris`.
+        """
+        results = []
+        for start in range(0, len(requests), self.batch_chunk_size):
+            results.extend(self._recommend_chunk(
+                requests[start:start + self.batch_chunk_size]))
+        return results
+
+    def recommend_streams(self, requests: list[dict]) -> list[RankedStream]:
+        """
+        Like `recommend_many`, but return each user's ranking as a RankedStream
+        to page through: a page only does the work needed to fill it, and the
+        scores, exclusions and diversity state carry over between pages.
+        Unlike `recommend`, exclusions are applied while selecting and the
+        content-based ranking searches ever deeper neighbours before falling
+        back to popularity, so pages are full until the catalog runs out.
+        """
+        return self._recommend_chunk(requests, as_streams=True)
+
+    def _user_query(self, req: dict, data: ContentData) -> UserQuery:
+        k = req.get('k') or self.k
+        seed_genres = req.get('seed_genres') or []
+        session = req.get('session')
+        if session is not None:
+            liked_idxs, liked_sum, exclude_mask = session.snapshot(data)
         else:
-            blended_scores = lr_probs
-
-        # Get top candidates from blended scores
+            liked_uris = req.get('liked_uris') or []
+            disliked_uris = req.get('disliked_uris') or []
+            liked_idxs, liked_sum = data.indices_for(liked_uris), None
+            exclude_mask = row_mask(
+                data.n_rows, data.indices_for(liked_uris + disliked_uris))
+        # Rows to exclude: liked, disliked, all previously rated tracks, tracks
+        # the caller excluded, and tracks retired from the catalog (the
+        # aggregate may already be sized for a newer catalog snapshot)
+        exclude_mask[data.indices_for(req.get('exclude_uris') or [])] = True
+        exclude_mask[data.retired_rows] = True
+        rated = self.feedback.rated_mask[:len(exclude_mask)]
+        exclude_mask[:len(rated)] |= rated
+        return UserQuery(k, seed_genres, liked_idxs, liked_sum, exclude_mask, req.get('user_id'))
+
+    def _recommend_chunk(self, requests: list[dict], as_streams: bool = False) -> list:
+        # One consistent model and catalog snapshot for the whole chunk
+        state = self.model_state
+        data = state.data
+        with span("recommender.user_query"):
+            users = [self._user_query(req, data) for req in requests]
+        global_ready = state.model is not None and self.feedback.total >= MIN_FEEDBACK
+
+        # Users with a model of their own are scored with it, all in one product
+        user_states = {}
+        positions, weights = self.user_models.weights_for([user.user_id for user in users])
+        if positions:
+            with span("recommender.user_models"):
+                probs = self.user_models.predict_proba(weights, data)
+            user_states = {i: ModelState(None, p, None, data=data)
+                           for i, p in zip(positions, probs)}
+
+        results = [None] * len(users)
+
+        # 1) Pure content-based KNN recommendation (cold start), used when there
+        # is no logistic model (global or the user's own) or not enough feedback yet
+        cold = [i for i in range(len(users)) if not global_ready and i not in user_states]
+        if cold and as_streams:
+            for i in cold:
+                results[i] = self._content_stream(users[i], data)
+        elif cold:
+            with span("recommender.content"):
+                knn_results = self._content_recommend_many([users[i] for i in cold], data)
+            for i, knn_dicts in zip(cold, knn_results):
+                user = users[i]
+                rows = data.lookup([rec['uri'] for rec in knn_dicts])
+                results[i] = [rec for rec, row in zip(knn_dicts, rows)
+                              if not user.exclude_mask[row]][:user.k]
+            if len(cold) == len(users):
+                return results
+
+        # 2) Enhanced hybrid recommendation: blend logistic regression with musical similarity
+        hybrid = [i for i in range(len(users)) if results[i] is None]
+
+        # Build user taste profiles from liked tracks, scored in one product
+        profiles = {}
+        for i in hybrid:
+            user = users[i]
+            if user.liked_idxs.size:
+                liked_sum = user.liked_sum
+                if liked_sum is None:
+                    liked_sum = data.rows(user.liked_idxs).sum(axis=0)
+                profiles[i] = liked_sum / user.liked_idxs.size
+        if profiles:
+            profile_mat = np.vstack(list(profiles.values()))
+            # Calculate musical similarity scores (row norms are cached)
+            with span("recommender.similarity"):
+                similarity_mat = data.dot(profile_mat.T) / (
+                    data.row_norms[:, None] * np.linalg.norm(profile_mat, axis=1))
+            similarity_cols = dict(zip(profiles, similarity_mat.T))
+
+        with span("recommender.select"):
+            for i in hybrid:
+                user = users[i]
+                user_state = user_states.get(i, state)
+                lr_probs = user_state.probs
+                if i in profiles:
+                    # Blend logistic regression with musical similarity
+                    # Weight: 70% LR probability, 30% musical similarity
+                    blended_scores = 0.7 * lr_probs + 0.3 * similarity_cols[i]
+                else:
+                    blended_scores = lr_probs
+                if as_streams:
+                    results[i] = self._ranked_stream(user_state, blended_scores, user.exclude_mask)
+                else:
+                    results[i] = self._select(
+                        user_state, blended_scores, user.exclude_mask, user.k)
+        return results
+
+    def _select(self, state: ModelState, blended_scores: np.ndarray,
+                exclude_mask: np.ndarray, limit: int) -> list[dict]:
+        """Diversity-aware selection over progressively relaxed candidate tiers."""
+        stream = self._ranked_stream(state, blended_scores, exclude_mask)
+        return state.data.tracks(stream.next_page(limit))
+
+    def _ranked_stream(self, state: ModelState, blended_scores: np.ndarray,
+                       exclude_mask: np.ndarray) -> RankedStream:
+        selector = DiverseSelector(state.data.song_ids, state.data.artist_ids, exclude_mask, 0)
+        # The tiers hold the scores, unless they are a model's shared precomputed ones
+        shared = blended_scores is state.probs and state.order is not None
+        held = 0 if shared else blended_scores.nbytes
+        return RankedStream(selector, self._tiers(state, blended_scores, exclude_mask),
+                            state.data, held)
+
+    def _tiers(self, state: ModelState, blended_scores: np.ndarray, exclude_mask: np.ndarray):
+        """Candidate tiers, built only once the previous tier is used up."""
+        data = state.data
+        n_rows = data.n_rows
+
+        # First pass: top candidates by blended score, max 2 tracks per artist
         top_candidates = 100  # Get more candidates for better diversity
-        ranked_idx = np.argsort(-blended_scores)[:top_candidates]
-
-        # Use diversity-aware selection with musical variety
-        recommendation_uris = []
-        seen_uris = set()
-        seen_songs = set()  # Track unique song+artist combinations
-        seen_artists = set()  # Track artists to ensure diversity
-        limit = k or self.k
-
-        # First pass: select high-scoring tracks with artist diversity
-        for idx in ranked_idx:
-            uri = self.data.track_uris[idx]
-            if uri in exclude_uris or uri in seen_uris:
-                continue
-
-            song_name = self.data.track_names[idx]
-            artist_name = self.data.artist_names[idx]
-
-            # Create a unique key for song+artist combination
-            song_key = f"{song_name}|{artist_name}"
-
-            if song_key in seen_songs:
-                continue
-            seen_songs.add(song_key)
-
-            # Limit same artist to max 2 tracks per recommendation set
-            artist_key = artist_name.lower().split(
-                ',')[0].strip()  # Primary artist
-            if artist_key in seen_artists and len([u for u in recommendation_uris if self.data.artist_names[self.data.track_uris.index(u)].lower().split(',')[0].strip() == artist_key]) >= 2:
-                continue
-
-            recommendation_uris.append(uri)
-            seen_uris.add(uri)
-            seen_artists.add(artist_key)
-
-            if len(recommendation_uris) >= limit:
-                break
-
-        # If we still don't have enough recommendations, add more diverse tracks
-        if len(recommendation_uris) < limit:
-            # Get remaining tracks with good probabilities but lower ranking
-            remaining_indices = [i for i in range(
-                len(self.data.track_uris)) if i not in ranked_idx]
-            remaining_probs = lr_probs[remaining_indices]
-            remaining_ranked = [remaining_indices[i]
-                                for i in np.argsort(-remaining_probs)]
-
-            for idx in remaining_ranked:
-                uri = self.data.track_uris[idx]
-                if uri in exclude_uris or uri in seen_uris:
-                    continue
-
-                song_name = self.data.track_names[idx]
-                artist_name = self.data.artist_names[idx]
-
-                song_key = f"{song_name}|{artist_name}"
-
-                if song_key in seen_songs:
-                    continue
-                seen_songs.add(song_key)
-
-                # Relax artist diversity when we need more tracks
-                artist_key = artist_name.lower().split(',')[0].strip()
-                if artist_key in seen_artists and len([u for u in recommendation_uris if self.data.artist_names[self.data.track_uris.index(u)].lower().split(',')[0].strip() == artist_key]) >= 3:
-                    continue
+        ranked_idx = top_k(blended_scores, top_candidates)
+        yield [ranked_idx], 2
 
-                recommendation_uris.append(uri)
-                seen_uris.add(uri)
-                seen_artists.add(artist_key)
-
-                if len(recommendation_uris) >= limit:
-                    break
+        # Remaining tracks by LR probability, relaxing artist diversity (rows
+        # of the first pass are all taken or seen by now)
+        if state.order is not None:
+            yield state.order.blocks(RANKING_BLOCK_SIZE), 3
+        else:
+            # Per-user scores have no precomputed ranking; rank only as far as needed
+            skip = exclude_mask | row_mask(n_rows, ranked_idx)
+            yield ranked_blocks(state.probs, RANKING_BLOCK_SIZE, skip), 3
 
         # Enhanced fallback: popular tracks with relaxed diversity
-        if len(recommendation_uris) < limit:
-            all_indices = list(range(len(self.data.track_uris)))
-            popularity_scores = self.data.features[:, len(
-                self.data.genre_encoder.classes_)]
-            sorted_indices = sorted(
-                all_indices, key=lambda i: popularity_scores[i], reverse=True)
-
-            for idx in sorted_indices:
-                uri = self.data.track_uris[idx]
-                if uri in exclude_uris or uri in seen_uris:
-                    continue
-
-                song_name = self.data.track_names[idx]
-                artist_name = self.data.artist_names[idx]
-
-                song_key = f"{song_name}|{artist_name}"
-
-                if song_key in seen_songs:
-                    continue
-                seen_songs.add(song_key)
-
-                # Relax artist diversity even more in final fallback
-                artist_key = artist_name.lower().split(',')[0].strip()
-                if artist_key in seen_artists and len([u for u in recommendation_uris if self.data.artist_names[self.data.track_uris.index(u)].lower().split(',')[0].strip() == artist_key]) >= 4:
-                    continue
-
-                recommendation_uris.append(uri)
-                seen_uris.add(uri)
-                seen_artists.add(artist_key)
-
-                if len(recommendation_uris) >= limit:
-                    break
+        yield data.popularity_order.blocks(RANKING_BLOCK_SIZE), 4
 
         # Ultimate fallback: any available tracks to meet the limit
-        if len(recommendation_uris) < limit:
-            for idx in range(len(self.data.track_uris)):
-                uri = self.data.track_uris[idx]
-                if uri in exclude_uris or uri in seen_uris:
-                    continue
-
-                song_name = self.data.track_names[idx]
-                artist_name = self.data.artist_names[idx]
-
-                song_key = f"{song_name}|{artist_name}"
-
-                if song_key in seen_songs:
-                    continue
-                seen_songs.add(song_key)
-
-                recommendation_uris.append(uri)
-                seen_uris.add(uri)
-
-                if len(recommendation_uris) >= limit:
-                    break
-
-        return self.data.get_track_info(recommendation_uris)
+        yield blocks(np.arange(n_rows), RANKING_BLOCK_SIZE), None
+
+    def _content_stream(self, user: UserQuery, data: ContentData) -> RankedStream:
+        """
+        Content-based ranking: nearest neighbours of the taste vector, then
+        popularity. With a neighbour table, the liked tracks' merged lists
+        come first and the catalog is only searched once they run out.
+        """
+        vec = data.user_vectors([user.seed_genres], [user.liked_idxs], [user.liked_sum])[0]
+        selector = DiverseSelector(
+            data.song_ids, data.artist_ids, user.exclude_mask, 0)
+        tiers = []
+        if data.neighbors is not None and user.liked_idxs.size:
+            expanded = data.expand_seeds(
+                user.seed_genres, user.liked_idxs, user.liked_sum)
+            if expanded is not None:
+                tiers.append((blocks(expanded, RANKING_BLOCK_SIZE), None))
+        return RankedStream(selector, tiers + [
+            # Same first search depth as `ContentData.recommend_rows`
+            (data.neighbor_blocks(vec, 3 * user.k), None),
+            (data.popularity_order.blocks(RANKING_BLOCK_SIZE), None),
+        ], data)
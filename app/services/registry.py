@@ -0,0 +1,306 @@
+"""
+Process-wide registry for the catalog and recommender.
+
+Everything that needs the catalog or the model (routes, dependencies,
+scripts) goes through here, so the CSV is parsed and the indexes are fitted
+once per process. When the process forks after `preload()`, workers inherit
+the loaded state instead of building their own.
+
+Loading starts no threads. The pollers that keep the state current (feedback,
+model and catalog updates) are started by `start_background()`, once in each
+process that serves requests, so a fork never copies a poller's held locks
+and a parent that only preloads for its workers never polls or retrains.
+
+Nothing is loaded at import time: the API starts a background warm-up
+(`start_warm_up()`) and reports ready once it has finished.
+
+Catalog deltas replace the shared catalog snapshot (see `_install_catalog`).
+Services are built on, and switched to, the current snapshot under `_lock`,
+so none of them is left on an older one.
+"""
+import logging
+import threading
+import time
+
+from app.core.config import (
+    BATCH_MAX_SIZE,
+    BATCH_WINDOW,
+    CATALOG_POLL_INTERVAL,
+    CSV_PATH,
+    CURSOR_MEMORY_BUDGET,
+    CURSOR_TTL,
+    FEEDBACK_CSV_PATH,
+    FEEDBACK_FLUSH_INTERVAL,
+    FEEDBACK_POLL_INTERVAL,
+    INCREMENTAL_TRAINING,
+    LR_MODEL_PATH,
+    MODEL_POLL_INTERVAL,
+    RETRAIN_EVERY,
+    SCORING_QUEUE_DEPTH,
+    SCORING_WORKERS,
+    SESSION_MEMORY_BUDGET,
+    SESSION_TTL,
+)
+from app.data.preprocess import ContentData
+from app.services.batcher import RequestCoalescer
+from app.services.catalog import CatalogUpdates
+from app.services.cursors import CursorStore
+from app.services.feedback_aggregate import FeedbackAggregate
+from app.services.executor import ScoringExecutor
+from app.services.feedback_store import FeedbackStore
+from app.services.model_registry import ModelRegistry
+from app.services.recommender import HybridRecommender
+from app.services.sessions import SessionStore
+from app.services.updater import FeedbackUpdater
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_ready = threading.Event()
+# Separate from _lock, which is held while state loads
+_warm_up_lock = threading.Lock()
+_warm_up = None
+_warm_up_error = None
+_content_data = None
+_feedback = None
+_recommender = None
+_updater = None
+_scoring = None
+_models = None
+_sessions = None
+_coalescer = None
+_cursors = None
+_catalog_updates = None
+_background_started = False
+
+
+def get_content_data() -> ContentData:
+    """Return the shared catalog, loading it on first use."""
+    global _content_data
+    if _content_data is None:
+        with _lock:
+            if _content_data is None:
+                _content_data = ContentData(CSV_PATH)
+    return _content_data
+
+
+def get_feedback_aggregate() -> FeedbackAggregate:
+    """Return the shared in-memory feedback aggregate."""
+    global _feedback
+    if _feedback is None:
+        get_content_data()
+        with _lock:
+            if _feedback is None:
+                _feedback = FeedbackAggregate(_content_data, FeedbackStore(FEEDBACK_CSV_PATH))
+    return _feedback
+
+
+def get_recommender() -> HybridRecommender:
+    """Return the shared recommender, built on top of the shared catalog."""
+    global _recommender
+    if _recommender is None:
+        get_content_data()
+        feedback = get_feedback_aggregate()
+        with _lock:
+            if _recommender is None:
+                _recommender = HybridRecommender(_content_data, feedback)
+    return _recommender
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the shared model registry, which hot-reloads and retrains the model."""
+    global _models
+    if _models is None:
+        recommender = get_recommender()
+        with _lock:
+            if _models is None:
+                _models = ModelRegistry(
+                    recommender, LR_MODEL_PATH, RETRAIN_EVERY, INCREMENTAL_TRAINING)
+    return _models
+
+
+def get_updater() -> FeedbackUpdater:
+    """Return the shared feedback updater, which keeps the aggregate current."""
+    global _updater
+    if _updater is None:
+        feedback = get_feedback_aggregate()
+        with _lock:
+            if _updater is None:
+                _updater = FeedbackUpdater(
+                    FEEDBACK_CSV_PATH, flush_interval=FEEDBACK_FLUSH_INTERVAL,
+                    aggregate=feedback, store=feedback.store)
+    return _updater
+
+
+def get_scoring_executor() -> ScoringExecutor:
+    """Return the shared bounded executor used for recommendation scoring."""
+    global _scoring
+    if _scoring is None:
+        with _lock:
+            if _scoring is None:
+                _scoring = ScoringExecutor(SCORING_WORKERS, SCORING_QUEUE_DEPTH)
+    return _scoring
+
+
+def get_session_store() -> SessionStore:
+    """Return the shared store of server-side listening sessions."""
+    global _sessions
+    if _sessions is None:
+        get_content_data()
+        with _lock:
+            if _sessions is None:
+                _sessions = SessionStore(_content_data, SESSION_MEMORY_BUDGET, SESSION_TTL)
+    return _sessions
+
+
+def get_cursor_store() -> CursorStore:
+    """Return the shared store of open pagination cursors."""
+    global _cursors
+    if _cursors is None:
+        with _lock:
+            if _cursors is None:
+                _cursors = CursorStore(CURSOR_MEMORY_BUDGET, CURSOR_TTL)
+    return _cursors
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """
+    Return the shared coalescer that batches concurrent recommend requests
+    onto the scoring executor. Used from the API's event loop only.
+    """
+    global _coalescer
+    if _coalescer is None:
+        recommender = get_recommender()
+        scoring = get_scoring_executor()
+        with _lock:
+            if _coalescer is None:
+                _coalescer = RequestCoalescer(
+                    lambda requests: scoring.run(recommender.recommend_many, requests),
+                    BATCH_MAX_SIZE, BATCH_WINDOW)
+    return _coalescer
+
+
+def get_catalog_updates() -> CatalogUpdates:
+    """Return the shared catalog updater, which applies catalog deltas."""
+    global _catalog_updates
+    if _catalog_updates is None:
+        get_content_data()
+        with _lock:
+            if _catalog_updates is None:
+                _catalog_updates = CatalogUpdates(_content_data, _install_catalog)
+    return _catalog_updates
+
+
+def _install_catalog(data: ContentData, delta):
+    """Switch everything loaded so far to a new catalog snapshot."""
+    global _content_data
+    # Updated tracks moved to new rows; their feedback moves with them
+    replaced = delta.arrays['replaces']
+    moved = replaced >= 0
+    # Under the lock, so a getter building a service meanwhile either sees
+    # the whole switch or builds on the new snapshot and is switched here
+    with _lock:
+        # The aggregate first: the recommender reads its mask sized for any snapshot
+        if _feedback is not None:
+            _feedback.set_data(data, replaced[moved], delta.arrays['rows'][moved])
+        if _recommender is not None:
+            _recommender.set_catalog(data)
+        if _sessions is not None:
+            _sessions.data = data
+        _content_data = data
+
+
+def loaded() -> dict:
+    """Which pieces of shared state are loaded, without loading anything."""
+    return {
+        "catalog": _content_data is not None,
+        "feedback": _feedback is not None,
+        "recommender": _recommender is not None,
+        "model": _recommender is not None and _recommender.lr_model is not None,
+        "model_registry": _models is not None,
+        # Seed expansion only runs with a neighbour table for this catalog
+        "neighbor_table": _content_data is not None and _content_data.neighbors is not None,
+    }
+
+
+def is_ready() -> bool:
+    """Whether `preload()` has finished and requests can be served."""
+    return _ready.is_set()
+
+
+def warm_up_error():
+    """The exception that stopped the background warm-up, if any."""
+    return _warm_up_error
+
+
+def preload():
+    """
+    Load all shared state up front, e.g. before forking workers. Starts no
+    background threads; see `start_background()`.
+    """
+    phases = (
+        ("catalog", get_content_data),
+        ("feedback", get_feedback_aggregate),
+        ("recommender", get_recommender),
+        ("model registry", get_model_registry),
+        ("updater", get_updater),
+        ("sessions", get_session_store),
+        ("cursors", get_cursor_store),
+        ("catalog updates", get_catalog_updates),
+        ("scoring executor", get_scoring_executor),
+        ("request coalescer", get_request_coalescer),
+    )
+    started = time.perf_counter()
+    for name, load in phases:
+        phase_started = time.perf_counter()
+        load()
+        logger.info("Loaded %s in %.3fs", name, time.perf_counter() - phase_started)
+    logger.info("Warm-up finished in %.3fs", time.perf_counter() - started)
+    _ready.set()
+
+
+def start_background():
+    """
+    Start polling for new feedback, models and catalog deltas in this
+    process, once. Call it after any fork, in each process that serves.
+    """
+    global _background_started
+    feedback = get_feedback_aggregate()
+    models = get_model_registry()
+    catalog_updates = get_catalog_updates()
+    with _lock:
+        if _background_started:
+            return
+        _background_started = True
+    feedback.start_polling(FEEDBACK_POLL_INTERVAL)
+    models.start(MODEL_POLL_INTERVAL)
+    catalog_updates.start(CATALOG_POLL_INTERVAL)
+
+
+def start_warm_up():
+    """
+    Run `preload()` and then `start_background()` in a background thread,
+    once; returns immediately. A process forked after `preload()` (see
+    scripts/serve.py) only starts its pollers.
+    """
+    global _warm_up
+    if _ready.is_set():
+        start_background()
+        return
+    with _warm_up_lock:
+        if _warm_up is not None and (_warm_up.is_alive() or _warm_up_error is None):
+            return
+        _warm_up = threading.Thread(target=_run_warm_up, name="warm-up", daemon=True)
+        _warm_up.start()
+
+
+def _run_warm_up():
+    global _warm_up_error
+    _warm_up_error = None
+    try:
+        preload()
+        start_background()
+    except Exception as exc:
+        # Reported by the readiness check; the next start_warm_up() retries
+        _warm_up_error = exc
+        logger.exception("Warm-up failed")
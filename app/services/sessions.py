@@ -0,0 +1,118 @@
+import threading
+import uuid
+
+import numpy as np
+
+from app.services.cache import MISSING, LRUCache
+
+
+class Session:
+    """
+    Server-side state for one listening session.
+
+    Holds a running sum of the liked tracks' feature vectors and a packed
+    bitmask of every rated catalog row, so a request only needs to carry the
+    ratings that are new since the last one and applying them costs
+    O(new ratings) rather than O(session history). The user id, once a
+    request gives one, is bound to the session for the rest of its life.
+    """
+
+    def __init__(self, session_id: str, n_rows: int, n_features: int):
+        self.session_id = session_id
+        self.user_id = None
+        self.n_rows = n_rows
+        self.taste_sum = np.zeros(n_features, dtype=np.float32)
+        self.liked = set()
+        self.disliked = set()
+        self.rated_bits = np.zeros((n_rows + 7) // 8, dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the session."""
+        n_rated = len(self.liked) + len(self.disliked)
+        return self.taste_sum.nbytes + self.rated_bits.nbytes + 64 * n_rated + 256
+
+    def rate(self, data, liked_uris: list, disliked_uris: list):
+        """
+        Apply ratings and return (new_liked, new_disliked): the URIs whose
+        rating is new or changed. URIs not in the catalog are ignored.
+        """
+        new_liked, new_disliked = [], []
+        with self._lock:
+            self._fit(data)
+            for uris, label in ((liked_uris, 1), (disliked_uris, 0)):
+                for uri, idx in zip(uris, data.lookup(uris).tolist()):
+                    if idx < 0:
+                        continue
+                    if label:
+                        if idx in self.liked:
+                            continue
+                        self.disliked.discard(idx)
+                        self.liked.add(idx)
+                        self.taste_sum += data.rows([idx])[0]
+                        new_liked.append(uri)
+                    else:
+                        if idx in self.disliked:
+                            continue
+                        if idx in self.liked:
+                            self.liked.discard(idx)
+                            self.taste_sum -= data.rows([idx])[0]
+                        self.disliked.add(idx)
+                        new_disliked.append(uri)
+                    self.rated_bits[idx >> 3] |= np.uint8(0x80 >> (idx & 7))
+        return new_liked, new_disliked
+
+    def _fit(self, data):
+        # Grow to a catalog snapshot with more rows or genres than the session
+        # was created for (see ContentData.apply_delta); row ids never move
+        n_rows = data.n_rows
+        if n_rows > self.n_rows:
+            self.rated_bits = np.concatenate([self.rated_bits, np.zeros(
+                (n_rows + 7) // 8 - len(self.rated_bits), dtype=np.uint8)])
+            self.n_rows = n_rows
+        self.taste_sum = data.widen(self.taste_sum)
+
+    def snapshot(self, data=None):
+        """
+        Return (liked_rows, taste_sum, rated_mask) as independent copies,
+        sized for the catalog snapshot `data` when given.
+        """
+        with self._lock:
+            if data is not None:
+                self._fit(data)
+            liked = np.fromiter(sorted(self.liked), dtype=np.int64, count=len(self.liked))
+            taste_sum = self.taste_sum.copy()
+            rated = np.unpackbits(self.rated_bits, count=self.n_rows).astype(bool)
+        return liked, taste_sum, rated
+
+
+class SessionStore:
+    """
+    In-memory sessions, evicted least recently used first once their total
+    size exceeds `max_bytes`, and after `ttl` seconds without a request.
+    """
+
+    def __init__(self, data, max_bytes: int, ttl: float = None):
+        self.data = data
+        self.cache = LRUCache(max_bytes, ttl=ttl, sizeof=lambda s: s.nbytes)
+        self._lock = threading.Lock()  # makes lookup-or-create atomic
+
+    def get_or_create(self, session_id: str = None) -> Session:
+        """
+        Return the session with this id, or a fresh one under a new id if
+        there is none (never issued by this store, or expired): clients can't
+        choose session ids. A fresh session is stored before it is returned.
+        """
+        with self._lock:
+            if session_id is not None:
+                session = self.cache.get(session_id)
+                if session is not MISSING:
+                    return session
+            session = Session(uuid.uuid4().hex, self.data.n_rows, self.data.n_features)
+            self.cache.put(session.session_id, session)
+        return session
+
+    def save(self, session: Session):
+        """Store the session, refreshing its TTL and recorded size."""
+        self.cache.put(session.session_id, session)
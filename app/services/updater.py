@@ -1,37 +1,107 @@
-import os
-import pandas as pd
+import atexit
+import logging
+import threading
+import time
 from typing import List
-from app.core.config import FEEDBACK_CSV_PATH
+from app.core.config import FEEDBACK_CSV_PATH, FEEDBACK_FLUSH_MAX_BACKOFF
+from app.services.feedback_store import FeedbackStore
+
+logger = logging.getLogger(__name__)
 
 
 class FeedbackUpdater:
     """
     Handles persistence of feedback (likes/dislikes) to a CSV file.
+
+    By default every update is appended immediately. With `flush_interval`
+    set, updates are buffered in memory and a background thread appends them
+    in batches, every `flush_interval` seconds or once `batch_size` rows are
+    waiting, whichever comes first. An optional FeedbackAggregate is updated
+    in place on every update, before the rows are written; the rows are then
+    written through it, to its store. Rows that fail to write stay buffered,
+    and the thread retries them with backoff (up to `max_backoff` seconds).
     """
 
-    def __init__(self, feedback_csv_path: str = FEEDBACK_CSV_PATH):
+    def __init__(self, feedback_csv_path: str = FEEDBACK_CSV_PATH,
+                 flush_interval: float = None, batch_size: int = 500,
+                 aggregate=None, store: FeedbackStore = None,
+                 max_backoff: float = FEEDBACK_FLUSH_MAX_BACKOFF):
         self.path = feedback_csv_path
-        if not os.path.exists(self.path):
-            df = pd.DataFrame(columns=["track_uri", "label"])
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            df.to_csv(self.path, index=False)
+        self.store = store if store is not None else FeedbackStore(self.path)
+        self.aggregate = aggregate
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flusher = None
+        if flush_interval is not None:
+            atexit.register(self.flush)
 
-    def update(self, liked_uris: List[str], disliked_uris: List[str]):
+    def update(self, liked_uris: List[str], disliked_uris: List[str], user_id: str = None):
         """
-        Append new feedback rows: label=1 for likes, label=0 for dislikes.
+        Append new feedback rows: label=1 for likes, label=0 for dislikes,
+        tagged with the user who gave them (empty when anonymous).
         """
+        user = user_id or ""
+        entries = [(uri, 1, user) for uri in liked_uris] + \
+            [(uri, 0, user) for uri in disliked_uris]
+        if not entries:
+            return
+        if self.aggregate is not None:
+            self.aggregate.record(liked_uris, disliked_uris)
+
+        if self.flush_interval is None:
+            self._write(entries)
+            return
+
+        with self._cond:
+            self._pending.extend(entries)
+            # Started lazily, so a process that forks after building the
+            # updater gets its own flusher thread
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="feedback-flusher", daemon=True)
+                self._flusher.start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write out any buffered feedback now."""
+        with self._cond:
+            entries, self._pending = self._pending, []
         try:
-            df = pd.read_csv(self.path)
+            self._write(entries)
         except Exception:
-            df = pd.DataFrame(columns=["track_uri", "label"])
-
-        entries = []
-        for uri in liked_uris:
-            entries.append({"track_uri": uri, "label": 1})
-        for uri in disliked_uris:
-            entries.append({"track_uri": uri, "label": 0})
-
-        if entries:
-            new_df = pd.DataFrame(entries)
-            df = pd.concat([df, new_df], ignore_index=True)
-            df.to_csv(self.path, index=False)
+            # Keep the rows for the next attempt rather than dropping them
+            with self._cond:
+                self._pending[:0] = entries
+            raise
+
+    def _write(self, entries):
+        if self.aggregate is not None:
+            # Through the aggregate, which hands the rows over from its
+            # unflushed counts to the store's in one step
+            self.aggregate.append(entries)
+        else:
+            self.store.append(entries)
+
+    def _flush_loop(self):
+        failures = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.batch_size,
+                    timeout=self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # The rows are back in _pending; keep the thread alive and
+                # retry them after a pause
+                failures += 1
+                delay = min(self.flush_interval * 2 ** failures, self.max_backoff)
+                logger.exception("Could not write %d feedback rows; retrying in %.1fs",
+                                 len(self._pending), delay)
+                time.sleep(delay)
+            else:
+                failures = 0
@@ -0,0 +1,264 @@
+"""
+Per-user preference models.
+
+Every user with enough feedback gets a logistic model over the catalog
+features. The models are stored together as the rows of one float32 matrix
+(feature weights plus intercept per user) in `weights.npy`, with
+`user_ids.npy` naming the user of each row and `meta.json` recording what the
+models were trained against, including how far into the feedback log
+(`feedback_offset`), so the next run only refits users with newer feedback. The matrix is memory-mapped, so a large user base
+costs page cache shared by all workers rather than heap, and scoring a user is
+a row lookup plus a product with the feature matrix. Users without a row fall
+back to the global model.
+"""
+import copy
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.data import artifact
+from app.data.preprocess import ContentData
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def _read_meta(model_dir: str):
+    try:
+        with open(os.path.join(model_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _compatible(meta: dict, data: ContentData) -> bool:
+    # Models trained before catalog deltas still apply: deltas keep row
+    # and column ids, and genres they add get zero weight (see widen)
+    return (meta.get('version') == FORMAT_VERSION
+            and meta.get('n_features', 0) <= data.n_features
+            and meta.get('catalog_base', meta.get('catalog_version')) == data.base_version)
+
+
+def _load_models(model_dir: str, meta: dict):
+    """(user_ids, memory-mapped weights) of the set in `model_dir`, or None."""
+    try:
+        weights = np.load(os.path.join(model_dir, 'weights.npy'), mmap_mode='r')
+        user_ids = np.load(os.path.join(model_dir, 'user_ids.npy'))
+    except (OSError, ValueError):
+        return None  # replaced while we read it
+    if len(user_ids) != len(weights) or len(weights) != meta.get('n_users'):
+        return None
+    return user_ids, weights
+
+
+def trained_offset(model_dir: str, data: ContentData):
+    """
+    The feedback-log offset the models in `model_dir` were trained up to, or
+    None if there are none usable with `data` to build on.
+    """
+    meta = _read_meta(model_dir)
+    if meta is None or not _compatible(meta, data):
+        return None
+    return meta.get('feedback_offset')
+
+
+class UserModels:
+    """
+    Read side of the per-user models in `model_dir`. `reload_if_changed()`
+    swaps in a newly trained set; requests in flight keep the set they
+    started with.
+    """
+
+    def __init__(self, data: ContentData, model_dir: str):
+        self.data = data
+        self.model_dir = model_dir
+        # (version, user id -> row, weight matrix), swapped as one unit
+        self._state = (None, {}, None)
+        self.reload_if_changed()
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    def reload_if_changed(self) -> bool:
+        """Map the stored models if they changed since the last load."""
+        meta = _read_meta(self.model_dir)
+        if meta is None or meta.get('trained_at') == self.version:
+            return False
+        if not _compatible(meta, self.data):
+            logger.warning("Ignoring user models in %s: trained for another catalog",
+                           self.model_dir)
+            return False
+        loaded = _load_models(self.model_dir, meta)
+        if loaded is None:
+            return False  # retry on the next check
+        user_ids, weights = loaded
+        rows = dict(zip(user_ids.tolist(), range(len(user_ids))))
+        self._state = (meta['trained_at'], rows, weights)
+        logger.info("Loaded %d user models from %s", len(rows), self.model_dir)
+        return True
+
+    def weights_for(self, user_ids: list) -> tuple:
+        """
+        Return (positions, weights): the positions in `user_ids` of users that
+        have a model, and their weight rows as an (m, n_features + 1) array.
+        """
+        _, rows, weights = self._state
+        found = [(i, rows[user_id]) for i, user_id in enumerate(user_ids)
+                 if user_id is not None and user_id in rows]
+        if not found:
+            return [], None
+        positions, idxs = zip(*found)
+        return list(positions), np.asarray(weights[list(idxs)])
+
+    def predict_proba(self, weights: np.ndarray, data: ContentData = None) -> np.ndarray:
+        """Like-probability of every catalog row (of `data`) under each model, as (m, N)."""
+        data = data if data is not None else self.data
+        logits = data.dot(data.widen(weights[:, :-1]).T) + weights[:, -1]
+        return np.ascontiguousarray((1 / (1 + np.exp(-logits))).T)
+
+
+def prior_weights(model, n_features: int) -> np.ndarray:
+    """A linear model's [coef..., intercept] row, or zeros if it has none."""
+    coef = getattr(model, 'coef_', None)
+    if coef is None or coef.shape != (1, n_features):
+        return np.zeros(n_features + 1)
+    return np.append(coef[0], model.intercept_[0])
+
+
+def _fit_block(X: sp.coo_matrix, y: np.ndarray, users: np.ndarray, n_users: int,
+               prior: np.ndarray, l2: float) -> np.ndarray:
+    """
+    Jointly fit the logistic models of `n_users` users, where row i of X is a
+    track rated y[i] by user users[i]. Each user's weights are L2-shrunk
+    toward `prior`; the loss is a sum over users, so one L-BFGS run over all
+    of their weights fits each of them as if alone.
+
+    Only the (user, feature) pairs that occur in a user's rated tracks are
+    optimized (plus each intercept): any other weight gets no gradient from
+    the data, so it stays at the prior.
+    """
+    from scipy.optimize import minimize
+    from scipy.special import expit
+
+    n, d = X.shape
+    pairs, pair_of_entry = np.unique(users[X.row] * d + X.col, return_inverse=True)
+    n_pairs = len(pairs)
+    prior_logits = np.bincount(X.row, weights=X.data * prior[X.col], minlength=n) + prior[d]
+
+    def loss_and_grad(params):
+        delta, bias = params[:n_pairs], params[n_pairs:]
+        z = (prior_logits + bias[users]
+             + np.bincount(X.row, weights=X.data * delta[pair_of_entry], minlength=n))
+        loss = np.logaddexp(0, z).sum() - y @ z + 0.5 * l2 * delta @ delta
+        residual = expit(z) - y
+        grad = np.concatenate([
+            np.bincount(pair_of_entry, weights=residual[X.row] * X.data, minlength=n_pairs)
+            + l2 * delta,
+            np.bincount(users, weights=residual, minlength=n_users),
+        ])
+        return loss, grad
+
+    result = minimize(loss_and_grad, np.zeros(n_pairs + n_users), jac=True,
+                      method='L-BFGS-B', options={'maxiter': 200})
+    weights = np.tile(prior, (n_users, 1))
+    pair_users, pair_cols = np.divmod(pairs, d)
+    weights[pair_users, pair_cols] += result.x[:n_pairs]
+    weights[:, d] += result.x[n_pairs:]
+    return weights
+
+
+def train_user_models(data: ContentData, feedback_df, out_dir: str, prior_model=None,
+                      min_feedback: int = 5, l2: float = 1.0, block_size: int = 2048,
+                      users=None, feedback_offset: int = None) -> int:
+    """
+    Fit a model for every user with at least `min_feedback` rated catalog
+    tracks, including both likes and dislikes (a user's latest rating of a
+    track wins), and write them to `out_dir`, replacing the previous set in
+    one rename. Users are fitted `block_size` at a time straight into the
+    memory-mapped output. Returns the number of users with a model.
+
+    With `users`, only they are refitted and every other user keeps their
+    model from the set in `out_dir`. `feedback_offset` records how far into
+    the feedback log `feedback_df` goes (see `trained_offset`).
+    """
+    import pandas as pd
+
+    kept_ids, kept_weights = np.empty(0, dtype=str), None
+    if users is not None:
+        meta = _read_meta(out_dir)
+        loaded = _load_models(out_dir, meta) if meta and _compatible(meta, data) else None
+        if loaded is not None:
+            stored_ids, stored_weights = loaded
+            kept = np.flatnonzero(~np.isin(stored_ids, list(users)))
+            kept_ids, kept_weights = stored_ids[kept], stored_weights[kept]
+        feedback_df = feedback_df[feedback_df['user_id'].isin(list(users))]
+
+    df = feedback_df[feedback_df['user_id'].notna() & (feedback_df['user_id'] != '')]
+    df = pd.DataFrame({
+        'user_id': df['user_id'].astype(str).to_numpy(),
+        'row': data.lookup(df['track_uri'].astype(str).tolist()),
+        'label': df['label'].to_numpy(dtype=np.float64),
+    })
+    df = df[df['row'] >= 0].drop_duplicates(['user_id', 'row'], keep='last')
+    stats = df.groupby('user_id')['label'].agg(['size', 'sum'])
+    eligible = stats.index[(stats['size'] >= min_feedback)
+                           & (stats['sum'] > 0) & (stats['sum'] < stats['size'])]
+    df = df[df['user_id'].isin(eligible)].sort_values('user_id', kind='stable')
+    codes, user_ids = pd.factorize(df['user_id'], sort=True)
+    rows, labels = df['row'].to_numpy(), df['label'].to_numpy()
+    # Each user's ratings are contiguous: bounds[u]:bounds[u + 1]
+    bounds = np.searchsorted(codes, np.arange(len(user_ids) + 1))
+    if getattr(prior_model, 'coef_', None) is not None:
+        # On a copy, so the caller's model keeps its own coefficients
+        prior_model = copy.copy(prior_model)
+        prior_model.coef_ = data.widen(prior_model.coef_)
+    prior = prior_weights(prior_model, data.n_features)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.user-models-')
+    os.chmod(tmp_dir, 0o755)
+    n_kept = len(kept_ids)
+    weights = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, 'weights.npy'), mode='w+', dtype=np.float32,
+        shape=(n_kept + len(user_ids), data.n_features + 1))
+    # Kept models first, copied a block at a time and widened to new genres
+    for start in range(0, n_kept, block_size):
+        stop = min(start + block_size, n_kept)
+        block = np.asarray(kept_weights[start:stop])
+        weights[start:stop, :-1] = data.widen(block[:, :-1])
+        weights[start:stop, -1] = block[:, -1]
+    for start in range(0, len(user_ids), block_size):
+        stop = min(start + block_size, len(user_ids))
+        lo, hi = bounds[start], bounds[stop]
+        block_rows = rows[lo:hi]
+        X = data.sparse_rows(block_rows).tocoo()
+        weights[n_kept + start:n_kept + stop] = _fit_block(
+            X, labels[lo:hi], codes[lo:hi] - start, stop - start, prior, l2)
+    weights.flush()
+    del weights
+    user_ids = np.concatenate([kept_ids.astype(str), np.asarray(user_ids, dtype=str)])
+    np.save(os.path.join(tmp_dir, 'user_ids.npy'), user_ids)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'version': FORMAT_VERSION,
+            'n_users': len(user_ids),
+            'n_features': data.n_features,
+            'catalog_version': data.version,
+            'catalog_base': data.base_version,
+            'feedback_offset': feedback_offset,
+            'trained_at': time.time(),
+        }, f)
+    # Readers that already mapped the old matrix keep it until they reload
+    artifact.replace_dir(tmp_dir, out_dir)
+    return len(user_ids)
@@ -31,6 +31,8 @@ const App: FC = () => {
     const [recommendations, setRecommendations] = useState<Song[]>([]);
     const [likedRecs, setLikedRecs] = useState<string[]>([]);
     const [dislikedRecs, setDislikedRecs] = useState<string[]>([]);
+    const [sessionId, setSessionId] = useState<string | null>(null);
+    const [cursor, setCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
@@ -132,18 +134,21 @@ const App: FC = () => {
         setLoading(true);
         setError(null);
         try {
-            const res = await fetch(`${API_BASE}/api/recommend`, {
+            const res = await fetch(`${API_BASE}/api/recommend/paged`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
                     seed_genres: selectedGenres,
                     liked_uris: likedSamples,
                     disliked_uris: dislikedSamples,
-                    k: songCount
+                    k: songCount,
+                    session_id: sessionId
                 }),
             });
             const data = await res.json();
             setRecommendations(data.recommendations || []);
+            setSessionId(data.session_id ?? null);
+            setCursor(data.cursor ?? null);
             setStep("recommend");
         } catch {
             setError("Failed to fetch recommendations.");
@@ -163,11 +168,15 @@ const App: FC = () => {
                     seed_genres: selectedGenres,
                     liked_uris: likedRecs,
                     disliked_uris: dislikedRecs,
-                    k: songCount
+                    k: songCount,
+                    session_id: sessionId
                 }),
             });
             const data = await res.json();
             setRecommendations(data.recommendations || []);
+            setSessionId(data.session_id ?? null);
+            // New feedback reranks everything, so the old pages no longer apply
+            setCursor(null);
             setLikedRecs([]);
             setDislikedRecs([]);
             setStep("recommend");
@@ -178,6 +187,40 @@ const App: FC = () => {
         }
     };
 
+    const fetchNextPage = async () => {
+        if (!cursor) return;
+        setLoading(true);
+        setError(null);
+        try {
+            const params = new URLSearchParams({ k: String(songCount) });
+            let res = await fetch(`${API_BASE}/api/recommend/paged/${cursor}?${params.toString()}`);
+            if (res.status === 404) {
+                // The cursor expired; continue with a new ranking that leaves
+                // out the songs already shown, below them
+                res = await fetch(`${API_BASE}/api/recommend/paged`, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({
+                        seed_genres: selectedGenres,
+                        liked_uris: likedSamples,
+                        disliked_uris: dislikedSamples,
+                        exclude_uris: recommendations.map(song => song.uri),
+                        k: songCount,
+                        session_id: sessionId
+                    }),
+                });
+            }
+            const data = await res.json();
+            setRecommendations(prev => [...prev, ...(data.recommendations || [])]);
+            setCursor(data.cursor ?? null);
+            setSessionId(data.session_id ?? sessionId);
+        } catch {
+            setError("Failed to fetch more recommendations.");
+        } finally {
+            setLoading(false);
+        }
+    };
+
     const songCountSlider = (
         <div className={styles.songCountSelector}>
             <label
@@ -441,6 +484,15 @@ const App: FC = () => {
                             >
                                 Recommend More
                             </button>
+                            {cursor && (
+                                <button
+                                    onClick={fetchNextPage}
+                                    disabled={loading}
+                                    className={styles.button}
+                                >
+                                    Show More
+                                </button>
+                            )}
                         </div>
                     )}
 
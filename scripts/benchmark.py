@@ -0,0 +1,372 @@
+from app.services.updater import FeedbackUpdater
+from app.services.online_learner import labeled_rows, save_atomic
+from app.services.feedback_store import FeedbackStore
+from app.data.preprocess import ContentData
+from app.data.catalog_delta import CatalogDelta
+from app.data.neighbors import build_neighbor_table, load_neighbor_table
+from app.core.config import (
+    CSV_PATH,
+    FEATURE_ARTIFACT_DIR,
+    FEEDBACK_CSV_PATH,
+    LR_MODEL_PATH,
+    NEIGHBORS_M,
+    USER_MIN_FEEDBACK,
+    USER_MODEL_DIR,
+)
+from app.services.user_models import train_user_models
+from sklearn.linear_model import LogisticRegression
+import synthetic
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REQUEST_LOG = 'requests.jsonl'
+
+# Metrics where a larger value is worse / better, for baseline comparison
+WORSE_IF_HIGHER = ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+WORSE_IF_LOWER = ('throughput_rps',)
+# Latency changes smaller than this are timer noise, never regressions
+NOISE_FLOOR_MS = 0.05
+
+
+def summarize(latencies: list, wall_s: float = None) -> dict:
+    """Latency percentiles (ms) and throughput for one benchmark."""
+    ms = np.asarray(latencies) * 1e3
+    wall_s = wall_s if wall_s is not None else ms.sum() / 1e3
+    return {
+        'n': len(ms),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'throughput_rps': len(ms) / wall_s if wall_s > 0 else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def timed(fn, calls: list, warmup: int = 3) -> dict:
+    """Call `fn(*args)` for each args tuple in `calls` and summarize the latencies."""
+    for args in calls[:warmup]:
+        fn(*args)
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def ensure_model(data: ContentData):
+    """Train the global and per-user models on the synthetic feedback log if missing."""
+    if os.path.exists(LR_MODEL_PATH) and os.path.exists(USER_MODEL_DIR):
+        return
+    feedback_df = FeedbackStore(FEEDBACK_CSV_PATH).read_all()
+    X, y = labeled_rows(data, feedback_df['track_uri'].tolist(), feedback_df['label'])
+    os.makedirs(os.path.dirname(LR_MODEL_PATH), exist_ok=True)
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    save_atomic(model, LR_MODEL_PATH)
+    train_user_models(data, feedback_df, USER_MODEL_DIR, prior_model=model,
+                      min_feedback=USER_MIN_FEEDBACK)
+
+
+def random_queries(data: ContentData, n: int, seed: int = 0) -> list:
+    """(seed_genres, liked_uris, disliked_uris) tuples over the catalog."""
+    rng = np.random.default_rng(seed)
+    # Weight genres by how many tracks carry them, like real selections
+    genres = np.asarray(data.genre_encoder.classes_, dtype=object)
+    counts = np.diff(data.genre_offsets).astype(float)
+    p = counts / counts.sum()
+    uris = np.asarray(data.track_uris, dtype=object)
+    return [
+        (genres[rng.choice(len(genres), rng.integers(1, 4), replace=False, p=p)].tolist(),
+         uris[rng.integers(0, len(uris), rng.integers(1, 4))].tolist(),
+         uris[rng.integers(0, len(uris), rng.integers(0, 3))].tolist())
+        for _ in range(n)
+    ]
+
+
+def run_micro(args) -> dict:
+    """Per-function benchmarks of the recommender hot paths."""
+    from app.services.recommender import HybridRecommender
+    from app.services.feedback_aggregate import FeedbackAggregate
+
+    results = {}
+    shutil.rmtree(FEATURE_ARTIFACT_DIR, ignore_errors=True)
+    results['content_data_build'] = timed(lambda: ContentData(CSV_PATH), [()], warmup=0)
+    results['content_data_load'] = timed(lambda: ContentData(CSV_PATH), [()] * 5, warmup=0)
+
+    data = ContentData(CSV_PATH, neighbor_dir=None)
+    ensure_model(data)
+    queries = random_queries(data, args.calls)
+    k = args.k
+
+    results['content_recommend'] = timed(
+        data.recommend, [(genres, liked, k) for genres, liked, _ in queries])
+    # Seed expansion over a freshly built neighbour table
+    table_dir = os.path.join(args.dir, 'bench_neighbors')
+    results['build_neighbor_table'] = timed(
+        build_neighbor_table, [(data, table_dir, NEIGHBORS_M)], warmup=0)
+    data.neighbors = load_neighbor_table(table_dir, data.base_version, data.n_rows)
+    results['content_recommend_expand'] = timed(
+        data.recommend, [(genres, liked, k) for genres, liked, _ in queries])
+    data.neighbors = None
+    results['sample_popular_by_genres'] = timed(
+        data.sample_popular_by_genres, [(genres, k) for genres, _, _ in queries])
+
+    feedback = FeedbackAggregate(data, FeedbackStore(FEEDBACK_CSV_PATH))
+    recommender = HybridRecommender(data, feedback)
+    calls = [(k, genres, liked, disliked) for genres, liked, disliked in queries]
+    state = recommender.model_state
+    recommender.set_model(None)
+    results['hybrid_recommend_cold'] = timed(recommender.recommend, calls)
+    recommender.install(state)
+    results['hybrid_recommend'] = timed(recommender.recommend, calls)
+
+    # The most active users, who have models of their own
+    feedback_df = FeedbackStore(FEEDBACK_CSV_PATH).read_all()
+    users = feedback_df['user_id'].value_counts().index[:len(calls)].tolist()
+    results['hybrid_recommend_user'] = timed(
+        recommender.recommend, [call + (None, user) for call, user in zip(calls, users)])
+    results['train_user_models'] = timed(
+        train_user_models,
+        [(data, feedback_df, os.path.join(args.dir, 'bench_user_models'), state.model)],
+        warmup=0)
+
+    updater = FeedbackUpdater(os.path.join(args.dir, 'bench_feedback.csv'))
+    results['feedback_update'] = timed(
+        updater.update, [(liked, disliked) for _, liked, disliked in queries])
+
+    # A catalog delta of 100 new tracks, derived and applied in memory
+    tracks = pd.read_csv(CSV_PATH, nrows=100)
+    tracks['Track URI'] = [f'spotify:track:bench{i}' for i in range(len(tracks))]
+
+    def apply_delta():
+        arrays, meta = data.derive_delta(tracks)
+        return data.apply_delta(CatalogDelta(data.delta_seq + 1, meta, arrays))
+    results['catalog_delta_apply'] = timed(apply_delta, [()] * args.calls)
+    return results
+
+
+async def replay(app, entries: list, concurrency: int) -> dict:
+    """Replay logged requests against the ASGI app from `concurrency` clients."""
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("The HTTP load test needs httpx: pip install httpx")
+
+    latencies, by_route, statuses = [], {}, {}
+    queue = asyncio.Queue()
+    for entry in entries:
+        queue.put_nowait(entry)
+
+    async def client_loop(client):
+        while not queue.empty():
+            entry = queue.get_nowait()
+            start = time.perf_counter()
+            resp = await client.request(entry['method'], entry['path'],
+                                        params=entry.get('params'), json=entry.get('json'))
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            by_route.setdefault(entry['path'], []).append(elapsed)
+            statuses[str(resp.status_code)] = statuses.get(str(resp.status_code), 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall_s = time.perf_counter() - start
+
+    return {
+        'all': summarize(latencies, wall_s),
+        'routes': {path: summarize(lat, wall_s) for path, lat in by_route.items()},
+        'status': statuses,
+        'concurrency': concurrency,
+    }
+
+
+def run_http(args) -> dict:
+    """In-process load test of the FastAPI routes, replaying a request log."""
+    from app.services import registry
+    ensure_model(registry.get_content_data())
+    # Load everything before measuring rather than through the app's warm-up
+    registry.preload()
+    from app.main import app
+
+    with open(args.log or REQUEST_LOG) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    # Warm up with the first few requests before measuring
+    asyncio.run(replay(app, entries[:20], 1))
+    return asyncio.run(replay(app, entries, args.concurrency))
+
+
+PHASES = {'micro': run_micro, 'http': run_http}
+
+
+def prepare_dir(size_dir: str, n_tracks: int, args):
+    """
+    Lay out a working directory with the synthetic catalog and feedback log at
+    the paths the app is configured with, so the app can run from it as is.
+    """
+    marker = os.path.join(size_dir, 'synthetic.json')
+    params = {'tracks': n_tracks, 'feedback': args.feedback, 'requests': args.requests,
+              'users': True}
+    try:
+        with open(marker) as f:
+            if json.load(f) == params:
+                return
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(size_dir, ignore_errors=True)
+    print(f"Generating synthetic data for {n_tracks} tracks...")
+    catalog = synthetic.make_catalog(n_tracks, os.path.join(size_dir, CSV_PATH))
+    uris = catalog['Track URI'].to_numpy()
+    feedback = synthetic.make_feedback(uris, args.feedback, os.path.join(size_dir, FEEDBACK_CSV_PATH))
+    top_genres = catalog['Artist Genres'].str.split(',').explode().value_counts().index[:20]
+    synthetic.make_request_log(uris, top_genres.tolist(), args.requests,
+                               os.path.join(size_dir, REQUEST_LOG), k=args.k,
+                               user_ids=feedback['user_id'].unique())
+    with open(marker, 'w') as f:
+        json.dump(params, f)
+
+
+def run_phase(phase: str, size_dir: str, args) -> dict:
+    """Run one phase in a fresh process, so its peak RSS is its own."""
+    out = os.path.join(size_dir, f'result-{phase}.json')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    cmd = [sys.executable, os.path.abspath(__file__), '--phase', phase, '--dir', size_dir,
+           '--calls', str(args.calls), '--k', str(args.k),
+           '--concurrency', str(args.concurrency), '--phase-out', out]
+    if args.log:
+        cmd += ['--log', os.path.abspath(args.log)]
+    subprocess.run(cmd, cwd=size_dir, env=env, check=True)
+    with open(out) as f:
+        return json.load(f)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return (name, metric, baseline, current, ratio) for each regression."""
+    regressions = []
+
+    def walk(cur, base, path):
+        for key, value in cur.items():
+            if key not in base:
+                continue
+            if isinstance(value, dict):
+                walk(value, base[key], path + [key])
+            elif key in WORSE_IF_HIGHER or key in WORSE_IF_LOWER:
+                if not base[key]:
+                    continue
+                ratio = value / base[key]
+                worse = ratio > 1 + tolerance if key in WORSE_IF_HIGHER else ratio < 1 - tolerance
+                if key.endswith('_ms') and value - base[key] < NOISE_FLOOR_MS:
+                    worse = False
+                if worse:
+                    regressions.append(('/'.join(path), key, base[key], value, ratio))
+
+    walk(results['sizes'], baseline.get('sizes', {}), [])
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"{'benchmark':<48} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for size, phases in results['sizes'].items():
+        for phase in PHASES:
+            report = phases.get(phase)
+            if report is None:
+                continue
+            rows = report['benchmarks'].items() if phase == 'micro' else \
+                [('http', report['benchmarks']['all'])] + \
+                [(f'http {p}', s) for p, s in report['benchmarks']['routes'].items()]
+            for name, s in rows:
+                print(f"{size + ' ' + name:<48} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} "
+                      f"{s['p99_ms']:>9.3f} {s['throughput_rps']:>9.1f}")
+            print(f"{size + ' ' + phase + ' peak RSS':<48} {report['peak_rss_mb']:>9.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the recommender on synthetic catalogs and load-test the API.")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10_000, 100_000],
+                        help="Catalog sizes to benchmark (e.g. 10000 100000 1000000)")
+    parser.add_argument('--phases', nargs='*', choices=sorted(PHASES), default=sorted(PHASES))
+    parser.add_argument('--calls', type=int, default=200,
+                        help="Calls per micro-benchmark")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--feedback', type=int, default=5_000,
+                        help="Rows in the synthetic feedback log")
+    parser.add_argument('--requests', type=int, default=2_000,
+                        help="Requests in the synthetic request log")
+    parser.add_argument('--log', help="Replay this request log instead of a synthetic one")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Concurrent clients in the HTTP load test")
+    parser.add_argument('--workdir', default='bench',
+                        help="Where synthetic data is generated (and reused)")
+    parser.add_argument('--out', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against a previous results JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument('--phase', choices=sorted(PHASES), help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    parser.add_argument('--phase-out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        # Child process: run one phase from inside the working directory
+        report = {'benchmarks': PHASES[args.phase](args), 'peak_rss_mb': peak_rss_mb()}
+        with open(args.phase_out, 'w') as f:
+            json.dump(report, f)
+        return
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': {k: v for k, v in vars(args).items()
+                     if k not in ('phase', 'dir', 'phase_out', 'out', 'baseline')},
+        },
+        'sizes': {},
+    }
+    for n_tracks in args.sizes:
+        size_dir = os.path.abspath(os.path.join(args.workdir, str(n_tracks)))
+        prepare_dir(size_dir, n_tracks, args)
+        results['sizes'][str(n_tracks)] = {
+            phase: run_phase(phase, size_dir, args) for phase in args.phases}
+
+    print_report(results)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, metric, base, cur, ratio in regressions:
+            print(f"REGRESSION {name} {metric}: {base:.3f} -> {cur:.3f} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
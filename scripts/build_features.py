@@ -0,0 +1,31 @@
+from app.data.preprocess import build_feature_artifact
+from app.data import artifact
+from app.core.config import CSV_PATH, FEATURE_ARTIFACT_DIR
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute the memory-mapped catalog feature artifact.")
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--out', default=FEATURE_ARTIFACT_DIR)
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild even if the artifact matches the CSV")
+    args = parser.parse_args()
+
+    if not args.force and artifact.is_fresh(args.out, args.csv):
+        print(f"Feature artifact at {args.out} is up to date.")
+        return
+
+    with artifact.build_lock(args.out):
+        build_feature_artifact(args.csv, args.out)
+    meta = artifact.read_meta(args.out)
+    print(
+        f"Saved feature artifact v{meta['version']} ({len(meta['genres'])} genres) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
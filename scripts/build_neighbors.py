@@ -0,0 +1,36 @@
+from app.services.registry import get_content_data
+from app.data.neighbors import build_neighbor_table
+from app.core.config import (
+    NEIGHBOR_BUILD_MEMORY,
+    NEIGHBOR_BUILD_WORKERS,
+    NEIGHBOR_TABLE_DIR,
+    NEIGHBORS_M,
+)
+import argparse
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute every track's nearest neighbours for seed expansion.")
+    parser.add_argument('--out', default=NEIGHBOR_TABLE_DIR)
+    parser.add_argument('--m', type=int, default=NEIGHBORS_M,
+                        help="Neighbours stored per track")
+    parser.add_argument('--memory', type=int, default=NEIGHBOR_BUILD_MEMORY,
+                        help="Bytes of similarity blocks held at once")
+    parser.add_argument('--workers', type=int, default=NEIGHBOR_BUILD_WORKERS,
+                        help="Blocks scored in parallel (default: one per core)")
+    args = parser.parse_args()
+
+    data = get_content_data()
+    started = time.perf_counter()
+    m = build_neighbor_table(data, args.out, args.m, args.memory, args.workers)
+    print(f"Saved {m} neighbours for each of {data.n_rows} tracks to {args.out} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from app.services.catalog import CatalogUpdates
+from app.data.preprocess import ContentData
+from app.core.config import CSV_PATH
+import pandas as pd
+import argparse
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add, update or retire catalog tracks without rebuilding the catalog. "
+                    "Running servers pick the change up on their next catalog poll.")
+    parser.add_argument('--upsert', metavar='CSV',
+                        help="Tracks to add or update, with the catalog CSV's columns")
+    parser.add_argument('--retire', nargs='*', default=[], metavar='URI',
+                        help="Track URIs to take out of the catalog")
+    parser.add_argument('--retire-file', metavar='FILE',
+                        help="File with one track URI to retire per line")
+    args = parser.parse_args()
+
+    retire_uris = list(args.retire)
+    if args.retire_file:
+        with open(args.retire_file) as f:
+            retire_uris += [line.strip() for line in f if line.strip()]
+    tracks = pd.read_csv(args.upsert) if args.upsert else pd.DataFrame(
+        columns=['Track URI', 'Track Name', 'Artist Name(s)', 'Artist Genres'])
+    if not len(tracks) and not retire_uris:
+        parser.error("nothing to do: give --upsert and/or --retire")
+
+    # Brute-force search loads fastest; the index isn't used to write a delta
+    data = ContentData(CSV_PATH, index='brute', neighbor_dir=None)
+    for col in data.numeric_cols:
+        if col not in tracks.columns:
+            tracks[col] = float('nan')
+    started = time.perf_counter()
+    updates = CatalogUpdates(data, lambda data, delta: None)
+    delta = updates.publish(tracks, retire_uris)
+    added = delta.meta['added']
+    print(f"Wrote catalog delta {delta.seq}: {added} added, "
+          f"{len(delta.arrays['rows']) - added} updated, {len(delta.arrays['retired'])} retired, "
+          f"{len(delta.meta['genres'])} new genres, in {time.perf_counter() - started:.3f}s "
+          f"(catalog version {updates.data.version})")
+
+
+if __name__ == "__main__":
+    main()
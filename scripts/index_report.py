@@ -0,0 +1,69 @@
+from app.data.vector_index import build_index
+from app.data.preprocess import ContentData
+from app.core.config import CSV_PATH
+import argparse
+import json
+import time
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _timed_query(index, queries, k):
+    start = time.perf_counter()
+    _, idxs = index.query(queries, k)
+    return idxs, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report recall vs latency of the approximate (IVF) index against brute force.")
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--k', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nlist', type=int, nargs='*', default=[None])
+    parser.add_argument('--nprobe', type=int, nargs='*',
+                        default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--json', action='store_true',
+                        help="Print machine-readable JSON instead of a table")
+    args = parser.parse_args()
+
+    data = ContentData(args.csv)
+    rng = np.random.default_rng(0)
+    # Query with taste vectors built the way the recommender builds them
+    genres = data.genre_encoder.classes_
+    queries = data.user_vectors(
+        [list(rng.choice(genres, rng.integers(1, 4))) for _ in range(args.queries)],
+        [rng.integers(0, data.n_rows, rng.integers(0, 3)) for _ in range(args.queries)])
+
+    brute = build_index('brute', data.genre_matrix, data.numeric_matrix, data.row_norms)
+    exact, brute_latency = _timed_query(brute, queries, args.k)
+    report = [{'index': 'brute', 'recall': 1.0, 'latency_ms': brute_latency * 1e3}]
+
+    for nlist in args.nlist:
+        start = time.perf_counter()
+        ivf = build_index('ivf', data.genre_matrix, data.numeric_matrix, data.row_norms,
+                          nlist=nlist)
+        build_s = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            approx, latency = _timed_query(ivf, queries, args.k)
+            recall = np.mean([len(np.intersect1d(a, e)) / args.k
+                              for a, e in zip(approx, exact)])
+            report.append({'index': 'ivf', 'nlist': ivf.nlist, 'nprobe': nprobe,
+                           'build_s': build_s, 'recall': float(recall),
+                           'latency_ms': latency * 1e3})
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{data.n_rows} tracks, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':<6} {'nlist':>6} {'nprobe':>6} {'recall':>7} {'ms/query':>9}")
+    for row in report:
+        print(f"{row['index']:<6} {row.get('nlist', '-'):>6} {row.get('nprobe', '-'):>6} "
+              f"{row['recall']:>7.3f} {row['latency_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Run the API in several worker processes that share one preloaded catalog.
+
+The catalog, KNN index and model are loaded once in the parent process and
+the workers are forked afterwards, so they share those pages copy-on-write
+instead of each parsing the CSV and fitting its own indexes. The parent
+serves nothing and starts no background pollers; each worker starts its
+own from the app's startup hook.
+
+    PYTHONPATH=. python scripts/serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import uvicorn  # noqa: E402
+
+from app.services import registry  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    registry.preload()
+    from app.main import app
+
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers don't write to (and un-share) the preloaded objects.
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            config = uvicorn.Config(app, host=args.host, port=args.port)
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Serving on {args.host}:{args.port} with {len(children)} workers")
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# A few real genre names, so the default request examples resolve, plus a long
+# tail of synthetic ones
+BASE_GENRES = ["pop", "dance pop", "indie rock", "rock", "hip hop", "jazz"]
+
+
+def _genre_names(n_genres: int) -> list:
+    return BASE_GENRES + [f"genre {i}" for i in range(max(0, n_genres - len(BASE_GENRES)))]
+
+
+def make_catalog(n_tracks: int, path: str, n_genres: int = 600, seed: int = 0) -> pd.DataFrame:
+    """
+    Write a synthetic catalog CSV with the same columns as the real one and
+    return it. Genre and artist popularity are skewed (Zipf-like) and about a
+    third of the song names repeat, so dedup and diversity rules get exercised.
+    """
+    rng = np.random.default_rng(seed)
+    genres = np.array(_genre_names(n_genres), dtype=object)
+    genre_weights = 1 / np.arange(1, len(genres) + 1)
+    genre_weights /= genre_weights.sum()
+
+    # 0-3 artist genres per track, drawn from the skewed genre distribution
+    n_track_genres = rng.integers(0, 4, n_tracks)
+    drawn = genres[rng.choice(len(genres), (n_tracks, 3), p=genre_weights)]
+    artist_genres = [",".join(dict.fromkeys(row[:n])) for row, n in zip(drawn, n_track_genres)]
+
+    n_artists = max(1, n_tracks // 5)
+    artist_ids = np.minimum(rng.zipf(1.3, n_tracks), n_artists) - 1
+    artist_ids = rng.permutation(n_artists)[artist_ids]
+    artists = np.char.add("Artist ", artist_ids.astype(str)).astype(object)
+    featured = rng.random(n_tracks) < 0.2
+    artists[featured] = artists[featured] + ", Artist " + \
+        rng.integers(0, n_artists, featured.sum()).astype(str)
+
+    song_ids = np.where(rng.random(n_tracks) < 0.3,
+                        rng.integers(0, max(1, n_tracks // 10), n_tracks),
+                        np.arange(n_tracks))
+
+    df = pd.DataFrame({
+        "Track URI": np.char.add("spotify:track:", np.char.zfill(np.arange(n_tracks).astype(str), 22)),
+        "Track Name": np.char.add("Song ", song_ids.astype(str)),
+        "Artist Name(s)": artists,
+        "Album Name": "Synthetic",
+        "Artist Genres": pd.Series(artist_genres).replace("", np.nan),
+        "Popularity": rng.integers(0, 100, n_tracks),
+        "Danceability": rng.random(n_tracks),
+        "Energy": rng.random(n_tracks),
+        "Key": rng.integers(0, 12, n_tracks),
+        "Loudness": -rng.random(n_tracks) * 30,
+        "Mode": rng.integers(0, 2, n_tracks),
+        "Speechiness": rng.random(n_tracks),
+        "Acousticness": rng.random(n_tracks),
+        "Instrumentalness": np.where(rng.random(n_tracks) < 0.05, np.nan, rng.random(n_tracks)),
+        "Liveness": rng.random(n_tracks),
+        "Valence": rng.random(n_tracks),
+        "Tempo": 60 + rng.random(n_tracks) * 140,
+    })
+    _makedirs_for(path)
+    df.to_csv(path, index=False)
+    return df
+
+
+def make_feedback(track_uris, n_rows: int, path: str, like_rate: float = 0.6, seed: int = 0,
+                  n_users: int = None):
+    """
+    Write a synthetic feedback log (track_uri,label,user_id) over the given
+    tracks, from `n_users` users (default: one per 20 rows) with Zipf-skewed
+    activity.
+    """
+    rng = np.random.default_rng(seed)
+    track_uris = np.asarray(track_uris)
+    n_users = n_users or max(1, n_rows // 20)
+    users = (rng.zipf(1.3, n_rows) - 1) % n_users
+    df = pd.DataFrame({
+        "track_uri": track_uris[rng.integers(0, len(track_uris), n_rows)],
+        "label": (rng.random(n_rows) < like_rate).astype(int),
+        "user_id": [f"user-{u}" for u in users],
+    })
+    _makedirs_for(path)
+    df.to_csv(path, index=False)
+    return df
+
+
+def make_request_log(track_uris, genres, n_requests: int, path: str, k: int = 10, seed: int = 0,
+                     user_ids=None):
+    """
+    Write a JSON-lines log of API requests to replay: genre samples, initial
+    recommendations and feedback rounds, in roughly the mix a client sends.
+    Each line is {"method", "path", and "params" or "json"}. With `user_ids`,
+    recommendation requests come from those users.
+    """
+    rng = np.random.default_rng(seed)
+    track_uris = np.asarray(track_uris)
+    genres = np.asarray(genres, dtype=object)
+
+    def pick_genres():
+        return genres[rng.choice(len(genres), rng.integers(1, 4), replace=False)].tolist()
+
+    def pick_tracks(n):
+        return track_uris[rng.integers(0, len(track_uris), n)].tolist()
+
+    _makedirs_for(path)
+    with open(path, "w") as f:
+        for _ in range(n_requests):
+            kind = rng.random()
+            if kind < 0.2:
+                entry = {"method": "GET", "path": "/api/genres/samples",
+                         "params": {"genres": pick_genres(), "limit": k}}
+            elif kind < 0.5:
+                entry = {"method": "POST", "path": "/api/recommend",
+                         "json": {"seed_genres": pick_genres(), "k": k,
+                                  "liked_uris": pick_tracks(rng.integers(0, 3)),
+                                  "disliked_uris": pick_tracks(rng.integers(0, 2))}}
+            else:
+                entry = {"method": "POST", "path": "/api/recommend/feedback",
+                         "json": {"seed_genres": pick_genres(), "k": k,
+                                  "liked_uris": pick_tracks(rng.integers(1, 4)),
+                                  "disliked_uris": pick_tracks(rng.integers(0, 3))}}
+            if user_ids is not None and "json" in entry:
+                entry["json"]["user_id"] = str(user_ids[rng.integers(0, len(user_ids))])
+            f.write(json.dumps(entry) + "\n")
+
+
+def _makedirs_for(path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic catalog, feedback log and request log.")
+    parser.add_argument('--tracks', type=int, default=10_000)
+    parser.add_argument('--feedback', type=int, default=5_000,
+                        help="Number of feedback rows")
+    parser.add_argument('--requests', type=int, default=2_000,
+                        help="Number of logged API requests")
+    parser.add_argument('--out', default='synthetic',
+                        help="Output directory")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.tracks, os.path.join(args.out, 'catalog.csv'), seed=args.seed)
+    uris = catalog['Track URI'].to_numpy()
+    feedback = make_feedback(uris, args.feedback, os.path.join(args.out, 'feedback.csv'),
+                             seed=args.seed)
+    make_request_log(uris, _genre_names(20), args.requests,
+                     os.path.join(args.out, 'requests.jsonl'), seed=args.seed,
+                     user_ids=feedback['user_id'].unique())
+    print(f"Wrote {args.tracks} tracks, {args.feedback} feedback rows and "
+          f"{args.requests} requests to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
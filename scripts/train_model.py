@@ -1,46 +1,123 @@
-from app.data.preprocess import ContentData
-from app.core.config import FEEDBACK_CSV_PATH, LR_MODEL_PATH, CSV_PATH
+from app.services.registry import get_content_data
+from app.core.config import (
+    FEEDBACK_CSV_PATH,
+    LR_CHECKPOINT_PATH,
+    LR_MODEL_PATH,
+    USER_MIN_FEEDBACK,
+    USER_MODEL_DIR,
+    USER_MODEL_L2,
+    USER_TRAIN_BLOCK,
+)
+from app.services.feedback_store import FeedbackStore
+from app.services.online_learner import OnlineLearner, labeled_rows, save_atomic
+from app.services.user_models import train_user_models, trained_offset
 from sklearn.linear_model import LogisticRegression
-import joblib
-import pandas as pd
+import argparse
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 
-def main():
-    if not os.path.exists(FEEDBACK_CSV_PATH) or os.path.getsize(FEEDBACK_CSV_PATH) == 0:
-        print(
-            f"No feedback data found at {FEEDBACK_CSV_PATH}. Skipping model training.")
-        return
-
+def train_full(store: FeedbackStore):
+    """Refit logistic regression from scratch on all stored feedback."""
     # Load user feedback labels: track_uri and binary label (1=like, 0=dislike)
-    feedback_df = pd.read_csv(FEEDBACK_CSV_PATH)
+    feedback_df = store.read_all()
 
     if feedback_df.empty:
         print("Feedback data is empty. Skipping model training.")
         return
 
     # Build feature matrix for labeled tracks
-    data = ContentData(CSV_PATH)
-    uris = feedback_df['track_uri'].tolist()
-    idxs = [data.track_uris.index(u) for u in uris if u in data.track_uris]
+    data = get_content_data()
+    X, y = labeled_rows(data, feedback_df['track_uri'].tolist(), feedback_df['label'])
 
-    if not idxs:
+    if not len(y):
         print("No valid track URIs found in feedback data. Skipping model training.")
         return
-
-    X = data.features[idxs]
-    y = feedback_df['label'].iloc[:len(idxs)]
+    if len(set(y)) < 2:
+        print("Feedback only has one label so far. Skipping model training.")
+        return
 
     # Train logistic regression model
     lr = LogisticRegression(max_iter=1000)
     lr.fit(X, y)
 
     # Serialize trained model
-    joblib.dump(lr, LR_MODEL_PATH)
+    # Write to a temp file and rename, so a running API never loads a
+    # half-written model
+    save_atomic(lr, LR_MODEL_PATH)
     print(f"Saved logistic regression model to {LR_MODEL_PATH}")
 
 
+def train_incremental(store: FeedbackStore):
+    """Update the online model with feedback added since its last checkpoint."""
+    learner = OnlineLearner(get_content_data(), LR_CHECKPOINT_PATH)
+    n_new = learner.update(store)
+    learner.save()
+    if not n_new:
+        print("No new feedback since the last checkpoint.")
+        return
+
+    save_atomic(learner.model, LR_MODEL_PATH)
+    print(
+        f"Updated online model with {n_new} rows ({learner.n_seen} total); saved to {LR_MODEL_PATH}")
+
+
+def train_users(store: FeedbackStore, all_users: bool = False):
+    """
+    Refit the per-user models, shrunk toward the current global model: only
+    the users with feedback since the last run, unless `all_users`.
+    """
+    import joblib
+    data = get_content_data()
+    # Taken first, so rows appended from here on are read again next time
+    end = store.end_offset()
+    users = None
+    offset = None if all_users else trained_offset(USER_MODEL_DIR, data)
+    if offset is not None:
+        rows, _, reset = store.read_since(offset)
+        if not reset:
+            users = {user_id for _, _, user_id in rows if user_id is not None}
+            if not users:
+                print("No new per-user feedback since the last run.")
+                return
+    try:
+        prior = joblib.load(LR_MODEL_PATH)
+    except (OSError, EOFError):
+        prior = None
+    n_users = train_user_models(
+        data, store.read_all(), USER_MODEL_DIR, prior_model=prior,
+        min_feedback=USER_MIN_FEEDBACK, l2=USER_MODEL_L2, block_size=USER_TRAIN_BLOCK,
+        users=users, feedback_offset=end)
+    refit = f"{len(users)} refitted" if users is not None else "all refitted"
+    print(f"Saved {n_users} per-user models ({refit}) to {USER_MODEL_DIR}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train the feedback model used by the hybrid recommender.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only learn from feedback added since the last checkpoint")
+    parser.add_argument('--skip-users', action='store_true',
+                        help="Only train the global model, not the per-user models")
+    parser.add_argument('--all-users', action='store_true',
+                        help="Refit every per-user model, not just those of users with "
+                             "feedback since the last run (e.g. after the global model changed)")
+    args = parser.parse_args()
+
+    if not os.path.exists(FEEDBACK_CSV_PATH) or os.path.getsize(FEEDBACK_CSV_PATH) == 0:
+        print(
+            f"No feedback data found at {FEEDBACK_CSV_PATH}. Skipping model training.")
+        return
+
+    store = FeedbackStore(FEEDBACK_CSV_PATH)
+    if args.incremental:
+        train_incremental(store)
+    else:
+        train_full(store)
+    if not args.skip_users:
+        train_users(store, args.all_users)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import synthetic  # noqa: E402
+from app.data.preprocess import ContentData  # noqa: E402
+from app.services.feedback_aggregate import FeedbackAggregate  # noqa: E402
+from app.services.feedback_store import FeedbackStore  # noqa: E402
+from app.services.online_learner import labeled_rows  # noqa: E402
+from app.services.recommender import HybridRecommender  # noqa: E402
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    """A small synthetic catalog CSV."""
+    path = str(tmp_path / 'catalog.csv')
+    synthetic.make_catalog(400, path, n_genres=40)
+    return path
+
+
+@pytest.fixture
+def content_data(catalog_csv, tmp_path):
+    """The catalog loaded through a feature artifact, with exact search."""
+    return ContentData(catalog_csv, artifact_dir=str(tmp_path / 'features'),
+                       index='brute', neighbor_dir=None)
+
+
+@pytest.fixture
+def recommender(content_data, tmp_path, monkeypatch):
+    """
+    A recommender over `content_data` with stored feedback and a global LR
+    model fitted on it. Model paths resolve under an empty working directory.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    monkeypatch.chdir(tmp_path)
+    rows = np.random.default_rng(0).choice(content_data.n_rows, 40, replace=False)
+    labels = (content_data.popularity[rows] >= 50).astype(int)
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    store.append([(str(content_data.track_uris[row]), int(label), None)
+                  for row, label in zip(rows, labels)])
+    recommender = HybridRecommender(content_data, FeedbackAggregate(content_data, store))
+    X, y = labeled_rows(content_data, store.read_all()['track_uri'].tolist(), labels)
+    recommender.set_model(LogisticRegression(max_iter=1000).fit(X, y))
+    return recommender
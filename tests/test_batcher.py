@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.services.batcher import RequestCoalescer
+
+
+class Scorer:
+    """A run_batch that records its batches and finishes when released."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = None
+
+    async def __call__(self, requests):
+        self.batches.append(list(requests))
+        if self.release is not None:
+            await self.release.wait()
+        return [request * 10 for request in requests]
+
+
+def test_idle_coalescer_dispatches_at_once():
+    scorer = Scorer()
+
+    async def scenario():
+        coalescer = RequestCoalescer(scorer, max_batch_size=8, max_wait=60)
+        results = []
+        for i in range(3):
+            results.append(await coalescer.submit(i))
+            await asyncio.sleep(0.01)  # idle between requests
+        return results
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 5)) == [0, 10, 20]
+    assert scorer.batches == [[0], [1], [2]]
+
+
+def test_requests_arriving_while_scoring_share_a_batch():
+    scorer = Scorer()
+
+    async def scenario():
+        scorer.release = asyncio.Event()
+        coalescer = RequestCoalescer(scorer, max_batch_size=3, max_wait=0.01)
+        first = asyncio.ensure_future(coalescer.submit(0))
+        await asyncio.sleep(0)
+        # Five more while the first is scored: a full batch of three goes at
+        # once, the other two after max_wait
+        rest = [asyncio.ensure_future(coalescer.submit(i)) for i in range(1, 6)]
+        await asyncio.sleep(0.05)
+        scorer.release.set()
+        return await first, await asyncio.gather(*rest)
+
+    first, rest = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert (first, rest) == (0, [10, 20, 30, 40, 50])
+    assert scorer.batches == [[0], [1, 2, 3], [4, 5]]
+
+
+def test_a_failed_batch_fails_each_of_its_requests():
+    async def failing(requests):
+        raise RuntimeError('scoring failed')
+
+    async def scenario():
+        coalescer = RequestCoalescer(failing, max_batch_size=4, max_wait=0)
+        results = await asyncio.gather(
+            coalescer.submit(1), coalescer.submit(2), return_exceptions=True)
+        return results
+
+    results = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+def test_a_cancelled_caller_does_not_affect_the_rest():
+    scorer = Scorer()
+
+    async def scenario():
+        scorer.release = asyncio.Event()
+        coalescer = RequestCoalescer(scorer, max_batch_size=8, max_wait=0.01)
+        first = asyncio.ensure_future(coalescer.submit(0))
+        await asyncio.sleep(0)
+        gone = asyncio.ensure_future(coalescer.submit(1))
+        kept = asyncio.ensure_future(coalescer.submit(2))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0.05)
+        scorer.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        return await first, await kept
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 5)) == (0, 20)
+    assert scorer.batches == [[0], [1, 2]]
+
+
+def test_batched_recommendations_match_single_requests(recommender):
+    uris = [str(uri) for uri in recommender.data.track_uris]
+    requests = [dict(k=5, seed_genres=['pop'], liked_uris=uris[i:i + 2]) for i in range(0, 12, 2)]
+
+    async def run_batch(batch):
+        return recommender.recommend_many(batch)
+
+    async def scenario():
+        coalescer = RequestCoalescer(run_batch, max_batch_size=4, max_wait=0.01)
+        return await asyncio.gather(*[coalescer.submit(req) for req in requests])
+
+    assert asyncio.run(scenario()) == [recommender.recommend(**req) for req in requests]
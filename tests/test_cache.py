@@ -0,0 +1,63 @@
+from app.services import cache as cache_module
+from app.services.cache import MISSING, LRUCache
+
+
+def test_least_recently_used_entries_go_first():
+    cache = LRUCache(max_size=6)
+    cache.put('a', [1, 2])
+    cache.put('b', [1, 2])
+    cache.put('c', [1, 2])
+    assert cache.get('a') == [1, 2]  # now b is the oldest
+    cache.put('d', [1, 2])
+    assert cache.get('b') is MISSING
+    assert [cache.get(key) is not MISSING for key in 'acd'] == [True, True, True]
+    stats = cache.stats()
+    assert (stats['size'], stats['entries'], stats['evictions']) == (6, 3, 1)
+    assert (stats['hits'], stats['misses']) == (4, 1)
+
+
+def test_size_bounds_the_total_not_the_entry_count():
+    cache = LRUCache(max_size=10)
+    cache.put('big', list(range(8)))
+    cache.put('small', [1, 2, 3])
+    assert cache.get('big') is MISSING and cache.size == 3
+    # Too big to keep at all, including a re-put key that outgrew the cache
+    cache.put('small', list(range(11)))
+    assert cache.get('small') is MISSING and cache.size == 0
+    assert cache.get('missing', None) is None
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.put('a', [1])
+    now[0] += 4
+    assert cache.get('a') == [1]
+    now[0] += 2
+    assert cache.get('a') is MISSING and cache.size == 0
+
+
+def test_clear_resets_the_size():
+    cache = LRUCache(max_size=10, sizeof=lambda value: value)
+    cache.put('a', 4)
+    cache.put('b', 5)
+    cache.clear()
+    assert cache.size == 0 and cache.get('a') is MISSING
+    cache.put('c', 10)
+    assert cache.get('c') == 10
+
+
+def test_cold_start_and_genre_samples_are_cached_until_the_model_changes(recommender):
+    model = recommender.lr_model
+    recommender.set_model(None)
+    first = recommender.recommend(k=5, seed_genres=['pop', 'rock'])
+    assert recommender.recommend(k=5, seed_genres=['rock', 'pop']) == first
+    samples = recommender.genre_samples(['pop'], 3)
+    assert recommender.genre_samples(['pop'], 3) == samples
+    assert recommender.cold_start_cache.stats()['hits'] == 1
+    assert recommender.samples_cache.stats()['hits'] == 1
+
+    recommender.set_model(model)
+    assert recommender.cold_start_cache.stats()['entries'] == 0
+    assert recommender.samples_cache.stats()['entries'] == 0
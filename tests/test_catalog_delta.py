@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data import catalog_delta
+from app.data.preprocess import ContentData
+from app.data.vector_index import BruteForceIndex
+from app.services.catalog import CatalogUpdates
+
+
+@pytest.fixture
+def updated(catalog_csv, content_data):
+    """
+    The catalog after one delta: a new track with a new genre, an update of
+    row 3 and the retirement of row 5.
+    """
+    df = pd.read_csv(catalog_csv)
+    new = df.iloc[[10]].copy()
+    new['Track URI'] = 'spotify:track:new'
+    new['Track Name'] = 'New Song'
+    new['Artist Genres'] = 'brand new genre,pop'
+    changed = df.iloc[[3]].copy()
+    changed['Popularity'] = 100
+    installed = []
+    updates = CatalogUpdates(content_data, lambda data, delta: installed.append(delta))
+    updates.publish(pd.concat([new, changed]), [df['Track URI'][5]])
+    assert len(installed) == 1
+    return df, updates.data
+
+
+def test_upserts_append_rows_and_retire_the_old_ones(updated, content_data):
+    df, data = updated
+    n = content_data.n_rows
+    assert data.n_rows == n + 2
+    assert data.lookup(['spotify:track:new', df['Track URI'][3], df['Track URI'][5]]).tolist() \
+        == [n, n + 1, -1]
+    assert data.retired_rows.tolist() == [3, 5]
+    assert 'brand new genre' in data.list_genres()
+    assert data.popularity[n + 1] == 100
+    assert data.tracks([n])[0]['uri'] == 'spotify:track:new'
+
+
+def test_older_snapshot_is_left_as_it_was(updated, content_data):
+    df, _ = updated
+    assert content_data.n_rows == len(df)
+    assert content_data.lookup([df['Track URI'][3], 'spotify:track:new']).tolist() == [3, -1]
+    assert len(content_data.retired_rows) == 0
+    assert content_data.n_genres < updated[1].n_genres
+
+
+def test_restart_replays_deltas_to_the_same_catalog(updated, catalog_csv, tmp_path):
+    _, live = updated
+    replayed = ContentData(catalog_csv, artifact_dir=str(tmp_path / 'features'),
+                           index='brute', neighbor_dir=None)
+    assert replayed.version == live.version
+    assert (replayed.features != live.features).nnz == 0
+    np.testing.assert_array_equal(replayed.retired_rows, live.retired_rows)
+    np.testing.assert_array_equal(
+        np.concatenate(list(replayed.popularity_order.blocks(64))),
+        np.concatenate(list(live.popularity_order.blocks(64))))
+    uris = [str(uri) for uri in live.track_uris]
+    np.testing.assert_array_equal(replayed.lookup(uris), live.lookup(uris))
+
+
+def test_rows_and_search_match_the_full_matrices(updated):
+    _, data = updated
+    features = data.features
+    rows = np.array([data.n_rows - 1, 0, data.n_rows - 2, 7])
+    np.testing.assert_allclose(data.rows(rows), features[rows].toarray())
+    vec = np.random.default_rng(0).random(data.n_features).astype(np.float32)
+    np.testing.assert_allclose(data.dot(vec), features @ vec, rtol=1e-5)
+
+    exact = BruteForceIndex(data.genre_matrix, data.numeric_matrix, data.row_norms)
+    queries = features[rows].toarray()
+    expected, _ = exact.query(queries, 10)
+    dists, idxs = data.kneighbors(queries, 10)
+    np.testing.assert_allclose(dists, expected, atol=1e-5)
+    assert idxs[0, 0] == data.n_rows - 1
+
+
+def test_recommendations_skip_retired_tracks(updated):
+    df, data = updated
+    recs = data.recommend(['pop'], [], data.n_rows)
+    uris = {rec['uri'] for rec in recs}
+    assert df['Track URI'][5] not in uris
+    assert 'spotify:track:new' in uris
+
+
+def test_deltas_apply_only_in_sequence(updated, content_data):
+    _, data = updated
+    arrays, meta = content_data.derive_delta(pd.DataFrame(
+        columns=['Track URI', 'Track Name', 'Artist Name(s)', 'Artist Genres']
+        + content_data.numeric_cols), ['spotify:track:new'])
+    with pytest.raises(ValueError):
+        data.apply_delta(catalog_delta.CatalogDelta(1, meta, arrays))
+
+
+def test_genre_samples_include_new_rows_and_skip_retired_ones(updated):
+    df, data = updated
+    samples = [s['uri'] for s in data.sample_popular_by_genres(['brand new genre'], 5)]
+    assert samples == ['spotify:track:new']
+    pop = [s['uri'] for s in data.sample_popular_by_genres(['pop'], data.n_rows)]
+    assert 'spotify:track:new' in pop and df['Track URI'][5] not in pop
+
+
+def test_services_follow_the_new_snapshot(recommender, catalog_csv):
+    old = recommender.data
+    df = pd.read_csv(catalog_csv)
+    # A rated track is updated, so it moves to a new row
+    rated = int(np.flatnonzero(recommender.feedback.rated_mask)[0])
+    changed = df.iloc[[rated]].copy()
+    changed['Popularity'] = 0
+
+    def install(data, delta):
+        moved = delta.arrays['replaces'] >= 0
+        recommender.feedback.set_data(
+            data, delta.arrays['replaces'][moved], delta.arrays['rows'][moved])
+        recommender.set_catalog(data)
+
+    updates = CatalogUpdates(old, install)
+    updates.publish(changed)
+    data = updates.data
+    new_row = data.n_rows - 1
+    assert recommender.data is data
+    assert recommender.feedback.rated_mask[new_row]
+    # Only the added row was scored, and ranked where a full sort puts it
+    probs = recommender.model_state.probs
+    np.testing.assert_allclose(probs, data.predict_proba(recommender.lr_model), rtol=1e-6)
+    np.testing.assert_array_equal(
+        np.concatenate(list(recommender.model_state.order.blocks(64))),
+        np.argsort(-probs, kind='stable'))
+    uris = {rec['uri'] for rec in recommender.recommend(k=data.n_rows, seed_genres=['pop'])}
+    assert df['Track URI'][rated] not in uris
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.executor import ExecutorBusy, ScoringExecutor
+
+
+def test_full_queue_rejects_instead_of_waiting():
+    executor = ScoringExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: 'queued'))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(lambda: 'rejected')
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, 'queued')
+    # Slots are freed once jobs finish
+    assert asyncio.run(executor.run(lambda: 'again')) == 'again'
+
+
+def test_busy_executor_answers_503():
+    from fastapi import HTTPException
+
+    from app.api.routes import _or_busy
+
+    async def busy():
+        raise ExecutorBusy()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_or_busy(busy()))
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": "1"}
@@ -0,0 +1,66 @@
+import threading
+
+from app.services.feedback_aggregate import FeedbackAggregate
+from app.services.feedback_store import FeedbackStore
+
+
+def _uris(content_data, n):
+    return [str(uri) for uri in content_data.track_uris[:n]]
+
+
+def test_aggregate_tails_only_new_rows(content_data, tmp_path):
+    uris = _uris(content_data, 4)
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    store.append([(uris[0], 1, None), (uris[1], 1, None)])
+    aggregate = FeedbackAggregate(content_data, store)
+    assert (aggregate.likes, aggregate.dislikes) == (2, 0)
+
+    # Written by another process
+    FeedbackStore(store.path).append([(uris[2], 0, 'u1'), ('spotify:track:missing', 1, None)])
+    aggregate.refresh()
+    assert (aggregate.likes, aggregate.dislikes) == (3, 1)
+    assert aggregate.rated_mask.nonzero()[0].tolist() == [0, 1, 2]
+
+
+def test_recorded_feedback_counts_once_before_and_after_the_write(content_data, tmp_path):
+    uris = _uris(content_data, 3)
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    aggregate = FeedbackAggregate(content_data, store)
+    aggregate.record(uris[:2], uris[2:])
+    assert aggregate.total == 3 and aggregate.rated_mask[:3].all()
+
+    # A poll that lands right after the rows hit the file must not count
+    # them a second time while they are still unflushed
+    totals = []
+    append = store.append
+
+    def append_then_poll(entries):
+        append(entries)
+        poll = threading.Thread(target=aggregate.refresh)
+        poll.start()
+        poll.join(0.1)
+        totals.append(aggregate.total)
+
+    store.append = append_then_poll
+    aggregate.append([(uris[0], 1, 'u1'), (uris[1], 1, 'u1'), (uris[2], 0, 'u1')])
+    aggregate.refresh()
+    assert totals == [3]
+    assert (aggregate.likes, aggregate.dislikes, aggregate.total) == (2, 1, 3)
+
+
+def test_failed_read_back_still_hands_the_rows_over(content_data, tmp_path, monkeypatch):
+    uris = _uris(content_data, 1)
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    aggregate = FeedbackAggregate(content_data, store)
+    aggregate.record(uris, [])
+    read_since = store.read_since
+
+    def fail(offset):
+        raise OSError('busy')
+
+    monkeypatch.setattr(store, 'read_since', fail)
+    aggregate.append([(uris[0], 1, None)])
+    assert aggregate.total == 0
+    monkeypatch.setattr(store, 'read_since', read_since)
+    aggregate.refresh()
+    assert (aggregate.likes, aggregate.total) == (1, 1)
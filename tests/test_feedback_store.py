@@ -0,0 +1,93 @@
+import threading
+
+from app.services.feedback_store import FeedbackStore
+
+
+def test_concurrent_appends_keep_every_row_whole(tmp_path):
+    path = str(tmp_path / 'feedback.csv')
+    FeedbackStore(path)
+
+    def writer(n):
+        # Each thread opens its own store, as separate workers do
+        store = FeedbackStore(path)
+        for i in range(50):
+            store.append([(f'{n}-{i}-{j}', j % 2, f'u{n}') for j in range(3)])
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows, _, _ = FeedbackStore(path).read_since(0)
+    assert len(rows) == 8 * 50 * 3
+    assert len(set(rows)) == len(rows)
+    assert all(uri.split('-')[0] == user[1:] for uri, _, user in rows)
+
+
+def test_read_since_only_returns_complete_new_rows(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    store.append([('a', 1, 'u1'), ('b', 0, '')])
+    rows, offset, reset = store.read_since(0)
+    assert rows == [('a', 1, 'u1'), ('b', 0, None)] and not reset
+    assert offset == store.end_offset()
+
+    # A row still being written is left for the next read
+    with open(store.path, 'a') as f:
+        f.write('c,1,u')
+    assert store.read_since(offset) == ([], offset, False)
+    with open(store.path, 'a') as f:
+        f.write('2\n')
+    rows, offset, _ = store.read_since(offset)
+    assert rows == [('c', 1, 'u2')]
+
+
+def test_replaced_log_is_read_again_from_the_start(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    store.append([('a', 1, None), ('b', 1, None)])
+    _, offset, _ = store.read_since(0)
+
+    (tmp_path / 'feedback.csv').write_text('track_uri,label,user_id\nc,0,\n')
+    rows, _, reset = store.read_since(offset)
+    assert rows == [('c', 0, None)] and reset
+
+
+def test_read_all_returns_every_row(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    assert store.read_all().empty
+    store.append([('a', 1, 'u1'), ('b', 0, '')])
+    df = store.read_all()
+    assert df['track_uri'].tolist() == ['a', 'b']
+    assert df['label'].tolist() == [1, 0]
+    assert df['user_id'].isna().tolist() == [False, True]
+
+
+def _legacy_log(tmp_path, uris):
+    # Written before feedback carried a user_id
+    path = tmp_path / 'feedback.csv'
+    path.write_text('track_uri,label\n' + ''.join(f'{uri},1\n' for uri in uris))
+    return path
+
+
+def test_legacy_log_keeps_its_bytes_and_offsets(tmp_path):
+    path = _legacy_log(tmp_path, ['a', 'b'])
+    before = path.read_bytes()
+    rows, offset, reset = FeedbackStore(str(path)).read_since(0)
+    assert rows == [('a', 1, None), ('b', 1, None)] and not reset
+
+    # Reopening (as a restarted process does) must not move existing rows
+    store = FeedbackStore(str(path))
+    assert path.read_bytes() == before
+    store.append([('c', 0, 'u1'), ('d', 1, '')])
+    rows, end, reset = store.read_since(offset)
+    assert rows == [('c', 0, 'u1'), ('d', 1, None)] and not reset
+    assert end == store.end_offset()
+
+
+def test_read_all_reads_legacy_and_new_rows(tmp_path):
+    store = FeedbackStore(str(_legacy_log(tmp_path, ['a'])))
+    store.append([('b', 0, 'u1')])
+    df = store.read_all()
+    assert df['track_uri'].tolist() == ['a', 'b']
+    assert df['label'].tolist() == [1, 0]
+    assert df['user_id'].isna().tolist() == [True, False]
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+
+def _reference(data, genres, limit):
+    # The filter-and-sort the inverted index replaced
+    cols = [data.genre_to_col[g] for g in genres if g in data.genre_to_col]
+    rows = np.flatnonzero(data.genre_matrix[:, cols].getnnz(axis=1))
+    return rows[np.argsort(-data.popularity[rows], kind='stable')][:limit]
+
+
+def test_postings_list_each_genres_rows_most_popular_first(content_data):
+    data = content_data
+    genre = data.genre_matrix.tocsc()
+    for col in range(data.n_genres):
+        postings = data.genre_postings[data.genre_offsets[col]:data.genre_offsets[col + 1]]
+        assert sorted(postings.tolist()) == genre[:, col].nonzero()[0].tolist()
+        assert np.all(np.diff(data.popularity[postings]) <= 0)
+
+
+@pytest.mark.parametrize('genres, limit', [
+    (['pop'], 10),
+    (['pop', 'rock', 'jazz'], 25),
+    (['genre 3', 'genre 30', 'dance pop'], 1000),  # fewer matches than the limit
+    (['pop', 'no such genre'], 5),
+    (['no such genre'], 5),
+    ([], 5),
+])
+def test_samples_match_filtering_and_sorting_the_catalog(content_data, genres, limit):
+    expected = _reference(content_data, genres, limit)
+    samples = content_data.sample_popular_by_genres(genres, limit)
+    assert [s['uri'] for s in samples] == [str(u) for u in content_data.track_uris[expected]]
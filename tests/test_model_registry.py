@@ -0,0 +1,70 @@
+import pytest
+
+from app.services import model_registry
+from app.services.model_registry import ModelRegistry
+
+
+class FakeTrainer:
+    """Stands in for the scripts/train_model.py subprocess."""
+
+    started = []
+
+    def __init__(self, args, env=None):
+        self.args = args
+        self.pid = 1000 + len(self.started)
+        self.returncode = None
+        self.started.append(self)
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def workers(recommender, tmp_path, monkeypatch):
+    """Two workers' registries sharing one model path, as forked workers do."""
+    FakeTrainer.started = []
+    monkeypatch.setattr(model_registry.subprocess, 'Popen', FakeTrainer)
+    path = str(tmp_path / 'model.joblib')
+    return [ModelRegistry(recommender, path, retrain_every=5) for _ in range(2)]
+
+
+def _add_feedback(recommender, n):
+    data = recommender.data
+    recommender.feedback.append(
+        [(str(data.track_uris[i]), i % 2, None) for i in range(n)])
+
+
+def test_one_run_per_batch_of_new_feedback_across_workers(recommender, workers):
+    first, second = workers
+    _add_feedback(recommender, 4)
+    assert not first.maybe_retrain() and not second.maybe_retrain()
+
+    _add_feedback(recommender, 1)
+    assert first.maybe_retrain()
+    assert not second.maybe_retrain()  # the first one holds the lock
+    assert '--skip-users' in FakeTrainer.started[0].args
+
+    # Once that run is done, the second worker must not retrain the same rows
+    FakeTrainer.started[0].returncode = 0
+    first._reap_trainer()
+    assert not second.maybe_retrain() and not first.maybe_retrain()
+    assert len(FakeTrainer.started) == 1
+
+    _add_feedback(recommender, 5)
+    assert second.maybe_retrain()
+    assert not first.maybe_retrain()
+    assert len(FakeTrainer.started) == 2
+
+
+def test_a_restarted_worker_counts_from_the_last_run(recommender, workers, tmp_path):
+    first, _ = workers
+    _add_feedback(recommender, 5)
+    assert first.maybe_retrain()
+    FakeTrainer.started[0].returncode = 0
+    first._reap_trainer()
+
+    _add_feedback(recommender, 3)
+    restarted = ModelRegistry(recommender, first.path, retrain_every=5)
+    _add_feedback(recommender, 2)
+    # 5 rows since the last run, though only 2 since this worker started
+    assert restarted.maybe_retrain()
@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data import preprocess
+from app.data.neighbors import build_neighbor_table, load_neighbor_table
+from app.data.preprocess import ContentData
+from app.services.catalog import CatalogUpdates
+
+
+def _cosine(data):
+    features = data.features.toarray().astype(np.float64)
+    norms = np.linalg.norm(features, axis=1)
+    return features @ features.T / np.outer(norms, norms)
+
+
+@pytest.fixture
+def table_dir(content_data, tmp_path):
+    path = str(tmp_path / 'neighbors')
+    assert build_neighbor_table(content_data, path, m=20, workers=2) == 20
+    return path
+
+
+def _with_table(catalog_csv, tmp_path, table_dir, monkeypatch):
+    monkeypatch.setattr(preprocess, 'SEED_EXPANSION', True)
+    return ContentData(catalog_csv, artifact_dir=str(tmp_path / 'features'),
+                       index='brute', neighbor_dir=table_dir)
+
+
+def test_each_row_lists_its_most_similar_other_rows(content_data, table_dir):
+    table = load_neighbor_table(table_dir, content_data.base_version, content_data.n_rows)
+    assert table.indices.shape == (content_data.n_rows, 20)
+    sims = _cosine(content_data)
+    np.fill_diagonal(sims, -np.inf)
+    expected = -np.sort(-sims, axis=1)[:, :20]
+    rows = np.arange(content_data.n_rows)[:, None]
+    assert not (table.indices == rows).any()
+    # Ties may list different rows, but never less similar ones
+    np.testing.assert_allclose(sims[rows, table.indices], expected, atol=1e-4)
+    np.testing.assert_allclose(table.similarities, expected, atol=2e-3)
+
+
+def test_blocks_and_workers_do_not_change_the_table(content_data, table_dir, tmp_path):
+    one_block = str(tmp_path / 'one-block')
+    build_neighbor_table(content_data, one_block, m=20, workers=1)
+    small_blocks = str(tmp_path / 'small-blocks')
+    build_neighbor_table(content_data, small_blocks, m=20, memory_budget=1, workers=3)
+    reference = load_neighbor_table(table_dir, content_data.base_version, content_data.n_rows)
+    for path in (one_block, small_blocks):
+        table = load_neighbor_table(path, content_data.base_version, content_data.n_rows)
+        np.testing.assert_array_equal(table.similarities, reference.similarities)
+
+
+def test_tables_for_another_catalog_are_ignored(content_data, table_dir):
+    n = content_data.n_rows
+    assert load_neighbor_table(table_dir, 'another artifact', n) is None
+    # Built for more rows than the catalog has
+    assert load_neighbor_table(table_dir, content_data.base_version, n - 1) is None
+    with open(os.path.join(table_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    meta['version'] = -1
+    with open(os.path.join(table_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    assert load_neighbor_table(table_dir, content_data.base_version, n) is None
+
+
+def test_table_is_only_used_with_seed_expansion(catalog_csv, tmp_path, table_dir, monkeypatch):
+    data = ContentData(catalog_csv, artifact_dir=str(tmp_path / 'features'),
+                       index='brute', neighbor_dir=table_dir)
+    assert data.neighbors is None
+    assert _with_table(catalog_csv, tmp_path, table_dir, monkeypatch).neighbors is not None
+
+
+def test_expanded_seeds_rank_the_listed_rows_by_taste(catalog_csv, tmp_path, table_dir,
+                                                      monkeypatch):
+    data = _with_table(catalog_csv, tmp_path, table_dir, monkeypatch)
+    seeds = np.array([3, 40, 41])
+    expanded = data.expand_seeds(['pop'], seeds)
+    assert sorted(expanded.tolist()) == np.unique(data.neighbors.indices[seeds]).tolist()
+
+    vec = data.user_vectors([['pop']], [seeds])[0]
+    sims = data.features[expanded] @ vec / data.row_norms[expanded]
+    assert np.all(np.diff(sims) <= 1e-5)
+
+    # Content recommendations for users with seed tracks come from the lists
+    recs = data.recommend(['pop'], [str(data.track_uris[row]) for row in seeds], 5)
+    assert set(data.lookup([rec['uri'] for rec in recs]).tolist()) <= set(expanded.tolist())
+
+
+def test_seeds_added_after_the_table_fall_back_to_search(catalog_csv, tmp_path, table_dir,
+                                                         monkeypatch):
+    data = _with_table(catalog_csv, tmp_path, table_dir, monkeypatch)
+    new = pd.read_csv(catalog_csv).iloc[[10]].copy()
+    new['Track URI'] = 'spotify:track:new'
+    updates = CatalogUpdates(data, lambda data, delta: None)
+    updates.publish(new)
+    updated = updates.data
+    assert updated.neighbors is data.neighbors
+    assert updated.expand_seeds([], np.array([3, updated.n_rows - 1])) is None
+    recs = updated.recommend(['pop'], ['spotify:track:new'], 5)
+    assert len(recs) == 5
+
+    # A restarted process still loads the table for the older rows
+    restarted = _with_table(catalog_csv, tmp_path, table_dir, monkeypatch)
+    assert restarted.n_rows == data.n_rows + 1
+    assert len(restarted.neighbors.indices) == data.n_rows
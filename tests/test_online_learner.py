@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+from app.services.feedback_store import FeedbackStore
+from app.services.online_learner import OnlineLearner, labeled_rows
+
+
+def _feedback(data, rows, labels):
+    return [(str(data.track_uris[row]), int(label), None) for row, label in zip(rows, labels)]
+
+
+def test_unknown_uris_drop_with_their_labels(content_data):
+    uris = ['spotify:track:missing', str(content_data.track_uris[3]),
+            'spotify:track:gone', str(content_data.track_uris[7])]
+    X, y = labeled_rows(content_data, uris, [1, 0, 1, 1])
+    assert y.tolist() == [0, 1]
+    np.testing.assert_array_equal(X.toarray(), content_data.rows([3, 7]))
+
+
+def test_updates_learn_the_known_rows_with_their_own_labels(content_data, tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.csv'))
+    rng = np.random.default_rng(0)
+    rows = rng.choice(content_data.n_rows, 60, replace=False)
+    labels = rng.integers(0, 2, 60)
+    entries = _feedback(content_data, rows, labels)
+    # Unknown tracks between known ones must not shift the labels
+    entries[10:10] = [('spotify:track:missing', 1, None)] * 3
+    store.append(entries[:30])
+
+    learner = OnlineLearner(content_data, str(tmp_path / 'checkpoint.joblib'))
+    assert learner.update(store) == 27
+    store.append(entries[30:])
+    learner.save()
+    # A new process resumes from the checkpoint and only learns the rest
+    learner = OnlineLearner(content_data, str(tmp_path / 'checkpoint.joblib'))
+    assert learner.update(store) == 33
+    assert learner.n_seen == 60 and learner.update(store) == 0
+
+    expected = SGDClassifier(loss='log_loss', random_state=0)
+    known = [e for e in entries if not e[0].endswith('missing')]
+    for batch in (known[:27], known[27:]):
+        batch_rows = content_data.lookup([uri for uri, _, _ in batch])
+        expected.partial_fit(content_data.sparse_rows(batch_rows),
+                             [label for _, label, _ in batch], classes=np.array([0, 1]))
+    np.testing.assert_allclose(learner.model.coef_, expected.coef_)
+
+
+def test_replaced_log_starts_training_over(content_data, tmp_path):
+    path = tmp_path / 'feedback.csv'
+    store = FeedbackStore(str(path))
+    store.append(_feedback(content_data, range(20), [0, 1] * 10))
+    learner = OnlineLearner(content_data, str(tmp_path / 'checkpoint.joblib'))
+    learner.update(store)
+
+    path.write_text('track_uri,label,user_id\n')
+    store.append(_feedback(content_data, range(4), [1, 0, 1, 0]))
+    assert learner.update(store) == 4
+    assert learner.n_seen == 4
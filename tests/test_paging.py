@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize('with_model', [True, False])
+def test_a_new_ranking_continues_without_the_tracks_shown(recommender, with_model):
+    if not with_model:
+        recommender.set_model(None)
+    request = dict(k=10, seed_genres=['pop'])
+    stream = recommender.recommend_streams([request])[0]
+    shown = recommender.data.tracks(stream.next_page(10))
+    uris = [song['uri'] for song in shown]
+
+    # As after an expired cursor: a new first page, leaving out what is shown
+    fresh = recommender.recommend_streams([dict(request, exclude_uris=uris)])[0]
+    page = recommender.data.tracks(fresh.next_page(10))
+    assert len(page) == 10
+    assert not {song['uri'] for song in page} & set(uris)
+
+
+def test_excluded_tracks_are_not_stored_as_feedback(recommender):
+    uris = [rec['uri'] for rec in recommender.recommend(k=5, seed_genres=['rock'])]
+    total = recommender.feedback.total
+    recs = recommender.recommend(k=5, seed_genres=['rock'], exclude_uris=uris)
+    assert not {rec['uri'] for rec in recs} & set(uris)
+    assert recommender.feedback.total == total
+    assert not recommender.feedback.rated_mask[recommender.data.lookup(uris)].any()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from app.services.ranking import (
+    DiverseSelector,
+    Ranking,
+    RankedStream,
+    blocks,
+    ranked_blocks,
+    top_k,
+)
+
+
+def _scores(n, seed=0):
+    # Few distinct values, so ties (broken by row) are common
+    return np.random.default_rng(seed).integers(0, 20, n).astype(np.float64)
+
+
+def test_top_k_returns_the_best_scores_best_first():
+    scores = _scores(500)
+    np.testing.assert_array_equal(scores[top_k(scores, 50)], np.sort(scores)[::-1][:50])
+    assert len(top_k(scores, 1000)) == 500
+
+
+def test_ranked_blocks_cover_every_row_once_best_first():
+    scores = _scores(1000)
+    skip = np.zeros(1000, dtype=bool)
+    skip[::7] = True
+    ranked = np.concatenate(list(ranked_blocks(scores, 64, skip)))
+    assert sorted(ranked.tolist()) == np.flatnonzero(~skip).tolist()
+    assert np.all(np.diff(scores[ranked]) <= 0)
+
+
+def test_inserted_rows_merge_like_a_full_sort():
+    n = 300
+    scores = _scores(n + 120, seed=2)
+    ranking = Ranking(np.argsort(-scores[:n], kind='stable'))
+    # Rows appended in several batches, as catalog deltas do
+    for start, stop in ((n, n + 1), (n + 1, n + 50), (n + 50, n + 120)):
+        ranking = ranking.inserted(scores, np.arange(start, stop))
+        expected = np.argsort(-scores[:stop], kind='stable')
+        for block_size in (1, 7, 64, 1000):
+            merged = np.concatenate(list(ranking.blocks(block_size)))
+            np.testing.assert_array_equal(merged, expected)
+        assert len(ranking) == stop
+
+
+def _selection(data_size=400, seed=3):
+    rng = np.random.default_rng(seed)
+    song_ids = rng.integers(0, data_size // 2, data_size)
+    artist_ids = rng.integers(0, data_size // 10, data_size)
+    exclude = rng.random(data_size) < 0.1
+    order = rng.permutation(data_size)
+    return song_ids, artist_ids, exclude, order
+
+
+def test_stream_pages_concatenate_to_one_selection():
+    song_ids, artist_ids, exclude, order = _selection()
+
+    def stream():
+        selector = DiverseSelector(song_ids, artist_ids, exclude, 0)
+        return RankedStream(selector, [(blocks(order[:50], 16), 1), (blocks(order, 16), None)])
+
+    paged = stream()
+    pages = [paged.next_page(n) for n in (5, 1, 12, 30, 1000)]
+    whole = stream().next_page(sum(len(page) for page in pages))
+    assert sum(pages, []) == whole
+    assert paged.exhausted
+    assert len(set(whole)) == len(whole) and not exclude[whole].any()
+
+
+def test_stream_counts_the_arrays_its_tiers_hold():
+    song_ids, artist_ids, exclude, order = _selection()
+    scores = _scores(len(order))
+    selector = DiverseSelector(song_ids, artist_ids, exclude, 0)
+    stream = RankedStream(selector, [(blocks(order[:5], 5), None),
+                                     (ranked_blocks(scores, 16), None)],
+                          held_bytes=scores.nbytes)
+    before = stream.nbytes
+    stream.next_page(20)  # past the first tier, into ranked_blocks
+    assert stream.nbytes >= before + scores.nbytes
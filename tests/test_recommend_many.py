@@ -0,0 +1,35 @@
+import pytest
+
+
+def _requests(data):
+    uris = [str(uri) for uri in data.track_uris]
+    return [
+        dict(k=10, seed_genres=['pop']),
+        dict(k=5, seed_genres=['rock'], liked_uris=uris[100:103]),
+        dict(k=10, seed_genres=[], liked_uris=uris[200:201], disliked_uris=uris[201:205]),
+        dict(k=1, seed_genres=['jazz', 'pop'], disliked_uris=uris[300:302]),
+        dict(k=20, seed_genres=['genre 3'], liked_uris=uris[10:20]),
+        dict(k=10, seed_genres=['pop']),
+        dict(k=7, liked_uris=['spotify:track:unknown'] + uris[50:51]),
+    ]
+
+
+@pytest.mark.parametrize('with_model', [True, False])
+def test_batch_matches_one_request_at_a_time(recommender, with_model):
+    if not with_model:
+        recommender.set_model(None)  # content-based cold start
+    requests = _requests(recommender.data)
+    recommender.batch_chunk_size = 3  # several chunks
+    batch = recommender.recommend_many(requests)
+    assert batch == [recommender.recommend(**req) for req in requests]
+
+
+def test_batch_excludes_rated_tracks(recommender):
+    data = recommender.data
+    requests = _requests(data)
+    rated = set(recommender.feedback.store.read_all()['track_uri'])
+    for req, recs in zip(requests, recommender.recommend_many(requests)):
+        uris = [rec['uri'] for rec in recs]
+        assert len(uris) == req['k'] and len(set(uris)) == len(uris)
+        assert not set(uris) & (set(req.get('liked_uris', [])) | set(req.get('disliked_uris', [])))
+        assert not set(uris) & rated
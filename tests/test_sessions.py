@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.sessions import SessionStore
+
+
+def test_unknown_session_ids_get_a_fresh_id(content_data):
+    store = SessionStore(content_data, 1 << 20)
+    session = store.get_or_create('chosen-by-client')
+    assert session.session_id != 'chosen-by-client'
+    assert store.get_or_create(session.session_id) is session
+
+
+def test_ratings_are_only_new_once(content_data):
+    store = SessionStore(content_data, 1 << 20)
+    session = store.get_or_create()
+    uris = [str(uri) for uri in content_data.track_uris[:3]]
+    assert session.rate(content_data, uris[:2], uris[2:]) == (uris[:2], uris[2:])
+    assert session.rate(content_data, uris[:2], uris[2:]) == ([], [])
+    # A changed rating counts as new
+    assert session.rate(content_data, uris[2:], []) == (uris[2:], [])
+    liked, _, rated = session.snapshot(content_data)
+    assert liked.tolist() == [0, 1, 2]
+    assert rated[:3].all() and not rated[3:].any()
+
+
+def test_concurrent_requests_share_one_session_per_id(content_data):
+    store = SessionStore(content_data, 1 << 20)
+    issued = store.get_or_create()
+    found, fresh = [], []
+
+    def request():
+        found.append(store.get_or_create(issued.session_id))
+        fresh.append(store.get_or_create('chosen-by-client'))
+
+    threads = [threading.Thread(target=request) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(session is issued for session in found)
+    assert len({session.session_id for session in fresh}) == 16
+
+
+def _route_request(**kwargs):
+    fields = dict(session_id=None, user_id=None, liked_uris=[], disliked_uris=[])
+    fields.update(kwargs)
+    return SimpleNamespace(**fields)
+
+
+@pytest.fixture
+def session_route(content_data, monkeypatch):
+    """The routes' session handling, on a small store and a recording updater."""
+    from app.api import routes
+
+    store = SessionStore(content_data, 1 << 20)
+    threads, updates = [], []
+    get_or_create = store.get_or_create
+
+    def recording_get_or_create(session_id=None):
+        threads.append(threading.get_ident())
+        return get_or_create(session_id)
+
+    monkeypatch.setattr(store, 'get_or_create', recording_get_or_create)
+    monkeypatch.setattr(routes, 'get_session_store', lambda: store)
+    monkeypatch.setattr(routes, 'get_content_data', lambda: content_data)
+    monkeypatch.setattr(routes, 'get_updater', lambda: SimpleNamespace(
+        update=lambda **kwargs: updates.append(kwargs)))
+    return routes._session_in_thread, threads, updates
+
+
+def test_session_work_runs_off_the_event_loop(session_route, content_data):
+    session_in_thread, threads, updates = session_route
+    uris = [str(uri) for uri in content_data.track_uris[:2]]
+
+    async def scenario():
+        return threading.get_ident(), await session_in_thread(
+            _route_request(user_id='u1', liked_uris=uris))
+
+    loop_thread, session = asyncio.run(scenario())
+    assert threads and loop_thread not in threads
+    assert session.user_id == 'u1'
+    assert updates == [dict(liked_uris=uris, disliked_uris=[], user_id='u1')]
+
+
+def test_a_session_keeps_its_user_id(session_route):
+    from fastapi import HTTPException
+
+    session_in_thread, _, _ = session_route
+    session = asyncio.run(session_in_thread(_route_request(user_id='u1')))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(session_in_thread(
+            _route_request(session_id=session.session_id, user_id='u2')))
+    assert error.value.status_code == 409
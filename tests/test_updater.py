@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from app.services.feedback_store import FeedbackStore
+from app.services.updater import FeedbackUpdater
+
+
+class FlakyStore(FeedbackStore):
+    """Fails the first `failures` appends, with any kind of error."""
+
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = list(failures)
+
+    def append(self, rows):
+        if rows and self.failures:
+            raise self.failures.pop(0)
+        super().append(rows)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_flusher_survives_write_errors_and_keeps_the_rows(tmp_path):
+    store = FlakyStore(str(tmp_path / 'feedback.csv'), [OSError('disk full'), ValueError('bad')])
+    updater = FeedbackUpdater(store.path, flush_interval=0.01, store=store, max_backoff=0.05)
+    updater.update(['a', 'b'], ['c'], user_id='u1')
+
+    assert _wait_for(lambda: len(store.read_since(0)[0]) == 3)
+    assert not store.failures
+    assert updater._flusher.is_alive()
+    # Later feedback goes out through the same thread
+    flusher = updater._flusher
+    updater.update(['d'], [])
+    assert _wait_for(lambda: len(store.read_since(0)[0]) == 4)
+    assert updater._flusher is flusher
+    rows, _, _ = store.read_since(0)
+    assert sorted(uri for uri, _, _ in rows) == ['a', 'b', 'c', 'd']
+
+
+def test_failed_flush_puts_the_rows_back(tmp_path):
+    store = FlakyStore(str(tmp_path / 'feedback.csv'), [RuntimeError('boom')])
+    updater = FeedbackUpdater(store.path, flush_interval=60, store=store)
+    updater.update(['a'], ['b'])
+    with pytest.raises(RuntimeError):
+        updater.flush()
+    updater.update(['c'], [])
+    updater.flush()
+    rows, _, _ = store.read_since(0)
+    assert rows == [('a', 1, None), ('b', 0, None), ('c', 1, None)]
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import expit
+from sklearn.linear_model import LogisticRegression
+
+from app.services.recommender import ModelState
+from app.services.user_models import UserModels, train_user_models, trained_offset
+
+
+def _feedback(data, n_users=6, n_ratings=12, seed=0):
+    rng = np.random.default_rng(seed)
+    records = []
+    for u in range(n_users):
+        rows = rng.choice(data.n_rows, n_ratings, replace=False)
+        labels = (data.popularity[rows] >= 50).astype(int)
+        labels[:2] = [0, 1]  # both labels for everyone
+        records += [(str(data.track_uris[row]), int(label), f'u{u}')
+                    for row, label in zip(rows, labels)]
+    return pd.DataFrame(records, columns=['track_uri', 'label', 'user_id'])
+
+
+@pytest.fixture
+def prior(content_data):
+    df = _feedback(content_data, seed=1)
+    rows = content_data.lookup(df['track_uri'].tolist())
+    return LogisticRegression(max_iter=1000).fit(content_data.sparse_rows(rows), df['label'])
+
+
+def test_users_fitted_together_match_users_fitted_alone(content_data, prior, tmp_path):
+    df = _feedback(content_data)
+    together, alone = str(tmp_path / 'together'), str(tmp_path / 'alone')
+    assert train_user_models(content_data, df, together, prior, block_size=64) == 6
+    assert train_user_models(content_data, df, alone, prior, block_size=1) == 6
+    np.testing.assert_allclose(np.load(os.path.join(together, 'weights.npy')),
+                               np.load(os.path.join(alone, 'weights.npy')), atol=2e-3)
+
+
+def test_only_users_with_enough_mixed_feedback_get_a_model(content_data, tmp_path):
+    df = _feedback(content_data, n_users=2)
+    uris = [str(uri) for uri in content_data.track_uris[:6]]
+    extra = pd.DataFrame(
+        # Too few ratings; only likes; repeated ratings, the latest (a like) wins
+        [(uri, 1, 'few') for uri in uris[:3]]
+        + [(uri, 1, 'likes-only') for uri in uris]
+        + [(uri, 0, 'repeats') for uri in uris] + [(uris[0], 1, 'repeats')]
+        + [(uri, 1, '') for uri in uris] + [('spotify:track:missing', 0, 'u0')],
+        columns=df.columns)
+    out = str(tmp_path / 'models')
+    assert train_user_models(content_data, pd.concat([df, extra]), out, min_feedback=5) == 3
+    models = UserModels(content_data, out)
+    positions, _ = models.weights_for(['u0', 'few', 'likes-only', 'repeats', None, 'u1'])
+    assert positions == [0, 3, 5]
+
+
+def test_scores_are_the_logistic_model_of_each_row(content_data, prior, tmp_path):
+    out = str(tmp_path / 'models')
+    train_user_models(content_data, _feedback(content_data), out, prior)
+    models = UserModels(content_data, out)
+    assert len(models) == 6
+    positions, weights = models.weights_for(['u2', 'nobody', 'u4'])
+    assert positions == [0, 2] and weights.shape == (2, content_data.n_features + 1)
+    expected = expit(content_data.features @ weights[:, :-1].T + weights[:, -1])
+    np.testing.assert_allclose(models.predict_proba(weights), expected.T, rtol=1e-4)
+
+
+def test_refitting_some_users_keeps_the_others(content_data, prior, tmp_path):
+    out = str(tmp_path / 'models')
+    df = _feedback(content_data)
+    train_user_models(content_data, df, out, prior, feedback_offset=100)
+    models = UserModels(content_data, out)
+    assert trained_offset(out, content_data) == 100
+    _, before = models.weights_for(['u0', 'u1', 'u2', 'u3', 'u4', 'u5'])
+
+    # u1 rates more tracks; only u1 is refitted
+    more = pd.DataFrame([(str(uri), 1, 'u1') for uri in content_data.track_uris[200:210]],
+                        columns=df.columns)
+    assert train_user_models(content_data, pd.concat([df, more]), out, prior,
+                             users={'u1'}, feedback_offset=200) == 6
+    assert trained_offset(out, content_data) == 200
+    assert models.reload_if_changed()
+    assert not models.reload_if_changed()
+    positions, after = models.weights_for(['u0', 'u1', 'u2', 'u3', 'u4', 'u5'])
+    assert positions == list(range(6))
+    kept = [0, 2, 3, 4, 5]
+    np.testing.assert_array_equal(after[kept], before[kept])
+    assert not np.allclose(after[1], before[1])
+
+
+def test_models_for_another_catalog_are_ignored(content_data, catalog_csv, tmp_path):
+    from app.data.preprocess import ContentData
+
+    out = str(tmp_path / 'models')
+    train_user_models(content_data, _feedback(content_data), out)
+    other_csv = str(tmp_path / 'other.csv')
+    pd.read_csv(catalog_csv).iloc[:300].to_csv(other_csv, index=False)
+    other = ContentData(other_csv, artifact_dir=str(tmp_path / 'other-features'),
+                        index='brute', neighbor_dir=None)
+    assert len(UserModels(other, out)) == 0
+    assert trained_offset(out, other) is None
+
+
+def test_recommendations_use_the_users_own_model(recommender, tmp_path):
+    data = recommender.data
+    out = str(tmp_path / 'models')
+    train_user_models(data, _feedback(data), out, recommender.lr_model)
+    recommender.user_models = UserModels(data, out)
+    _, weights = recommender.user_models.weights_for(['u3'])
+    probs = recommender.user_models.predict_proba(weights)[0]
+
+    # Ranked by u3's own scores, with the stored feedback excluded
+    state = ModelState(None, probs, None, data=data)
+    expected = recommender._select(state, probs, recommender.feedback.rated_mask.copy(), 10)
+    assert recommender.recommend(k=10, user_id='u3') == expected
+    assert recommender.recommend(k=10, user_id='nobody') != expected